@@ -0,0 +1,88 @@
+"""Compare the speed of the YAML loaders used to read note headers.
+
+Run with a directory of notes to use its headers as the corpus, otherwise
+a synthetic corpus is generated::
+
+    python benchmarks/headers.py [NOTES_DIR]
+"""
+import sys
+import timeit
+from typing import Any, Callable, Dict, List
+
+from ruamel.yaml import YAML
+import yaml
+
+from note_clerk import headers, utils
+
+
+REPEAT = 5
+
+SYNTHETIC_HEADER = """---
+created: 2020-11-15T05:42:49.301Z
+type: note/{n}
+tags: ['#project/{n}', '#area/notes', '#status/active']
+title: Note number {n}
+aliases: [note-{n}, "Note {n}"]
+---"""
+
+
+def corpus(notes_dir: str = "") -> List[str]:
+    """Headers of the notes in notes_dir, or generated headers."""
+    if not notes_dir:
+        return [SYNTHETIC_HEADER.format(n=n) for n in range(1000)]
+
+    found = []
+    for path in utils.all_files([notes_dir]):
+        if not utils.is_text_file(path):
+            continue
+        try:
+            with path.open("rb") as f:
+                header = utils.split_header_stream(f).header
+        except (UnicodeDecodeError, utils.UnclosedHeader):
+            continue
+        if header:
+            found.append(header)
+    return found
+
+
+def _each(load: Callable[[str], Any], texts: List[str]) -> Callable[[], None]:
+    def run() -> None:
+        for text in texts:
+            try:
+                load(text)
+            except Exception:  # noqa: S110
+                pass
+
+    return run
+
+
+def loaders() -> Dict[str, Callable[[str], Any]]:
+    """Header loaders to compare."""
+    ruamel_safe = YAML(typ="safe")
+    return {
+        "ruamel.yaml safe": lambda h: list(ruamel_safe.load_all(h)),
+        "ruamel.yaml round trip": lambda h: list(YAML().load_all(h)),
+        "PyYAML SafeLoader": lambda h: list(
+            yaml.load_all(h, Loader=yaml.SafeLoader)  # noqa: S506
+        ),
+        "headers.load_header": headers.load_header,
+        "headers.parse_header (cached)": headers.parse_header,
+    }
+
+
+def main(notes_dir: str = "") -> None:
+    """Time each loader over the corpus."""
+    texts = corpus(notes_dir)
+    size = sum(len(t) for t in texts)
+    print(f"{len(texts)} headers, {size / 1024:.0f} KiB")
+    print(f"libyaml: {getattr(yaml, '__with_libyaml__', False)}")
+
+    baseline = None
+    for name, load in loaders().items():
+        best = min(timeit.repeat(_each(load, texts), number=1, repeat=REPEAT))
+        baseline = baseline or best
+        print(f"{name:32}{best * 1000:10.1f} ms{baseline / best:8.1f}x")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
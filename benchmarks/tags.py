@@ -0,0 +1,70 @@
+"""Compare find_tags with the regular expression it replaced.
+
+Lines are typical note text, mostly without tags, and adversarial lines:
+long lines with many ``#`` characters that don't all start tags::
+
+    python benchmarks/tags.py [LENGTH]
+"""
+import sys
+import timeit
+from typing import Callable, Dict, Iterable, List
+
+from note_clerk import analysis
+
+
+REPEAT = 5
+NUMBER = 10
+
+
+def lines(length: int) -> Dict[str, List[str]]:
+    """Lines with about length characters in total to search for tags."""
+    note = ["Plain text of a note without any tags.\n"] * 9 + ["With a #tag.\n"]
+    long_lines = {
+        "prose": ("Some text with a #tag and a [[link]]. " * length)[:length],
+        "tags": ("#tag/nested #other " * length)[:length],
+        "hashes": "#" * length,
+        "spaced hashes": "# " * (length // 2),
+        "hash runs": ("##### " * length)[:length],
+        "no boundary": ("a#" * length)[:length],
+        "unclosed": ("'#" * length)[:length],
+    }
+    return {
+        "note lines": note * (length // 360),
+        **{kind: [line] for kind, line in long_lines.items()},
+    }
+
+
+def finders() -> Dict[str, Callable[[str], Iterable]]:
+    """Tag finders to compare."""
+    return {
+        "TAG_FINDER regex": lambda line: [
+            (m.start(), m.group(0)) for m in analysis.TAG_FINDER.finditer(line)
+        ],
+        "find_tags": lambda line: list(analysis.find_tags(line)),
+    }
+
+
+def _each(find: Callable[[str], Iterable], texts: List[str]) -> Callable[[], None]:
+    def run() -> None:
+        for text in texts:
+            find(text)
+
+    return run
+
+
+def main(length: str = "100000") -> None:
+    """Time each finder on each kind of line."""
+    corpus = lines(int(length))
+    names = list(finders())
+    print(f"{'line':16}" + "".join(f"{name:>22}" for name in names))
+    for kind, texts in corpus.items():
+        results: List[str] = []
+        for find in finders().values():
+            run = _each(find, texts)
+            best = min(timeit.repeat(run, number=NUMBER, repeat=REPEAT))
+            results.append(f"{best / NUMBER * 1000:19.2f} ms")
+        print(f"{kind:16}" + "".join(f"{r:>22}" for r in results))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
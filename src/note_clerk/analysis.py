@@ -0,0 +1,223 @@
+"""Extract tags and types from notes."""
+from dataclasses import dataclass
+from enum import Enum
+import io
+import logging
+import re
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+from . import headers, utils
+from .linting import LintChecks, LintContext, LintError, LintPipeline, PatternRule
+
+log = logging.getLogger(__name__)
+
+
+class TagLocation(Enum):
+    """Note tag locations."""
+
+    BODY = "body"
+    HEADER = "header"
+    HEADER_TAGS = "header_tags"
+    HEADER_TOP_LEVEL = "header_top_level"
+
+
+@dataclass
+class FileTag:
+    """Tag information."""
+
+    tag: str
+    filename: str
+    line: int
+    column: int
+    tag_location: TagLocation
+
+
+@dataclass
+class FileValue:
+    """Value along with file location it was found in."""
+
+    value: Any
+    filepath: Optional[str]
+    line: Optional[int] = None
+    column: Optional[int] = None
+
+    def file_location(self) -> str:
+        """Return specified file location."""
+        location = self.filepath or ""
+        if self.line:
+            location += f":{self.line}"
+            if self.column:
+                location += f":{self.column}"
+        return location
+
+
+TAG = r"#(#+)?[^\s\"'`\.,!#\]|)}/\\]+"
+TAG_FINDER = re.compile(r"(^" + TAG + r"|(?<=[\s\"'])" + TAG + r")")
+# Same matches as TAG_FINDER in a single alternative. The lookbehind also
+# holds at the start of a line, and the tag name can't contain ``#``, so a
+# run of ``#`` is never split and matching is linear in the line length.
+TAG_SCANNER = re.compile(r"(?<![^\s\"'])#+[^\s\"'`\.,!#\]|)}/\\]+")
+
+
+def find_tags(line: str) -> Iterator[Tuple[int, str]]:
+    """Find each tag in a line along with its index.
+
+    Lines without a ``#`` are skipped with ``str.find`` before any matching.
+    """
+    if line.find("#") == -1:
+        return
+    for match in TAG_SCANNER.finditer(line):
+        yield match.start(), match.group(0)
+
+
+def list_tags(text: Iterable[str], filename: Optional[str]) -> Iterable[FileTag]:
+    """List all tags in a note."""
+    yaml_sep = 0
+    for n, line in enumerate(text, start=1):
+        yaml_sep += line == "---\n"
+        if yaml_sep == 1:
+            tag_location = TagLocation.HEADER
+            if line.startswith("tags:"):
+                tag_location = TagLocation.HEADER_TAGS
+            elif line.startswith("top_level:"):
+                tag_location = TagLocation.HEADER_TOP_LEVEL
+        else:
+            tag_location = TagLocation.BODY
+
+        for start, tag in find_tags(line):
+            yield FileTag(tag, filename or "stdin", n, start + 1, tag_location)
+
+
+def list_types(text: TextIO, filename: Optional[str]) -> Iterable[FileValue]:
+    """List the type of a note."""
+    yield from content_types(text.read(), filename)
+
+
+def content_types(content: str, filename: Optional[str]) -> Iterable[FileValue]:
+    """List the type of a note from its full content.
+
+    The type is read from the first header document. Of duplicate keys the
+    last one is used.
+    """
+    try:
+        split = utils.split_header_stream(io.BytesIO(content.encode("utf-8")))
+        try:
+            docs = headers.parse_header(split.header)
+        except headers.DuplicateKeyError:
+            nodes = headers.compose_header(split.header)
+            docs = [headers.node_value(node) for node in nodes]
+    except (utils.UnclosedHeader, headers.YAMLError):
+        return
+    if docs and isinstance(docs[0], dict) and "type" in docs[0]:
+        yield FileValue(docs[0]["type"], filename)
+
+
+def tag_names(text: TextIO, filename: Optional[str]) -> Iterable[str]:
+    """Each tag in a note, for counting."""
+    for ft in list_tags(text, filename):
+        yield ft.tag
+
+
+def tag_locations(text: TextIO, filename: Optional[str]) -> Iterable[TagLocation]:
+    """Location of each tag in a note, for counting."""
+    for ft in list_tags(text, filename):
+        yield ft.tag_location
+
+
+def type_names(text: TextIO, filename: Optional[str]) -> Iterable[str]:
+    """Type of a note, for counting."""
+    for fv in list_types(text, filename):
+        yield str(fv.value)
+
+
+@dataclass(frozen=True)
+class FileLint:
+    """Lint error along with the file it was found in."""
+
+    filename: str
+    lint: LintError
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Lint as JSON compatible values."""
+        return {
+            "filename": self.filename,
+            "line": self.lint.line,
+            "column": self.lint.column,
+            "error": self.lint.error,
+        }
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "FileLint":
+        """Read lint written by as_dict."""
+        lint = LintError(values["error"], values["line"], values["column"])
+        return cls(values["filename"], lint)
+
+    def sort_key(self) -> Tuple[str, int, int, str]:
+        """Order lint by location."""
+        return (
+            self.filename,
+            self.lint.line or 0,
+            self.lint.column or 0,
+            self.lint.error,
+        )
+
+
+ScanResult = Union[FileLint, FileTag, FileValue]
+
+
+class Scanner:
+    """Run several analyses over a single read of each note.
+
+    Instances are callable as file actions, so they can be handed to
+    workers. The lint pipeline is built on first use in each process.
+    """
+
+    def __init__(
+        self,
+        lint_checks: Optional[LintChecks] = None,
+        lint_context: Optional[LintContext] = None,
+        lint_rules: Sequence[PatternRule] = (),
+        tags: bool = False,
+        types: bool = False,
+    ) -> None:
+        """Select analyses, linting only if checks are given."""
+        self.lint_checks = None if lint_checks is None else list(lint_checks)
+        self.lint_context = lint_context
+        self.lint_rules = list(lint_rules)
+        self.tags = tags
+        self.types = types
+        self._pipeline: Optional[LintPipeline] = None
+
+    @property
+    def pipeline(self) -> Optional[LintPipeline]:
+        """Lint pipeline for this process."""
+        if self._pipeline is None and self.lint_checks is not None:
+            self._pipeline = LintPipeline(
+                self.lint_checks, self.lint_context, self.lint_rules
+            )
+        return self._pipeline
+
+    def __call__(self, text: TextIO, filename: Optional[str]) -> Iterable[ScanResult]:
+        """Analyze one note."""
+        content = text.read()
+        lines: List[str] = io.StringIO(content).readlines()
+
+        pipeline = self.pipeline
+        if pipeline is not None:
+            for lint in pipeline.lint(lines, filename):
+                yield FileLint(filename or "stdin", lint)
+        if self.tags:
+            yield from list_tags(lines, filename)
+        if self.types:
+            yield from content_types(content, filename)
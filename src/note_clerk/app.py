@@ -1,14 +1,60 @@
 """Defines the application container for the console app."""
 
+from functools import cached_property
 import logging
+import os
 from pathlib import Path
+import re
+from typing import Any, Dict, List, Optional
 
-from . import checks
-from .linting import LintChecks
+from ruamel.yaml import YAML
+
+from . import journal, plugins, utils, workers
+from .linting import LintChecks, LintContext, PatternRule, Region
 
 log = logging.getLogger(__name__)
 
 
+CONFIG_FILE = "config.yaml"
+INDEX_FILE = "index.sqlite3"
+JOURNAL_FILE = "fix-journal.jsonl"
+HEADER_CACHE_FILE = "header-cache.sqlite3"
+# Files sqlite keeps next to a database while it is open
+SQLITE_SUFFIXES = ("-journal", "-wal", "-shm")
+
+
+class InvalidConfig(Exception):
+    """Config file has an invalid setting."""
+
+
+RULE_KEYS = {"code", "region", "pattern", "prefix", "column"}
+FILE_KEYS = {"include", "exclude", "extensions"}
+LIMIT_KEYS = {"timeout", "memory"}
+
+
+def _pattern_rule(settings: Dict[str, Any]) -> PatternRule:
+    code = settings.get("code")
+    if not code:
+        raise InvalidConfig(f"Rule is missing a code: {settings}")
+    unknown = set(settings) - RULE_KEYS
+    if unknown:
+        raise InvalidConfig(f'Rule "{code}" has unknown keys: {sorted(unknown)}')
+
+    try:
+        region = Region(settings.get("region", Region.BODY.value))
+        rule = PatternRule(
+            code=code,
+            region=region,
+            pattern=settings.get("pattern"),
+            prefix=settings.get("prefix"),
+            column=settings.get("column"),
+        )
+        re.compile(rule.regex)
+    except (ValueError, re.error) as e:
+        raise InvalidConfig(f'Rule "{code}" is invalid: {e}') from e
+    return rule
+
+
 class App:
     """Application container for note-clerk."""
 
@@ -18,11 +64,116 @@ class App:
         log.info(f'Note Clerk using config dir: "{self.config_dir}"')
         self.notes_dir = self.config_dir
 
+    @cached_property
+    def config(self) -> Dict[str, Any]:
+        """Settings read from the config file, if there is one."""
+        config_file = self.config_dir / CONFIG_FILE
+        if not config_file.is_file():
+            return {}
+        log.debug(f'reading config from "{config_file}"')
+        with config_file.open() as f:
+            return YAML(typ="safe").load(f) or {}
+
+    @property
+    def index_path(self) -> Path:
+        """Location of the note header index."""
+        return self.config_dir / INDEX_FILE
+
+    @property
+    def header_cache_path(self) -> Optional[Path]:
+        """Location of the parsed header cache, if it is enabled."""
+        if not self.config.get("cache", {}).get("headers", False):
+            return None
+        return self.config_dir / HEADER_CACHE_FILE
+
+    @property
+    def journal_path(self) -> Path:
+        """Location of the journal of batched fixes."""
+        return self.config_dir / JOURNAL_FILE
+
+    @property
+    def app_files(self) -> List[Path]:
+        """Files the app keeps in the config directory, which aren't notes."""
+        databases = [self.index_path, self.config_dir / HEADER_CACHE_FILE]
+        return [
+            self.config_dir / CONFIG_FILE,
+            self.journal_path,
+            journal.lock_path(self.journal_path),
+            *databases,
+            *(
+                db.with_name(db.name + suffix)
+                for db in databases
+                for suffix in SQLITE_SUFFIXES
+            ),
+        ]
+
     @property
     def lint_checks(self) -> LintChecks:
         """List of checks the app is configured for."""
         log.debug("getting configured checks")
-        return [
-            checks.CheckHeaderTagsArray,
-            checks.CheckHeaderTagsQuoted,
-        ]
+        check_config = self.config.get("checks", {})
+        names = plugins.enabled_checks(
+            enable=check_config.get("enable", []),
+            disable=check_config.get("disable", []),
+        )
+        return plugins.load_checks(names)
+
+    @property
+    def lint_rules(self) -> List[PatternRule]:
+        """Pattern rules defined in the config file."""
+        return [_pattern_rule(r) for r in self.config.get("rules", [])]
+
+    @cached_property
+    def file_filter(self) -> utils.FileFilter:
+        """Files in directories that are treated as notes."""
+        settings = self.config.get("files", {})
+        unknown = set(settings) - FILE_KEYS
+        if unknown:
+            raise InvalidConfig(f"Files has unknown keys: {sorted(unknown)}")
+        for key in FILE_KEYS:
+            values = settings.get(key, [])
+            if not isinstance(values, list) or not all(
+                isinstance(v, str) and v for v in values
+            ):
+                raise InvalidConfig(f'Files "{key}" should be a list of strings')
+
+        extensions = frozenset(
+            ext.lower() if ext.startswith(".") else f".{ext.lower()}"
+            for ext in settings.get("extensions", [])
+        )
+        return utils.FileFilter(
+            include=tuple(settings.get("include", [])),
+            exclude=tuple(settings.get("exclude", [])),
+            extensions=extensions,
+            ignore=frozenset(os.path.abspath(f) for f in self.app_files),
+        )
+
+    @cached_property
+    def file_limits(self) -> workers.FileLimits:
+        """Time and memory files may use before they are skipped."""
+        settings = self.config.get("limits", {})
+        unknown = set(settings) - LIMIT_KEYS
+        if unknown:
+            raise InvalidConfig(f"Limits has unknown keys: {sorted(unknown)}")
+        for key, value in settings.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise InvalidConfig(f'Limits "{key}" should be a number')
+            if value <= 0:
+                raise InvalidConfig(f'Limits "{key}" should be positive')
+
+        memory = settings.get("memory")
+        return workers.FileLimits(
+            timeout=settings.get("timeout"),
+            memory=None if memory is None else int(memory * 2**20),
+        )
+
+    @property
+    def lint_context(self) -> LintContext:
+        """Run-wide context shared by all checks in a lint run."""
+        if not self.notes_dir.is_dir():
+            return LintContext()
+        log.debug(f'collecting note ids from "{self.notes_dir}"')
+        files = utils.all_files(
+            [str(self.notes_dir)], file_filter=self.file_filter, recursive=True
+        )
+        return LintContext(note_ids=utils.note_ids(files))
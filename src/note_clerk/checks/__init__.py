@@ -4,10 +4,12 @@ from .check_filename_id import CheckFilenameId
 from .check_header_tags_array import CheckHeaderTagsArray
 from .check_header_tags_quoted import CheckHeaderTagsQuoted
 from .check_header_type_leading_slash import CheckHeaderTypeLeadingSlash
+from .check_link_broken import CheckLinkBroken
 
 __all__ = [
     "CheckFilenameId",
     "CheckHeaderTagsArray",
     "CheckHeaderTagsQuoted",
     "CheckHeaderTypeLeadingSlash",
+    "CheckLinkBroken",
 ]
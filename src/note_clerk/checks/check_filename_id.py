@@ -1,26 +1,16 @@
 import logging
-import re
-from typing import Optional
 
-from ..linting import LintCheck, LintError, Lints
+from ..linting import PatternCheck, PatternRule, Region
 
 log = logging.getLogger(__name__)
 
 
-class CheckFilenameId(LintCheck):
-    """Check if type starts with leading slash."""
+class CheckFilenameId(PatternCheck):
+    """Check if filename starts with a full ID."""
 
-    FULL_ID = re.compile(r"^[0-9]{14}")
-    PARTIAL_ID = re.compile(r"^[0-9]+")
-
-    def check_filename(self, filename: Optional[str]) -> Lints:
-        """Check if tags are structured as an array."""
-        yield from super().check_filename(filename)
-
-        if filename:  # pragma: no cover
-            if self.FULL_ID.match(filename):
-                pass
-            elif self.PARTIAL_ID.match(filename):
-                yield LintError("filename-id-incomplete", None, None)
-            else:
-                yield LintError("filename-id-missing", None, None)
+    rules = [
+        PatternRule(
+            "filename-id-incomplete", Region.FILENAME, pattern=r"^(?![0-9]{14})[0-9]+"
+        ),
+        PatternRule("filename-id-missing", Region.FILENAME, pattern=r"^(?![0-9])"),
+    ]
@@ -1,13 +1,51 @@
-from ..linting import HeaderCheck, LintError, Lints
+import re
+from typing import Optional
 
+from ..linting import (
+    line_ending,
+    LintError,
+    PatternCheck,
+    PatternRule,
+    Region,
+    unquoted_spans,
+)
 
-class CheckHeaderTagsArray(HeaderCheck):
+
+class CheckHeaderTagsArray(PatternCheck):
     """Check if tags are structured as an array."""
 
-    def check_line(self, line: str, line_num: int) -> Lints:
-        """Check if tags are structured as an array."""
-        yield from super().check_line(line, line_num)
+    # a comment is a # on its own after whitespace, #word is a tag
+    COMMENT = re.compile(r"\s+#(?=\s|$)")
+
+    rules = [
+        PatternRule(
+            "header-tags-array", Region.HEADER, pattern=r"^tags:(?! \[)", column=5
+        ),
+    ]
+
+    def fix(self, lint: LintError, line: str) -> Optional[str]:
+        """Wrap the tags in an array, quoting each one.
 
-        if self.in_header and line.startswith("tags:"):
-            if not line.startswith("tags: ["):
-                yield LintError("header-tags-array", line_num, 5)
+        A trailing comment is kept after the array.
+        """
+        if lint.error != "header-tags-array":
+            return None
+        value = line[len("tags:") :].rstrip("\r\n")
+        comment = ""
+        for start, end in unquoted_spans(value):
+            match = self.COMMENT.search(value, start, end)
+            if match is not None:
+                value, comment = value[: match.start()], value[match.start() :]
+                break
+        value = value.strip()
+        if not value:
+            # tags listed on the following lines
+            return None
+        if value.startswith("["):
+            return f"tags: {value}{comment}{line_ending(line)}"
+        if value[0] in "\"'":
+            tags = [value]
+        else:
+            tags = value.replace(",", " ").split()
+        quoted = ", ".join(t if t[0] in "\"'" else f'"{t}"' for t in tags)
+        return f"tags: [{quoted}]{comment}{line_ending(line)}"
@@ -1,20 +1,38 @@
 import logging
 import re
+from typing import Optional
 
-from ..linting import HeaderCheck, LintError, Lints
+from ..linting import LintError, PatternCheck, PatternRule, Region, unquoted_spans
 
 log = logging.getLogger(__name__)
 
 
-class CheckHeaderTagsQuoted(HeaderCheck):
+class CheckHeaderTagsQuoted(PatternCheck):
     """Check if tags are are quoted."""
 
     TAG_QUOTED = re.compile(r"(?<![\"'])#[^\s.,/]")
+    UNQUOTED_TAG = re.compile(r"(?<![\"'])#[^\s,\]\"']+")
 
-    def check_line(self, line: str, line_num: int) -> Lints:
-        """Check if tags are structured as an array."""
-        yield from super().check_line(line, line_num)
+    rules = [
+        PatternRule("header-tags-quoted", Region.HEADER, pattern=TAG_QUOTED.pattern),
+    ]
 
-        if self.in_header and line != "---\n":
-            for m in self.TAG_QUOTED.finditer(line):
-                yield LintError("header-tags-quoted", line_num, m.start())
+    def fix(self, lint: LintError, line: str) -> Optional[str]:
+        """Quote every tag of the tags line.
+
+        Tags elsewhere in the header are left alone, quoting them could change
+        the meaning of the value. So are ``#`` inside quoted scalars, which
+        are already part of a string.
+        """
+        if lint.error != "header-tags-quoted" or not line.startswith("tags:"):
+            return None
+        fixed = []
+        end = 0
+        for start, stop in unquoted_spans(line):
+            fixed.append(line[end:start])
+            fixed.append(
+                self.UNQUOTED_TAG.sub(lambda m: f'"{m.group(0)}"', line[start:stop])
+            )
+            end = stop
+        fixed.append(line[end:])
+        return "".join(fixed)
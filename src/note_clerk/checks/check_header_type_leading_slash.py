@@ -1,13 +1,22 @@
-from ..linting import HeaderCheck, LintError, Lints
+import re
+from typing import Optional
 
+from ..linting import LintError, PatternCheck, PatternRule, Region
 
-class CheckHeaderTypeLeadingSlash(HeaderCheck):
+
+class CheckHeaderTypeLeadingSlash(PatternCheck):
     """Check if type starts with leading slash."""
 
-    def check_line(self, line: str, line_num: int) -> Lints:
-        """Check if tags are structured as an array."""
-        yield from super().check_line(line, line_num)
+    LEADING_SLASH = re.compile(r"^type: /+")
+
+    rules = [
+        PatternRule(
+            "header-type-leading-slash", Region.HEADER, prefix="type: /", column=7
+        ),
+    ]
 
-        if self.in_header and line.startswith("type:"):
-            if line.startswith("type: /"):
-                yield LintError("header-type-leading-slash", line_num, 7)
+    def fix(self, lint: LintError, line: str) -> Optional[str]:
+        """Remove the leading slashes."""
+        if lint.error != "header-type-leading-slash":
+            return None
+        return self.LEADING_SLASH.sub("type: ", line)
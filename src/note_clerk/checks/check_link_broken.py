@@ -0,0 +1,26 @@
+import logging
+import re
+
+from ..linting import LintCheck, LintError, Lints
+
+log = logging.getLogger(__name__)
+
+
+class CheckLinkBroken(LintCheck):
+    """Check that links point to an existing note."""
+
+    incremental = True
+    needs_note_ids = True
+    LINK = re.compile(r"\[\[([0-9]+)(?:\|[^\]]*)?\]\]")
+
+    def check_line(self, line: str, line_num: int) -> Lints:
+        """Check each link ID against the notes found for this run."""
+        yield from super().check_line(line, line_num)
+
+        note_ids = self.context.note_ids
+        if note_ids is None:
+            return
+
+        for m in self.LINK.finditer(line):
+            if m.group(1) not in note_ids:
+                yield LintError("link-broken", line_num, m.start() + 1)
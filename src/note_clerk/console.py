@@ -1,34 +1,52 @@
 """Note clerk application."""
-from dataclasses import dataclass
+from collections import Counter
+from contextlib import closing
 import datetime as dt
 from enum import Enum
-from functools import reduce, wraps
+from functools import partial, wraps
 import json
 import logging
-import re
+from pathlib import Path
 import sys
-from typing import Any, Callable, Iterable, Optional, TextIO, TypeVar
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+    TypeVar,
+)
 
 import click
 from dateutil.parser import parse as parse_date
-import frontmatter
-import yaml
-
 
-from . import __version__, fixing, utils
-from .app import App
-from .linting import lint_file
+from . import __version__, analysis, fixing, headers, plugins, utils, workers
+from .analysis import FileTag, FileValue, TagLocation  # noqa: F401
+from .app import App, InvalidConfig
+from .journal import CorruptJournal, FixJournal, JournalLocked
+from .linting import (
+    IncrementalLint,
+    LintChecks,
+    LintContext,
+    LintError,
+    LintPipeline,
+    PatternRule,
+)
+from .lsp import DEBOUNCE, LintServer
 
 
 log = logging.getLogger(__name__)
-unicode_log = logging.getLogger(f"{__name__}.unicode_file")
+unicode_log = workers.unicode_log
 
 
 STD_IN_INDEPENDENT = "Standard in (`-`) should be used independent of any other file"
-
-
-def either(x: bool, y: bool) -> bool:
-    return x | y
+# Exit code of runs that skipped files going over their limits
+SKIPPED_EXIT = 11
 
 
 def log_errors(func: Callable) -> Callable:
@@ -76,62 +94,369 @@ def info(app: App) -> None:
 
 
 T = TypeVar("T")
-TextAction = Callable[[TextIO, Optional[str]], T]
+TextAction = Callable[[TextIO, Optional[str]], Iterable[T]]
+
+
+jobs_option = click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of worker processes.",
+)
 
 
-def _apply_to_paths(paths: Iterable[str], action: TextAction) -> Iterable[T]:
+def _shard(
+    ctx: click.Context, param: click.Parameter, value: Optional[str]
+) -> Optional[utils.Shard]:
+    if value is None:
+        return None
+    try:
+        return utils.Shard.parse(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from e
+
+
+shard_option = click.option(
+    "--shard",
+    callback=_shard,
+    metavar="I/N",
+    help="Only handle the I-th of N stable partitions of the files.",
+)
+
+
+def _file_filter(app: App) -> utils.FileFilter:
+    try:
+        return app.file_filter
+    except InvalidConfig as e:
+        raise click.ClickException(str(e)) from e
+
+
+def _file_limits(app: App) -> workers.FileLimits:
+    try:
+        return app.file_limits
+    except InvalidConfig as e:
+        raise click.ClickException(str(e)) from e
+
+
+def _files(
+    app: App, paths: Iterable[str], shard: Optional[utils.Shard] = None
+) -> Optional[List[Path]]:
+    """Files selected by paths, or None when reading from stdin."""
     _paths = list(paths)
 
     if _paths.count("-") > 0 and _paths != ["-"]:
         raise click.BadArgumentUsage(STD_IN_INDEPENDENT)
     if _paths == ["-"]:
         log.debug("Text coming from stdin")
+        return None
+    try:
+        files = list(utils.all_files(_paths, file_filter=_file_filter(app)))
+    except utils.FilesNotFound as e:
+        raise click.BadArgumentUsage(
+            f"All paths should exist, these do not: {utils.quoted_paths(e.missing)}"
+        ) from e
+    if shard is not None:
+        files = [f for f in files if f in shard]
+        log.debug(f"{len(files)} files in shard {shard}")
+    return files
+
+
+def _apply_to_paths(
+    app: App,
+    paths: Iterable[str],
+    action: TextAction,
+    jobs: int = 1,
+    shard: Optional[utils.Shard] = None,
+    skipped: Optional[List[workers.FileSkipped]] = None,
+) -> Generator[T, None, None]:
+    files = _files(app, paths, shard)
+    if files is None:
         yield from action(sys.stdin, None)
     else:
-        try:
-            for path in utils.all_files(paths):
-                try:
-                    log.debug(f"attempting to open '{path}'")
-                    with open(path, "r") as f:
-                        yield from action(f, str(path))
-                except UnicodeDecodeError:
-                    unicode_log.warning(f'Unable to open "{path}", not unicode.')
-        except utils.FilesNotFound as e:
-            raise click.BadArgumentUsage(
-                f"All paths should exist, these do not: {utils.quoted_paths(e.missing)}"
-            ) from e
+        limits = _file_limits(app)
+        for results in workers.map_files(action, files, jobs, limits, skipped):
+            yield from results
+
+
+def _count_paths(
+    app: App,
+    paths: Iterable[str],
+    action: TextAction,
+    jobs: int = 1,
+    shard: Optional[utils.Shard] = None,
+    skipped: Optional[List[workers.FileSkipped]] = None,
+) -> Counter:
+    files = _files(app, paths, shard)
+    if files is None:
+        return Counter(action(sys.stdin, None))
+    return workers.count_files(action, files, jobs, _file_limits(app), skipped)
+
+
+def _exit_if_skipped(ctx: click.Context, skipped: List[workers.FileSkipped]) -> None:
+    """Exit with SKIPPED_EXIT if any file went over its limits."""
+    if skipped:
+        log.warning(f"Skipped {len(skipped)} files going over their limits.")
+        ctx.exit(SKIPPED_EXIT)
+
+
+def _use_header_cache(app: App) -> None:
+    """Use the header cache of the app, for commands that parse headers."""
+    headers.configure(app.header_cache_path)
+
+
+def _lint_setup(app: App) -> Tuple[LintChecks, LintContext, List[PatternRule]]:
+    try:
+        lint_checks = list(app.lint_checks)
+        lint_rules = app.lint_rules
+        # walking the notes directory is only worth it for checks using it
+        if any(check.needs_note_ids for check in lint_checks):
+            lint_context = app.lint_context
+        else:
+            lint_context = LintContext()
+    except (plugins.UnknownChecks, InvalidConfig) as e:
+        raise click.ClickException(str(e)) from e
+    return lint_checks, lint_context, lint_rules
+
+
+def _format_lint(filename: Optional[str], lint: LintError) -> str:
+    return f"{filename or 'stdin'}:{lint.line}:{lint.column} | {lint.error}"
+
+
+def _format_tag(ft: FileTag) -> str:
+    return "\t".join(
+        [ft.tag, f"'{ft.filename}:{ft.line}:{ft.column}'", ft.tag_location.name]
+    )
+
+
+def _format_type(fv: FileValue) -> str:
+    return "\t".join([fv.value, f"'{fv.file_location()}'"])
+
+
+def _echo_lint(result: analysis.FileLint, as_json: bool) -> None:
+    if as_json:
+        click.echo(json.dumps(result.as_dict()))
+    else:
+        click.echo(_format_lint(result.filename, result.lint))
 
 
 @cli.command()
 @click.argument("paths", nargs=-1, type=click.Path())
+@jobs_option
+@shard_option
+@click.option("--json", "as_json", is_flag=True, help="Print lint as JSON lines.")
+@click.option("--fail-fast", is_flag=True, help="Stop at the first lint found.")
+@click.option(
+    "--max-errors",
+    type=click.IntRange(min=1),
+    metavar="N",
+    help="Stop after N lints are found.",
+)
 @click.pass_obj
 @click.pass_context
 @log_errors
-def lint(ctx: click.Context, app: App, paths: Iterable[str]) -> None:
+def lint(
+    ctx: click.Context,
+    app: App,
+    paths: Iterable[str],
+    jobs: int,
+    shard: Optional[utils.Shard],
+    as_json: bool,
+    fail_fast: bool,
+    max_errors: Optional[int],
+) -> None:
     """Lint all files selected by the given paths."""
-    # TODO: checks should come from plugins
-    lint_checks = app.lint_checks
+    scanner = analysis.Scanner(*_lint_setup(app))
+    if fail_fast:
+        max_errors = 1
+
+    found_lint = 0
+    skipped: List[workers.FileSkipped] = []
+    result: analysis.FileLint
+    results: Generator[analysis.FileLint, None, None]
+    with closing(_apply_to_paths(app, paths, scanner, jobs, shard, skipped)) as results:
+        for result in results:
+            found_lint += 1
+            _echo_lint(result, as_json)
+            if found_lint == max_errors:
+                log.info(f"Stopped linting after {found_lint} lint")
+                break
+    _exit_if_skipped(ctx, skipped)
+    if found_lint:
+        ctx.exit(10)
 
-    def _lint_text(text: TextIO, filename: Optional[str]) -> Iterable[bool]:
-        _filename = filename or "stdin"
-        found_lint = False
-        for lint in lint_file(text, filename, lint_checks):
-            found_lint = True
-            click.echo(f"{_filename}:{lint.line}:{lint.column} | {lint.error}")
-        yield found_lint
 
-    found_lint = reduce(either, _apply_to_paths(paths, _lint_text), False)
-    if found_lint:
+@cli.command()
+@click.argument("results", nargs=-1, type=click.File("r"))
+@click.option("--json", "as_json", is_flag=True, help="Print lint as JSON lines.")
+@click.pass_context
+@log_errors
+def merge_results(ctx: click.Context, results: Iterable[TextIO], as_json: bool) -> None:
+    """Combine the JSON lint output of sharded runs into one report.
+
+    Lint is sorted by location and repeated lint is only reported once. Exits
+    with an error if any lint was found, like lint itself.
+    """
+    lints = set()
+    for result in results:
+        for n, line in enumerate(result, start=1):
+            if not line.strip():
+                continue
+            try:
+                lints.add(analysis.FileLint.from_dict(json.loads(line)))
+            except (ValueError, KeyError, TypeError) as e:
+                raise click.ClickException(
+                    f"{result.name}:{n} is not JSON lint output"
+                ) from e
+
+    for lint in sorted(lints, key=analysis.FileLint.sort_key):
+        _echo_lint(lint, as_json)
+    if lints:
         ctx.exit(10)
 
 
+def _buffer_edit(buffer: IncrementalLint, message: Any) -> None:
+    if not isinstance(message, dict) or not isinstance(message.get("text"), str):
+        raise ValueError("edits need the new text")
+    if "start" not in message and "end" not in message:
+        buffer.replace(message["text"])
+        return
+    start, end = message.get("start"), message.get("end", message.get("start"))
+    if not isinstance(start, int) or not isinstance(end, int):
+        raise ValueError("line numbers should be integers")
+    buffer.update(start, end, message["text"])
+
+
+@cli.command()
+@click.argument("filename", required=False)
+@click.pass_obj
+@log_errors
+def lint_buffer(app: App, filename: Optional[str]) -> None:
+    """Lint an editor buffer as it is edited.
+
+    Edits are read from stdin as JSON lines, either the whole buffer as
+    {"text": ...}, or {"start": S, "end": E, "text": ...} replacing lines S
+    up to E, counted from 0. After each edit the lint of the whole buffer is
+    printed as a JSON list, only lines affected by the edit are linted again.
+    FILENAME is the name of the note being edited, used by filename checks.
+    """
+    pipeline = LintPipeline(*_lint_setup(app))
+    buffer = IncrementalLint(pipeline, filename=filename)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            _buffer_edit(buffer, json.loads(line))
+        except (ValueError, IndexError) as e:
+            click.echo(json.dumps({"error": str(e)}))
+            continue
+        log.debug(f"linted {buffer.rechecked} lines")
+        lints = [analysis.FileLint(filename or "stdin", lint) for lint in buffer.lints]
+        click.echo(json.dumps([lint.as_dict() for lint in lints]))
+
+
+@cli.command()
+@click.option(
+    "--debounce",
+    type=click.FloatRange(min=0),
+    default=DEBOUNCE,
+    show_default=True,
+    help="Seconds without edits before linting.",
+)
+@click.pass_obj
+@click.pass_context
+@log_errors
+def lsp(ctx: click.Context, app: App, debounce: float) -> None:
+    """Run a language server publishing lint as diagnostics.
+
+    The server speaks the language server protocol over stdin and stdout.
+    Open notes and checks are kept in memory, so only edited lines are linted
+    again.
+    """
+    checks, context, rules = _lint_setup(app)
+    server = LintServer(checks, context, rules, sys.stdout.buffer, debounce)
+    ctx.exit(server.serve(sys.stdin.buffer))
+
+
 @cli.command()
 @click.argument("paths", nargs=-1, type=click.Path())
 @click.pass_obj
 @click.pass_context
 @log_errors
-def fix(ctx: click.Context, app: App, paths: Iterable[str]) -> None:
-    error = reduce(either, _apply_to_paths(paths, fixing.update_text), False)
+@click.option(
+    "--batch",
+    is_flag=True,
+    help="Stage every fix and apply them together, recoverable if interrupted.",
+)
+@click.option(
+    "--rules",
+    is_flag=True,
+    help="Fix lint of the enabled checks line by line, instead of headers.",
+)
+@shard_option
+def fix(
+    ctx: click.Context,
+    app: App,
+    paths: Iterable[str],
+    batch: bool,
+    rules: bool,
+    shard: Optional[utils.Shard],
+) -> None:
+    _use_header_cache(app)
+    journal = FixJournal(app.journal_path)
+    try:
+        committed = journal.recover()
+    except JournalLocked as e:
+        if batch:
+            raise click.ClickException(str(e)) from e
+        log.info(f"{e}, not recovering its batch")
+    except CorruptJournal as e:
+        raise click.ClickException(
+            f"{e}, remove it once the notes listed in it are checked"
+        ) from e
+    else:
+        if committed is not None:
+            log.warning(
+                "Recovered interrupted fix run: "
+                + ("applied staged fixes" if committed else "discarded staged fixes")
+            )
+
+    error = False
+    skipped: List[workers.FileSkipped] = []
+    if batch:
+        if rules:
+            raise click.BadOptionUsage("rules", "--rules can't be used with --batch")
+        files = _files(app, paths, shard)
+        if files is None:
+            raise click.BadOptionUsage("batch", "--batch can't be used with stdin")
+        try:
+            with journal:
+                journal.stage_in(str(f.parent) for f in files)
+                staged_files = workers.map_files(
+                    partial(fixing.stage_text, batch=journal.batch),
+                    files,
+                    limits=_file_limits(app),
+                    skipped=skipped,
+                )
+                reserved: Set[str] = set()
+                for results in staged_files:
+                    for staged in results:
+                        if staged is None:
+                            error = True
+                        else:
+                            journal.record(fixing.reserve_target(staged, reserved))
+        except JournalLocked as e:
+            raise click.ClickException(str(e)) from e
+        error |= bool(journal.conflicts)
+    else:
+        action: TextAction = fixing.update_text
+        if rules:
+            action = fixing.RuleFixer(*_lint_setup(app))
+        failed: bool
+        for failed in _apply_to_paths(app, paths, action, shard=shard, skipped=skipped):
+            error |= failed
+    _exit_if_skipped(ctx, skipped)
     if error:
         ctx.exit(10)
 
@@ -142,116 +467,260 @@ def analyze() -> None:
     ...
 
 
-class TagLocation(Enum):
-    """Note tag locations."""
+def _echo_counts(counts: Counter) -> None:
+    for value, count in sorted(counts.items(), key=lambda vc: (-vc[1], str(vc[0]))):
+        if isinstance(value, Enum):
+            value = value.name
+        click.echo(f"{value}\t{count}")
 
-    BODY = "body"
-    HEADER = "header"
-    HEADER_TAGS = "header_tags"
-    HEADER_TOP_LEVEL = "header_top_level"
 
+@analyze.command()
+@click.argument("paths", nargs=-1, type=click.Path())
+@click.option("--count", is_flag=True, help="Only print how often each tag is used.")
+@click.option(
+    "--summary", is_flag=True, help="Only print how many tags are in each location."
+)
+@jobs_option
+@shard_option
+@click.pass_obj
+@click.pass_context
+def list_tags(
+    ctx: click.Context,
+    app: App,
+    paths: Iterable[str],
+    count: bool,
+    summary: bool,
+    jobs: int,
+    shard: Optional[utils.Shard],
+) -> None:
+    """List all tags in given notes."""
+    skipped: List[workers.FileSkipped] = []
+    if count or summary:
+        action = analysis.tag_locations if summary else analysis.tag_names
+        _echo_counts(_count_paths(app, paths, action, jobs, shard, skipped))
+    else:
+        ft: FileTag
+        for ft in _apply_to_paths(app, paths, analysis.list_tags, jobs, shard, skipped):
+            click.echo(_format_tag(ft))
+    _exit_if_skipped(ctx, skipped)
 
-@dataclass
-class FileTag:
-    """Tag information."""
 
-    tag: str
-    filename: str
-    line: int
-    column: int
-    tag_location: TagLocation
+@analyze.command()
+@click.argument("paths", nargs=-1, type=click.Path())
+@click.option("--count", is_flag=True, help="Only print how many notes use each type.")
+@jobs_option
+@shard_option
+@click.pass_obj
+@click.pass_context
+def list_types(
+    ctx: click.Context,
+    app: App,
+    paths: Iterable[str],
+    count: bool,
+    jobs: int,
+    shard: Optional[utils.Shard],
+) -> None:
+    """List all types in given notes."""
+    _use_header_cache(app)
+    skipped: List[workers.FileSkipped] = []
+    if count:
+        _echo_counts(
+            _count_paths(app, paths, analysis.type_names, jobs, shard, skipped)
+        )
+    else:
+        fv: FileValue
+        for fv in _apply_to_paths(
+            app, paths, analysis.list_types, jobs, shard, skipped
+        ):
+            click.echo(_format_type(fv))
+    _exit_if_skipped(ctx, skipped)
 
 
 @analyze.command()
 @click.argument("paths", nargs=-1, type=click.Path())
+@jobs_option
+@shard_option
 @click.pass_obj
-def list_tags(app: App, paths: Iterable[str]) -> None:
-    """List all tags in given notes."""
-    TAG = r"#(#+)?[^\s\"'`\.,!#\]|)}/\\]+"
-    TAG_FINDER = re.compile(r"(^" + TAG + r"|(?<=[\s\"'])" + TAG + r")")
-
-    def _list_tags(text: TextIO, filename: Optional[str]) -> Iterable[FileTag]:
-        log.debug(f"{text=} {filename=}")
-        yaml_sep = 0
-        for n, line in enumerate(text, start=1):
-            log.debug(f"checking line {n:03}|{line[:-1]}")
-
-            yaml_sep += line == "---\n"
-            log.debug(f"{yaml_sep=}")
-            if yaml_sep == 1:
-                tag_location = TagLocation.HEADER
-                if line.startswith("tags:"):
-                    tag_location = TagLocation.HEADER_TAGS
-                elif line.startswith("top_level:"):
-                    tag_location = TagLocation.HEADER_TOP_LEVEL
-            else:
-                tag_location = TagLocation.BODY
-
-            for match in TAG_FINDER.finditer(line):
-                yield FileTag(
-                    match.group(0),
-                    filename or "stdin",
-                    n,
-                    match.start() + 1,
-                    tag_location,
-                )
-
-    ft: FileTag
-    for ft in _apply_to_paths(paths, _list_tags):
-        click.echo(
-            "\t".join(
-                [
-                    ft.tag,  # type: ignore
-                    f"'{ft.filename}:{ft.line}:{ft.column}'",  # type: ignore
-                    ft.tag_location.name,  # type: ignore
-                ]
-            )
-        )
+@click.pass_context
+def header_conflicts(
+    ctx: click.Context,
+    app: App,
+    paths: Iterable[str],
+    jobs: int,
+    shard: Optional[utils.Shard],
+) -> None:
+    """Report conflicting header keys in given notes, grouped by kind.
+
+    Exits with an error if any conflict can't be merged by fix.
+    """
+    groups: Dict[fixing.ConflictKind, List[fixing.HeaderConflict]] = {}
+    skipped: List[workers.FileSkipped] = []
+    conflict: fixing.HeaderConflict
+    for conflict in _apply_to_paths(
+        app, paths, fixing.header_conflicts, jobs, shard, skipped
+    ):
+        groups.setdefault(conflict.kind, []).append(conflict)
+
+    for kind in fixing.ConflictKind:
+        if kind not in groups:
+            continue
+        mergeable = "mergeable" if kind.mergeable else "unmergeable"
+        click.echo(f"{kind.value} ({mergeable}): {len(groups[kind])}")
+        for conflict in groups[kind]:
+            location = f"{conflict.filename}:{conflict.line}"
+            if conflict.key is not None:
+                location += f" | {conflict.key}"
+            click.echo(f"    {location}")
+
+    _exit_if_skipped(ctx, skipped)
+    if any(not kind.mergeable for kind in groups):
+        ctx.exit(10)
 
 
-@dataclass
-class FileValue:
-    """Value along with file location it was found in."""
+@analyze.command("all")
+@click.argument("paths", nargs=-1, type=click.Path())
+@click.option(
+    "--lint-output", type=click.File("w"), help="Write lint errors to this file."
+)
+@click.option("--tags-output", type=click.File("w"), help="Write tags to this file.")
+@click.option("--types-output", type=click.File("w"), help="Write types to this file.")
+@jobs_option
+@shard_option
+@click.pass_obj
+@click.pass_context
+def analyze_all(
+    ctx: click.Context,
+    app: App,
+    paths: Iterable[str],
+    lint_output: Optional[TextIO],
+    tags_output: Optional[TextIO],
+    types_output: Optional[TextIO],
+    jobs: int,
+    shard: Optional[utils.Shard],
+) -> None:
+    """Lint and list tags and types with a single read of each note.
+
+    Only the analyses given an output are run. Use `-` to write to stdout.
+    """
+    if lint_output is None and tags_output is None and types_output is None:
+        raise click.UsageError("Give at least one of the output options.")
+
+    lint_checks: Optional[LintChecks] = None
+    lint_context: Optional[LintContext] = None
+    lint_rules: List[PatternRule] = []
+    if lint_output is not None:
+        lint_checks, lint_context, lint_rules = _lint_setup(app)
+    if types_output is not None:
+        _use_header_cache(app)
+    scanner = analysis.Scanner(
+        lint_checks,
+        lint_context,
+        lint_rules,
+        tags=tags_output is not None,
+        types=types_output is not None,
+    )
 
-    value: str
-    filepath: Optional[str]
-    line: Optional[int] = None
-    column: Optional[int] = None
+    found_lint = False
+    skipped: List[workers.FileSkipped] = []
+    result: analysis.ScanResult
+    for result in _apply_to_paths(app, paths, scanner, jobs, shard, skipped):
+        if isinstance(result, analysis.FileLint):
+            found_lint = True
+            click.echo(_format_lint(result.filename, result.lint), file=lint_output)
+        elif isinstance(result, FileTag):
+            click.echo(_format_tag(result), file=tags_output)
+        else:
+            click.echo(_format_type(result), file=types_output)
 
-    def file_location(self) -> str:
-        """Return specified file location."""
-        location = self.filepath or ""
-        if self.line:
-            location += f":{self.line}"
-            if self.column:
-                location += f":{self.column}"
-        return location
+    _exit_if_skipped(ctx, skipped)
+    if found_lint:
+        ctx.exit(10)
 
 
 @analyze.command()
 @click.argument("paths", nargs=-1, type=click.Path())
 @click.pass_obj
-def list_types(app: App, paths: Iterable[str]) -> None:
-    """List all types in given notes."""
+def index(app: App, paths: Iterable[str]) -> None:
+    """Update the header index of notes, defaulting to the notes directory."""
+    from .index import NoteIndex
 
-    def _list_types(text: TextIO, filename: Optional[str]) -> Iterable[FileValue]:
-        # log.debug(f"{text=} {filename=}")
-        try:
-            metadata, content = frontmatter.parse(text.read())
-            yield FileValue(metadata["type"], filename)
-        except (KeyError, yaml.parser.ParserError, json.decoder.JSONDecodeError):
-            pass
-
-    fv: FileValue
-    for fv in _apply_to_paths(paths, _list_types):
-        click.echo(
-            "\t".join(
-                [
-                    fv.value,  # type: ignore
-                    f"'{fv.file_location()}'",  # type: ignore
-                ]
-            )
+    _use_header_cache(app)
+    _paths = list(paths)
+    # the whole notes directory tree, like the note IDs of the lint context
+    recursive = not _paths
+    if recursive:
+        _paths = [str(app.notes_dir)]
+    try:
+        files = list(
+            utils.all_files(_paths, file_filter=_file_filter(app), recursive=recursive)
         )
+    except utils.FilesNotFound as e:
+        raise click.BadArgumentUsage(
+            f"All paths should exist, these do not: {utils.quoted_paths(e.missing)}"
+        ) from e
+
+    with NoteIndex(app.index_path) as note_index:
+        stats = note_index.update(files)
+    click.echo(
+        f"{stats.updated} updated, {stats.unchanged} unchanged, "
+        f"{stats.removed} removed"
+    )
+
+
+def _field_filter(
+    ctx: click.Context, param: click.Parameter, values: Iterable[str]
+) -> List[Tuple[str, str]]:
+    fields = []
+    for value in values:
+        key, sep, field = value.partition("=")
+        if not sep or not key:
+            raise click.BadParameter(f'"{value}" should be KEY=VALUE')
+        fields.append((key, field))
+    return fields
+
+
+@analyze.command()
+@click.option("--type", "note_type", help="Only notes of this type.")
+@click.option("--tag", "tags", multiple=True, help="Only notes with this tag.")
+@click.option(
+    "--where",
+    "fields",
+    multiple=True,
+    callback=_field_filter,
+    metavar="KEY=VALUE",
+    help="Only notes with this header value.",
+)
+@click.option("--created-after", help="Only notes created on or after this date.")
+@click.option("--created-before", help="Only notes created before this date.")
+@click.option("--count-by", metavar="KEY", help="Count notes by each value of KEY.")
+@click.pass_obj
+def query(
+    app: App,
+    note_type: Optional[str],
+    tags: Iterable[str],
+    fields: List[Tuple[str, str]],
+    created_after: Optional[str],
+    created_before: Optional[str],
+    count_by: Optional[str],
+) -> None:
+    """Query the header index built by `analyze index`."""
+    from .index import NoteFilter, NoteIndex
+
+    if not app.index_path.exists():
+        raise click.ClickException("No index found, run `analyze index` first.")
+
+    filters = [("tags", tag) for tag in tags] + fields
+    if note_type is not None:
+        filters.insert(0, ("type", note_type))
+    note_filter = NoteFilter(filters, created_after, created_before)
+
+    with NoteIndex(app.index_path) as note_index:
+        if count_by is None:
+            for path in note_index.query(note_filter):
+                click.echo(path)
+        else:
+            for value, count in note_index.count_by(count_by, note_filter):
+                click.echo(f"{value}\t{count}")
 
 
 @cli.group()
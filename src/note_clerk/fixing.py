@@ -1,9 +1,26 @@
+from dataclasses import dataclass, replace
 import datetime as dt
+from enum import Enum
+from functools import lru_cache, wraps
 import io
 import logging
+import os
 from pathlib import Path
 import re
-from typing import Any, Callable, Dict, Iterable, Optional, TextIO, Tuple, Union
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Match,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
+)
 
 from boltons.fileutils import atomic_save
 import click
@@ -14,8 +31,11 @@ from ruamel.yaml.constructor import DuplicateKeyError
 from ruamel.yaml.parser import ParserError
 from ruamel.yaml.scanner import ScannerError
 from ruamel.yaml.timestamp import TimeStamp
+from yaml.nodes import MappingNode
 
-from . import utils
+from . import headers, utils
+from .journal import StagedFix, staging_file
+from .linting import LintChecks, LintContext, LintPipeline, PatternRule
 from .utils import ensure_newline, UnclosedHeader
 
 
@@ -29,9 +49,31 @@ class UnableFix(Exception):
 DateLike = Union[TimeStamp, dt.datetime, str]
 
 
+ISO_OFFSET = re.compile(r"(?:Z|([+-][0-9]{2}):?([0-9]{2}))$")
+
+
+def _iso_offset(match: Match) -> str:
+    if match.group(0) == "Z":
+        return "+00:00"
+    return f"{match.group(1)}:{match.group(2)}"
+
+
+@lru_cache(maxsize=4096)
+def parse_created(value: str) -> dt.datetime:
+    """Parse a date string, trying ISO 8601 before falling back to dateutil.
+
+    Results are cached, as the same dates show up in many duplicated headers.
+    """
+    iso = ISO_OFFSET.sub(_iso_offset, value.strip())
+    try:
+        return dt.datetime.fromisoformat(iso)
+    except ValueError:
+        return parse_date(value)
+
+
 def as_date(value: DateLike) -> dt.datetime:
     if isinstance(value, str):
-        return parse_date(value)
+        return parse_created(value)
     return value
 
 
@@ -44,24 +86,71 @@ def min_date(existing: DateLike, new: DateLike) -> DateLike:
         return new
 
 
-def merge_values(key: str, existing: Any, new: Any) -> Any:
+class ConflictKind(Enum):
+    """Ways header values of the same key can conflict."""
+
+    EQUAL = "Same value repeated"
+    LISTS = "Lists combined"
+    DATES = "Earliest date kept"
+    TIMEZONES = "Can't identify timezones"
+    INVALID_DATES = "Unable to read dates"
+    INTEGERS = "Unable to join integers"
+    CONSTANTS = "Unable to join constants"
+    DUPLICATE_KEY = "Duplicate Key found in header document"
+    MALFORMED = "Malformed header"
+    UNCLOSED = "Unclosed header"
+
+    @property
+    def mergeable(self) -> bool:
+        """Whether fix is able to merge this conflict."""
+        return self in (ConflictKind.EQUAL, ConflictKind.LISTS, ConflictKind.DATES)
+
+
+def conflict_kind(key: str, existing: Any, new: Any) -> ConflictKind:
+    """Kind of conflict between two values of key in a header."""
+    return _conflict(key, existing, new)[0]
+
+
+def _conflict(key: str, existing: Any, new: Any) -> Tuple[ConflictKind, Any]:
+    # the merged value comes along, so dates are only parsed once per merge
     if isinstance(existing, list) and isinstance(new, list):
-        return list(OrderedSet(existing + new))
+        return ConflictKind.LISTS, list(OrderedSet(existing + new))
     if existing == new:
-        return existing
+        return ConflictKind.EQUAL, existing
     if key == "created":
         try:
-            log.debug(f"{type(existing)=} {type(new)=}")
-            log.debug(f"{existing=} {new=}")
-            return min_date(existing, new)
+            return ConflictKind.DATES, min_date(existing, new)
         except TypeError:
-            raise UnableFix("Can't identify timezones")
+            return ConflictKind.TIMEZONES, None
+        except ValueError:
+            return ConflictKind.INVALID_DATES, None
     if isinstance(existing, int) or isinstance(new, int):
-        raise UnableFix("Unable to join integers")
-    raise UnableFix("Unable to join constants")
+        return ConflictKind.INTEGERS, None
+    return ConflictKind.CONSTANTS, None
+
+
+def merge_values(key: str, existing: Any, new: Any) -> Any:
+    log.debug(f"{type(existing)=} {type(new)=}")
+    log.debug(f"{existing=} {new=}")
+    kind, merged = _conflict(key, existing, new)
+    if kind.mergeable:
+        return merged
+    raise UnableFix(kind.value)
+
+
+def _single_doc(header: str) -> bool:
+    try:
+        docs = headers.parse_header(header)
+    except headers.YAMLError:
+        # the round trip parser reports the error
+        return False
+    return len([d for d in docs if d is not None]) < 2
 
 
 def fix_header(header: str) -> str:
+    if _single_doc(header):
+        return ensure_newline(header) if header else header
+
     output = io.StringIO()
     yaml = YAML(output=output)
     header_docs = [h for h in yaml.load_all(header) if h is not None]  # noqa: S506
@@ -101,25 +190,31 @@ def fix_filename(filename: Optional[str]) -> Optional[str]:
         note_id = orig_note_id.ljust(14, "0")
         new_filename = stem.replace(orig_note_id, note_id) + path.suffix
         log.debug(f"{new_filename=}")
-        new_path = path.parent / new_filename
-        while new_path.exists():
-            rename_match = ID_REGEX.match(new_filename)
-            assert rename_match is not None  # noqa: S101
-            note_id = rename_match.groups()[0]
-            updated_id = str(int(note_id) + 1).rjust(14, "0")
-            new_filename = new_filename.replace(note_id, updated_id)
-            log.debug(f"{new_filename=}")
-            new_path = path.parent / new_filename
-        return str(new_path)
+        return str(_free_path(path.parent / new_filename, Path.exists))
     return filename
 
 
-def fix_text(text: TextIO, filename: Optional[str]) -> Tuple[str, Optional[str]]:
+def _free_path(path: Path, taken: Callable[[Path], bool]) -> Path:
+    """Number the note ID of path up until the path isn't taken."""
+    new_filename = path.name
+    while taken(path):
+        rename_match = ID_REGEX.match(new_filename)
+        assert rename_match is not None  # noqa: S101
+        note_id = rename_match.groups()[0]
+        updated_id = str(int(note_id) + 1).rjust(14, "0")
+        new_filename = new_filename.replace(note_id, updated_id)
+        log.debug(f"{new_filename=}")
+        path = path.parent / new_filename
+    return path
+
+
+def fix_note(
+    source: BinaryIO, filename: Optional[str]
+) -> Tuple[str, utils.HeaderSplit, Optional[str]]:
+    """Fix the header and filename of a note, leaving the body in source."""
     try:
-        header, body = utils.split_header(
-            [line.removesuffix("\n") for line in text.readlines()]
-        )
-        new_header = fix_header(header)
+        split = utils.split_header_stream(source)
+        new_header = fix_header(split.header)
     except UnableFix:
         raise
     except (ParserError, ScannerError) as e:
@@ -130,15 +225,18 @@ def fix_text(text: TextIO, filename: Optional[str]) -> Tuple[str, Optional[str]]
         raise UnableFix("Unclosed header") from e
     except UnicodeDecodeError as e:  # pragma: no cover
         raise UnableFix("Invalid File") from e
+    except MemoryError:
+        # the worker skips the file, see workers.run_file
+        raise
     except Exception as e:  # pragma: no cover
         log.error(f"error creating header for {filename}", exc_info=True)
         raise UnableFix("Unknown Error") from e
-    new_note: str = new_header + ensure_newline(body)
     new_filename = fix_filename(filename)
-    return new_note, new_filename
+    return new_header, split, new_filename
 
 
 def raised_error(func: Callable) -> Callable:
+    @wraps(func)
     def wrapper(text: TextIO, filename: Optional[str]) -> Iterable[bool]:
         try:
             func(text, filename)
@@ -156,13 +254,180 @@ def update_text(
     filename: Optional[str],
 ) -> None:
     log.debug(f"{filename=}")
-    n_text, n_filename = fix_text(text, filename)
+    source = text.buffer
+    n_header, split, n_filename = fix_note(source, filename)
 
     if n_filename is None:
-        click.echo(n_text, nl=False)
+        stdout = click.get_binary_stream("stdout")
+        stdout.write(split.encode(n_header))
+        utils.copy_body(source, split, stdout)
+        stdout.flush()
+    elif utils.same_content(source, split, n_header):
+        if filename is not None and filename != n_filename:
+            log.debug(f"Renaming unchanged file: {filename}")
+            os.rename(filename, n_filename)
     else:
         with atomic_save(n_filename, overwrite=True) as f:
-            f.write(n_text.encode("utf-8"))
+            f.write(split.encode(n_header))
+            utils.copy_body(source, split, f)
         if filename is not None and filename != n_filename:
             log.debug(f"Deleting file: {filename}")
             Path(filename).unlink()
+
+
+def stage_text(
+    text: TextIO, filename: Optional[str], batch: str = ""
+) -> Iterable[Optional[StagedFix]]:
+    """Write the fixed note to a staging file instead of replacing it.
+
+    Targets are only checked against existing files, notes of the same
+    batch staged elsewhere can get the same target, see reserve_target.
+
+    Args:
+        text: note to fix.
+        filename: name of the note.
+        batch: name of the batch the staging file belongs to.
+
+    Yields:
+        the staged fix, nothing if the note is unchanged, or None if the
+        note can't be fixed.
+    """
+    assert filename is not None  # noqa: S101
+    source = text.buffer
+    try:
+        n_header, split, n_filename = fix_note(source, filename)
+    except UnableFix as e:
+        log.warning(f"Unable to fix '{filename}': {e} ")
+        yield None
+        return
+    assert n_filename is not None  # noqa: S101
+
+    if utils.same_content(source, split, n_header):
+        if filename != n_filename:
+            yield StagedFix(filename, n_filename, staged=False)
+        return
+
+    f = staging_file(n_filename, batch)
+    try:
+        with f:
+            f.write(split.encode(n_header))
+            utils.copy_body(source, split, f)
+    except BaseException:
+        # interrupted part way, like a skipped file, the fix is never recorded
+        os.unlink(f.name)
+        raise
+    yield StagedFix(
+        f.name, n_filename, remove=filename if filename != n_filename else None
+    )
+
+
+def reserve_target(fix: StagedFix, reserved: Set[str]) -> StagedFix:
+    """Give a staged fix a target no other note of its batch uses.
+
+    Taken targets are numbered up like new filenames of fix_filename, the
+    staging file keeps its name.
+
+    Args:
+        fix: staged fix of a note.
+        reserved: targets of the batch so far, the fix's target is added.
+    """
+
+    def taken(path: Path) -> bool:
+        target = str(path)
+        return target in reserved or (target != fix.note and path.exists())
+
+    target = str(_free_path(Path(fix.target), taken))
+    if target != fix.target:
+        log.debug(f'"{fix.target}" is taken in the batch, using "{target}"')
+        fix = replace(fix, target=target)
+    reserved.add(target)
+    return fix
+
+
+class RuleFixer:
+    """Apply the fixes checks provide for their lint.
+
+    Each line is fixed as soon as it is linted, so notes are read once and
+    their header is never parsed. Instances are callable as file actions.
+    """
+
+    def __init__(
+        self,
+        lint_checks: LintChecks,
+        lint_context: Optional[LintContext] = None,
+        lint_rules: Sequence[PatternRule] = (),
+    ) -> None:
+        """Build the lint pipeline of the given checks."""
+        self.pipeline = LintPipeline(lint_checks, lint_context, lint_rules)
+
+    def __call__(self, text: TextIO, filename: Optional[str]) -> Iterable[bool]:
+        """Fix one note, yielding True if any lint couldn't be fixed."""
+        lines = text.readlines()
+        fixed, unfixed = self.pipeline.fix_lines(lines, filename)
+
+        if filename is None:
+            click.echo("".join(fixed), nl=False)
+        elif fixed != lines:
+            log.debug(f"Fixing lint of {filename}")
+            with atomic_save(filename, overwrite=True) as f:
+                f.write("".join(fixed).encode("utf-8"))
+
+        for lint in unfixed:
+            log.warning(
+                f"Unable to fix '{filename or 'stdin'}:{lint.line}:{lint.column}'"
+                f": {lint.error}"
+            )
+        yield bool(unfixed)
+
+
+@dataclass
+class HeaderConflict:
+    """Conflicting values of a header key in a note."""
+
+    filename: str
+    line: int
+    key: Optional[str]
+    kind: ConflictKind
+
+
+def header_conflicts(text: TextIO, filename: Optional[str]) -> Iterable[HeaderConflict]:
+    """Report every key conflict between the header documents of a note.
+
+    Unlike fix, this keeps going after a conflict that can't be merged, so
+    all conflicts of a note are listed at once. The first value of a key
+    repeated within a document is the one compared with other documents.
+    """
+    name = filename or "stdin"
+    try:
+        header = utils.split_header_stream(text.buffer).header
+        nodes = headers.compose_header(header)
+    except UnclosedHeader:
+        yield HeaderConflict(name, 1, None, ConflictKind.UNCLOSED)
+        return
+    except headers.YAMLError as e:
+        mark = getattr(e, "problem_mark", None)
+        line = mark.line + 1 if mark is not None else 1
+        yield HeaderConflict(name, line, None, ConflictKind.MALFORMED)
+        return
+
+    combined: Dict[str, Any] = {}
+    for node in nodes:
+        if not isinstance(node, MappingNode):
+            continue
+        seen = set()
+        for key_node, value_node in node.value:
+            key = key_node.value
+            line = key_node.start_mark.line + 1
+            if key in seen:
+                yield HeaderConflict(name, line, key, ConflictKind.DUPLICATE_KEY)
+                continue
+            seen.add(key)
+
+            value = headers.node_value(value_node)
+            if key not in combined:
+                combined[key] = value
+                continue
+            kind, merged = _conflict(key, combined[key], value)
+            yield HeaderConflict(name, line, key, kind)
+            if kind.mergeable:
+                combined[key] = merged
@@ -0,0 +1,297 @@
+"""Parse note headers once and share the result.
+
+This is the single YAML layer for reading headers. It uses libyaml through
+PyYAML's ``CSafeLoader`` when available, falling back to the pure Python
+loader. Only ``fix`` uses ruamel.yaml, where it has to round trip headers
+without losing their formatting. Plain scalars are resolved like YAML 1.2,
+as ruamel.yaml does, so ``yes`` is a string rather than a boolean and both
+agree on the values of a header.
+
+Headers are parsed into a list of documents, keyed by a hash of the header
+text. Parsed headers are kept in memory with LRU eviction and, if a cache
+file is configured, persisted between runs so unchanged headers are never
+parsed again. The cache file stores documents as JSON, with the values
+JSON lacks, like dates, tagged, so reading it never runs code.
+
+Parsed documents are shared between callers and must not be modified.
+"""
+import base64
+from collections import OrderedDict
+import datetime as dt
+import hashlib
+import json
+import logging
+from pathlib import Path
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+import yaml
+from yaml.constructor import ConstructorError
+from yaml.nodes import MappingNode, Node, ScalarNode
+
+log = logging.getLogger(__name__)
+
+
+MAX_SIZE = 4096
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS headers (
+    digest BLOB PRIMARY KEY,
+    docs TEXT NOT NULL
+);
+"""
+
+
+def header_digest(header: str) -> bytes:
+    """Hash identifying the text of a header."""
+    return hashlib.blake2b(header.encode("utf-8"), digest_size=16).digest()
+
+
+_SafeLoader: Any = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class DuplicateKeyError(ConstructorError):
+    """Header document defines the same key twice."""
+
+
+# Plain scalars resolved differently by YAML 1.2, as listed by ruamel.yaml
+YAML_1_2_RESOLVERS = [
+    (
+        "tag:yaml.org,2002:bool",
+        re.compile(r"^(?:true|True|TRUE|false|False|FALSE)$"),
+        "tTfF",
+    ),
+    (
+        "tag:yaml.org,2002:int",
+        re.compile(
+            r"^(?:[-+]?0b[0-1_]+|[-+]?0o?[0-7_]+|[-+]?[0-9_]+|[-+]?0x[0-9a-fA-F_]+)$"
+        ),
+        "-+0123456789",
+    ),
+    (
+        "tag:yaml.org,2002:float",
+        re.compile(
+            r"^(?:[-+]?(?:[0-9][0-9_]*)\.[0-9_]*(?:[eE][-+]?[0-9]+)?"
+            r"|[-+]?(?:[0-9][0-9_]*)(?:[eE][-+]?[0-9]+)"
+            r"|\.[0-9_]+(?:[eE][-+][0-9]+)?"
+            r"|[-+]?\.(?:inf|Inf|INF)"
+            r"|\.(?:nan|NaN|NAN))$"
+        ),
+        "-+0123456789.",
+    ),
+]
+
+
+def _yaml_1_2_resolvers() -> Dict[Optional[str], List[Any]]:
+    tags = {tag for tag, _, _ in YAML_1_2_RESOLVERS}
+    resolvers: Dict[Optional[str], List[Any]] = {
+        first: [(tag, regexp) for tag, regexp in resolvers if tag not in tags]
+        for first, resolvers in _SafeLoader.yaml_implicit_resolvers.items()
+    }
+    for tag, regexp, first_chars in YAML_1_2_RESOLVERS:
+        for first in first_chars:
+            resolvers.setdefault(first, []).append((tag, regexp))
+    return resolvers
+
+
+DECIMAL_LEADING_ZERO = re.compile(r"^[-+]?0[0-9]+$")
+
+
+class _Yaml12Loader(_SafeLoader):
+    """Safe loader resolving plain scalars like YAML 1.2."""
+
+    yaml_implicit_resolvers = _yaml_1_2_resolvers()
+
+    def construct_yaml_int(self, node: ScalarNode) -> int:
+        """Construct an integer, only 0o starts an octal one."""
+        value = self.construct_scalar(node).replace("_", "")
+        if DECIMAL_LEADING_ZERO.match(value):
+            return int(value, 10)
+        return int(super().construct_yaml_int(node))
+
+
+_Yaml12Loader.add_constructor("tag:yaml.org,2002:int", _Yaml12Loader.construct_yaml_int)
+
+
+class HeaderLoader(_Yaml12Loader):
+    """Safe loader that rejects duplicate keys, like fix does."""
+
+    def construct_mapping(self, node: MappingNode, deep: bool = False) -> Any:
+        """Construct a mapping, checking its keys are unique."""
+        keys = set()
+        for key_node, _ in node.value:
+            key = key_node.value
+            if isinstance(key, str) and key in keys:
+                raise DuplicateKeyError(
+                    "while constructing a mapping",
+                    node.start_mark,
+                    f'found duplicate key "{key}"',
+                    key_node.start_mark,
+                )
+            keys.add(key)
+        return super().construct_mapping(node, deep=deep)
+
+
+YAMLError = yaml.YAMLError
+
+
+def load_header(header: str) -> List[Any]:
+    """Parse every document of a header.
+
+    Raises:
+        YAMLError: if the header isn't valid YAML.
+    """
+    return list(yaml.load_all(header, Loader=HeaderLoader))  # noqa: S506
+
+
+def compose_header(header: str) -> List[Node]:
+    """Compose every document of a header, without constructing values.
+
+    Raises:
+        YAMLError: if the header isn't valid YAML.
+    """
+    return list(yaml.compose_all(header, Loader=HeaderLoader))
+
+
+def node_value(node: Node) -> Any:
+    """Construct the value of a composed node, allowing duplicate keys."""
+    return _Yaml12Loader("").construct_document(node)
+
+
+def _encode(value: Any) -> Any:
+    """Value of a document as JSON, every object tags its type."""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        return {"map": [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if isinstance(value, tuple):
+        return {"tuple": [_encode(v) for v in value]}
+    if isinstance(value, (set, frozenset)):
+        return {"set": [_encode(v) for v in value]}
+    if isinstance(value, dt.datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, dt.date):
+        return {"date": value.isoformat()}
+    if isinstance(value, bytes):
+        return {"bytes": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"can't store {type(value).__name__} values")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    """Value of a JSON object written by _encode."""
+    [(kind, value)] = obj.items()
+    if kind == "map":
+        return {k: v for k, v in value}
+    if kind == "tuple":
+        return tuple(value)
+    if kind == "set":
+        return set(value)
+    if kind == "datetime":
+        return dt.datetime.fromisoformat(value)
+    if kind == "date":
+        return dt.date.fromisoformat(value)
+    if kind == "bytes":
+        return base64.b64decode(value)
+    raise ValueError(f"unknown value type {kind}")
+
+
+class HeaderCache:
+    """Cache of parsed headers, optionally persisted to a file."""
+
+    def __init__(self, path: Optional[Path] = None, maxsize: int = MAX_SIZE) -> None:
+        """Create an empty cache, backed by the cache file at path if given."""
+        self.path = path
+        self.maxsize = maxsize
+        self._docs: "OrderedDict[bytes, List[Any]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), timeout=30)
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute("PRAGMA synchronous = OFF")
+            self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the cache file."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def parse(self, header: str) -> List[Any]:
+        """Documents of header, parsed only if they aren't cached.
+
+        Raises:
+            YAMLError: if the header isn't valid YAML, errors aren't cached.
+        """
+        digest = header_digest(header)
+        docs = self._docs.get(digest)
+        if docs is not None:
+            self._docs.move_to_end(digest)
+            return docs
+
+        docs = self._load(digest)
+        if docs is None:
+            docs = load_header(header)
+            self._store(digest, docs)
+
+        self._docs[digest] = docs
+        if len(self._docs) > self.maxsize:
+            self._docs.popitem(last=False)
+        return docs
+
+    def _load(self, digest: bytes) -> Optional[List[Any]]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT docs FROM headers WHERE digest = ?", (digest,)
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            docs: List[Any] = json.loads(row[0], object_hook=_decode)
+        except (TypeError, ValueError) as e:
+            log.debug(f"ignoring unreadable cached header: {e}")
+            return None
+        return docs
+
+    def _store(self, digest: bytes, docs: List[Any]) -> None:
+        if self._db is None:
+            return
+        try:
+            encoded = json.dumps(_encode(docs))
+        except TypeError as e:
+            log.debug(f"unable to store parsed header: {e}")
+            return
+        try:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO headers (digest, docs) VALUES (?, ?)",
+                    (digest, encoded),
+                )
+        except sqlite3.OperationalError as e:  # pragma: no cover
+            log.debug(f"unable to store parsed header: {e}")
+
+
+_cache = HeaderCache()
+
+
+def configure(path: Optional[Path]) -> None:
+    """Use the cache file at path for this process, or memory only if None."""
+    global _cache
+    if path == _cache.path:
+        return
+    _cache.close()
+    _cache = HeaderCache(path)
+
+
+def cache_path() -> Optional[Path]:
+    """Cache file used by this process."""
+    return _cache.path
+
+
+def parse_header(header: str) -> List[Any]:
+    """Documents of header, using the shared cache of this process."""
+    return _cache.parse(header)
@@ -0,0 +1,209 @@
+"""Persistent index of note header fields.
+
+Header fields are stored in SQLite, one row per note and field value, so
+notes can be filtered and aggregated without opening them. The index is
+updated incrementally: notes are only re-read when their modification time
+or size changed.
+"""
+from dataclasses import dataclass
+import datetime as dt
+import json
+import logging
+from pathlib import Path
+import sqlite3
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from . import headers, utils
+
+log = logging.getLogger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    created TEXT
+);
+CREATE TABLE IF NOT EXISTS fields (
+    path TEXT NOT NULL REFERENCES notes(path) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS fields_path ON fields(path);
+CREATE INDEX IF NOT EXISTS fields_key_value ON fields(key, value);
+CREATE INDEX IF NOT EXISTS notes_created ON notes(created);
+"""
+
+
+def field_value(value: Any) -> Optional[str]:
+    """Convert a header value to the text stored in the index."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dt.date, dt.datetime)):
+        return value.isoformat()
+    return json.dumps(value, default=str)
+
+
+def field_rows(header: Dict[str, Any]) -> Iterator[Tuple[str, Optional[str]]]:
+    """Flatten header into key, value pairs with one pair per list item."""
+    for key, value in header.items():
+        if isinstance(value, list):
+            for item in value:
+                yield str(key), field_value(item)
+        else:
+            yield str(key), field_value(value)
+
+
+def read_header(path: Path) -> Dict[str, Any]:
+    """Parse the header fields of a note.
+
+    Fields of multiple header documents are combined, with the first value
+    of a key winning. Notes without a readable header have no fields.
+    """
+    if not utils.is_text_file(path):
+        return {}
+    try:
+        with open(path, "rb") as f:
+            split = utils.split_header_stream(f)
+        docs = headers.parse_header(split.header)
+    except (UnicodeDecodeError, utils.UnclosedHeader, headers.YAMLError) as e:
+        log.debug(f'Unable to read header of "{path}": {e}')
+        return {}
+
+    header: Dict[str, Any] = {}
+    for doc in docs:
+        if isinstance(doc, dict):
+            for key, value in doc.items():
+                header.setdefault(key, value)
+    return header
+
+
+@dataclass
+class IndexStats:
+    """Counts of notes handled by an index update."""
+
+    updated: int = 0
+    unchanged: int = 0
+    removed: int = 0
+
+
+@dataclass(frozen=True)
+class NoteFilter:
+    """Conditions notes must match in a query."""
+
+    fields: Sequence[Tuple[str, str]] = ()
+    created_after: Optional[str] = None
+    created_before: Optional[str] = None
+
+    def where(self) -> Tuple[str, List[str]]:
+        """SQL condition on the notes table and its parameters."""
+        conditions = ["1"]
+        params: List[str] = []
+        for key, value in self.fields:
+            conditions.append(
+                "EXISTS (SELECT 1 FROM fields f"
+                " WHERE f.path = notes.path AND f.key = ? AND f.value = ?)"
+            )
+            params += [key, value]
+        if self.created_after is not None:
+            conditions.append("notes.created >= ?")
+            params.append(self.created_after)
+        if self.created_before is not None:
+            conditions.append("notes.created < ?")
+            params.append(self.created_before)
+        return " AND ".join(conditions), params
+
+
+class NoteIndex:
+    """SQLite index of note header fields."""
+
+    def __init__(self, path: Path) -> None:
+        """Open the index, creating it if needed."""
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path))
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the index."""
+        self.db.close()
+
+    def __enter__(self) -> "NoteIndex":
+        """Use index as a context manager."""
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        """Close index at the end of the context."""
+        self.close()
+
+    def update(self, files: Iterable[Path]) -> IndexStats:
+        """Index new and changed notes, and drop notes that no longer exist.
+
+        Args:
+            files: paths to every note that should be in the index.
+
+        Returns:
+            counts of updated, unchanged and removed notes.
+        """
+        stats = IndexStats()
+        known = {
+            path: (mtime_ns, size)
+            for path, mtime_ns, size in self.db.execute(
+                "SELECT path, mtime_ns, size FROM notes"
+            )
+        }
+
+        with self.db:
+            for file in files:
+                path = str(file.resolve())
+                stat = file.stat()
+                if known.pop(path, None) == (stat.st_mtime_ns, stat.st_size):
+                    stats.unchanged += 1
+                    continue
+
+                log.debug(f'indexing "{path}"')
+                header = read_header(file)
+                self.db.execute("DELETE FROM notes WHERE path = ?", (path,))
+                self.db.execute(
+                    "INSERT INTO notes (path, mtime_ns, size, created)"
+                    " VALUES (?, ?, ?, ?)",
+                    (
+                        path,
+                        stat.st_mtime_ns,
+                        stat.st_size,
+                        field_value(header.get("created")),
+                    ),
+                )
+                self.db.executemany(
+                    "INSERT INTO fields (path, key, value) VALUES (?, ?, ?)",
+                    ((path, key, value) for key, value in field_rows(header)),
+                )
+                stats.updated += 1
+
+            stale = [(path,) for path in known if not Path(path).exists()]
+            self.db.executemany("DELETE FROM notes WHERE path = ?", stale)
+            stats.removed = len(stale)
+
+        return stats
+
+    def query(self, note_filter: NoteFilter) -> List[str]:
+        """Paths of notes matching the filter."""
+        where, params = note_filter.where()
+        rows = self.db.execute(
+            f"SELECT path FROM notes WHERE {where} ORDER BY path",  # noqa: S608
+            params,
+        )
+        return [path for (path,) in rows]
+
+    def count_by(self, key: str, note_filter: NoteFilter) -> List[Tuple[str, int]]:
+        """Count notes matching the filter by each value of key."""
+        where, params = note_filter.where()
+        rows = self.db.execute(
+            "SELECT fields.value, COUNT(DISTINCT fields.path) AS n FROM fields"
+            f" JOIN notes ON notes.path = fields.path WHERE fields.key = ? AND {where}"
+            " GROUP BY fields.value ORDER BY n DESC, fields.value",  # noqa: S608
+            [key, *params],
+        )
+        return [(value, n) for value, n in rows]
@@ -0,0 +1,382 @@
+"""Apply the fixes of many notes as a single batch.
+
+Fixed notes are first written to staging files next to their targets and
+recorded in a journal. Once everything is staged, the staged files and
+their directories are flushed to disk, a commit marker is added to the
+journal, and the staged files are renamed into place. Each touched
+directory is synced once at the end.
+
+Where the C library has ``syncfs``, staged files are flushed with a single
+call per file system, which also flushes their directories, instead of an
+fsync per file. ``syncfs`` writes out everything pending on the file
+system, not just the batch, but a batch of many notes still needs far
+fewer flushes. Elsewhere each file is fsynced, then each directory.
+
+A run that is interrupted can be recovered from the journal: committed
+batches are rolled forward, anything else is rolled back by removing the
+staged files, so notes are never left half fixed. The directories notes
+are staged in are recorded up front, so staging files written before
+their fix was recorded are found too. A lock next to the journal keeps
+runs from recovering a batch that is still running.
+"""
+import ctypes
+from dataclasses import asdict, dataclass
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    cast,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+)
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+log = logging.getLogger(__name__)
+
+
+COMMIT = {"commit": True}
+
+
+class JournalError(Exception):
+    """Journal can't be used."""
+
+
+class JournalLocked(JournalError):
+    """Another run is using the journal."""
+
+
+class CorruptJournal(JournalError):
+    """Journal has entries that aren't fixes."""
+
+
+@dataclass(frozen=True)
+class StagedFix:
+    """A fixed note waiting to be moved into place.
+
+    Attributes:
+        source: file to move, either a staging file or the unchanged note.
+        target: final path of the note.
+        staged: whether source is a staging file, removed on rollback.
+        remove: original note, deleted when the fixed note has a new name.
+    """
+
+    source: str
+    target: str
+    staged: bool = True
+    remove: Optional[str] = None
+
+    @property
+    def note(self) -> str:
+        """Path of the note before the fix."""
+        if self.remove is not None:
+            return self.remove
+        return self.target if self.staged else self.source
+
+
+def staging_file(target: str, batch: str = "") -> BinaryIO:
+    """Open a new staging file on the same file system as target.
+
+    Args:
+        target: final path of the note.
+        batch: name of the batch, so its staging files can be found.
+    """
+    path = Path(target)
+    staged = tempfile.NamedTemporaryFile(
+        "wb",
+        prefix=f".{path.name}.",
+        suffix=_staging_suffix(batch),
+        dir=path.parent,
+        delete=False,
+    )
+    return cast(BinaryIO, staged)
+
+
+def lock_path(journal: Path) -> Path:
+    """Lock file of the journal at path journal."""
+    return journal.with_name(f"{journal.name}.lock")
+
+
+def _staging_suffix(batch: str) -> str:
+    return f".{batch}.fix" if batch else ".fix"
+
+
+def _fsync_dir(directory: str) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:  # pragma: no cover
+        return
+    try:
+        os.fsync(fd)
+    except OSError:  # pragma: no cover
+        pass
+    finally:
+        os.close(fd)
+
+
+def _load_syncfs() -> Optional[Callable[[int], int]]:
+    try:
+        return cast(Callable[[int], int], ctypes.CDLL(None, use_errno=True).syncfs)
+    except (OSError, AttributeError, TypeError):
+        return None
+
+
+_syncfs = _load_syncfs()
+
+
+def _sync_file_system(path: str) -> bool:
+    """Flush the file system holding path, False if it can't be."""
+    if _syncfs is None:
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return _syncfs(fd) == 0
+    finally:
+        os.close(fd)
+
+
+def _sync_files(paths: Iterable[str]) -> None:
+    by_device: Dict[int, List[str]] = {}
+    for path in paths:
+        by_device.setdefault(os.stat(path).st_dev, []).append(path)
+
+    directories = set()
+    for device_paths in by_device.values():
+        if _sync_file_system(device_paths[0]):
+            continue
+        for path in device_paths:
+            with open(path, "rb") as f:
+                os.fsync(f.fileno())
+            directories.add(os.path.dirname(path) or ".")
+    for directory in sorted(directories):
+        _fsync_dir(directory)
+
+
+class FixJournal:
+    """Journal of fixes applied together.
+
+    Attributes:
+        batch: name of the batch, part of the name of its staging files.
+        fixes: staged fixes of the batch.
+        directories: directories staging files may be written to.
+        conflicts: fixes not applied because their target was taken.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Use the journal at path."""
+        self.path = path
+        self.lock_path = lock_path(path)
+        self.batch = ""
+        self.fixes: List[StagedFix] = []
+        self.directories: Set[str] = set()
+        self.conflicts: List[StagedFix] = []
+        self._file: Optional[Any] = None
+        self._lock: Optional[Any] = None
+
+    def __enter__(self) -> "FixJournal":
+        """Start a new batch.
+
+        Raises:
+            JournalLocked: if another run is using the journal.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch = uuid.uuid4().hex[:12]
+        self.conflicts = []
+        self.lock()
+        try:
+            self._file = self.path.open("x")
+        except FileExistsError:
+            self.release()
+            raise
+        self._write({"batch": self.batch})
+        _fsync_dir(str(self.path.parent))
+        return self
+
+    def __exit__(self, exc_type: Any, *args: Any) -> None:
+        """Apply the batch, or roll it back if an error was raised."""
+        try:
+            if exc_type is None:
+                self.commit()
+                self.apply()
+            else:
+                self.close()
+                self.rollback()
+        finally:
+            self.release()
+
+    def lock(self) -> None:
+        """Take the lock of the journal.
+
+        Raises:
+            JournalLocked: if another run holds the lock.
+        """
+        if self._lock is not None or fcntl is None:
+            return
+        lock = self.lock_path.open("a")
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            lock.close()
+            raise JournalLocked(f'Another fix run is using "{self.path}"') from e
+        self._lock = lock
+
+    def release(self) -> None:
+        """Close the journal file and release its lock."""
+        self.close()
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    def close(self) -> None:
+        """Close the journal file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        assert self._file is not None  # noqa: S101
+        self._file.write(json.dumps(entry) + "\n")
+
+    def stage_in(self, directories: Iterable[str]) -> None:
+        """Record directories before staging files are written to them."""
+        new = set(directories) - self.directories
+        for directory in sorted(new):
+            self._write({"directory": directory})
+        self.directories |= new
+        if new:
+            # staging files may outlive this process, their directory mustn't
+            assert self._file is not None  # noqa: S101
+            self._file.flush()
+
+    def record(self, fix: StagedFix) -> None:
+        """Add a staged fix to the batch."""
+        self.fixes.append(fix)
+        self._write(asdict(fix))
+
+    def commit(self) -> None:
+        """Make staged fixes durable and mark the batch as committed."""
+        assert self._file is not None  # noqa: S101
+        self._file.flush()
+        _sync_files([fix.source for fix in self.fixes if fix.staged])
+        self._write(COMMIT)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.close()
+
+    def apply(self) -> None:
+        """Move every staged fix into place and remove the journal.
+
+        A fix is left staged, and added to conflicts, if another file took
+        its target since it was staged.
+        """
+        directories: Set[str] = set()
+        for fix in self.fixes:
+            if os.path.exists(fix.source):
+                if fix.target != fix.note and os.path.exists(fix.target):
+                    log.warning(
+                        f'Not replacing "{fix.target}", its fix is left in'
+                        f' "{fix.source}"'
+                    )
+                    self.conflicts.append(fix)
+                    continue
+                os.replace(fix.source, fix.target)
+            if fix.source != fix.target:
+                directories.add(os.path.dirname(fix.source) or ".")
+            if fix.remove is not None and fix.remove != fix.target:
+                if os.path.exists(fix.remove):
+                    os.unlink(fix.remove)
+                directories.add(os.path.dirname(fix.remove) or ".")
+            directories.add(os.path.dirname(fix.target) or ".")
+
+        for directory in sorted(directories):
+            _fsync_dir(directory)
+        self._remove()
+
+    def rollback(self) -> None:
+        """Discard staged fixes and remove the journal."""
+        for fix in self.fixes:
+            if fix.staged and os.path.exists(fix.source):
+                os.unlink(fix.source)
+        suffix = _staging_suffix(self.batch)
+        for directory in sorted(self.directories):
+            for staged in Path(directory).glob(f".*{suffix}"):
+                log.debug(f'removing unrecorded staging file "{staged}"')
+                staged.unlink()
+        self._remove()
+
+    def _remove(self) -> None:
+        self.path.unlink()
+        _fsync_dir(str(self.path.parent))
+        self.fixes = []
+        self.directories = set()
+
+    def recover(self) -> Optional[bool]:
+        """Finish or undo a batch left by an interrupted run.
+
+        Returns:
+            True if the batch had been committed and was applied, False if
+            it was rolled back, None if there was no batch to recover.
+
+        Raises:
+            JournalLocked: if another run is using the journal.
+            CorruptJournal: if the journal has entries that aren't fixes,
+                it is left in place.
+        """
+        if not self.path.exists():
+            return None
+        self.lock()
+        try:
+            # the batch may have finished since the check
+            if not self.path.exists():
+                return None
+            committed = self._read()
+            if committed:
+                self.apply()
+            else:
+                self.rollback()
+            return committed
+        finally:
+            self.release()
+
+    def _read(self) -> bool:
+        committed = False
+        with self.path.open() as f:
+            for line in f:
+                try:
+                    entry: Dict[str, Any] = json.loads(line)
+                except json.JSONDecodeError:
+                    log.debug(f"ignoring incomplete journal entry: {line!r}")
+                    continue
+                if entry == COMMIT:
+                    committed = True
+                    continue
+                try:
+                    self._read_entry(entry)
+                except (TypeError, AttributeError) as e:
+                    raise CorruptJournal(
+                        f'Corrupt fix journal "{self.path}", entry {line!r}'
+                    ) from e
+        return committed
+
+    def _read_entry(self, entry: Dict[str, Any]) -> None:
+        if set(entry) == {"batch"}:
+            self.batch = str(entry["batch"])
+        elif set(entry) == {"directory"}:
+            self.directories.add(str(entry["directory"]))
+        else:
+            fix = StagedFix(**entry)
+            if not isinstance(fix.source, str) or not isinstance(fix.target, str):
+                raise TypeError("source and target must be paths")
+            self.fixes.append(fix)
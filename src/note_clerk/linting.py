@@ -1,8 +1,24 @@
 """Linting implementation."""
 from abc import ABC
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+from enum import Enum
 import logging
-from typing import Iterable, Optional, TextIO, Type
+import re
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Pattern,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+    Type,
+)
+import warnings
 
 log = logging.getLogger(__name__)
 
@@ -19,9 +35,240 @@ class LintError:
 Lints = Iterable[LintError]
 
 
+@dataclass(frozen=True)
+class LintContext:
+    """Run-wide information shared by every check.
+
+    Built once per lint run and handed to each check instance, so checks
+    that need vault-wide knowledge don't have to rebuild it per file.
+    """
+
+    note_ids: Optional[FrozenSet[str]] = None
+
+
+def line_ending(line: str) -> str:
+    """Newline characters at the end of line, if any."""
+    return line[len(line.rstrip("\r\n")) :]
+
+
+# Characters after which a quote starts a YAML flow scalar
+_SCALAR_START = " \t[{,:"
+
+
+def _quote_end(text: str, start: int) -> int:
+    """Index after the quoted scalar starting at start, or the end of text."""
+    quote = text[start]
+    i = start + 1
+    while i < len(text):
+        if quote == '"' and text[i] == "\\":
+            i += 2
+            continue
+        if text[i] == quote:
+            if quote == "'" and text[i + 1 : i + 2] == "'":
+                # '' is an escaped quote in single quoted scalars
+                i += 2
+                continue
+            return i + 1
+        i += 1
+    return len(text)
+
+
+def unquoted_spans(text: str) -> List[Tuple[int, int]]:
+    """Start and end indexes of the parts of a YAML line outside quotes.
+
+    Quotes only start a scalar at the start of the line or after whitespace
+    or flow indicators, like the ``'`` of ``it's``. Unclosed quotes run to
+    the end of the line.
+    """
+    spans = []
+    start = 0
+    i = 0
+    while i < len(text):
+        if text[i] in "\"'" and (i == 0 or text[i - 1] in _SCALAR_START):
+            spans.append((start, i))
+            start = i = _quote_end(text, i)
+            continue
+        i += 1
+    spans.append((start, len(text)))
+    return [(s, e) for s, e in spans if s < e]
+
+
+class Region(Enum):
+    """Parts of a note a check can apply to."""
+
+    FILENAME = "filename"
+    HEADER = "header"
+    BODY = "body"
+
+
+@dataclass(frozen=True)
+class PatternRule:
+    """Lint rule reported wherever a regular expression or prefix matches.
+
+    Header rules aren't applied to the ``---`` lines around the header.
+    Errors are reported at ``column`` if given, otherwise at the start of
+    the match. Filename rules have no line or column.
+    """
+
+    code: str
+    region: Region
+    pattern: Optional[str] = None
+    prefix: Optional[str] = None
+    column: Optional[int] = None
+
+    def __post_init__(self) -> None:
+        """Validate exactly one of pattern or prefix is given."""
+        if (self.pattern is None) == (self.prefix is None):
+            raise ValueError(f"{self.code}: give exactly one of pattern or prefix")
+
+    @property
+    def regex(self) -> str:
+        """Regular expression matching this rule."""
+        if self.pattern is not None:
+            return self.pattern
+        return "^" + re.escape(self.prefix or "")
+
+    def error(self, line_num: Optional[int], start: int) -> LintError:
+        """Create error for a match at position start."""
+        if self.region is Region.FILENAME:
+            return LintError(self.code, None, None)
+        column = start if self.column is None else self.column
+        return LintError(self.code, line_num, column)
+
+
+class RuleEngine:
+    """Match every pattern rule of a region with a single scan.
+
+    The rules of each region are compiled into one alternation of
+    lookaheads with a named group per rule. A line is scanned once and
+    every match maps back to its rule through the group name. Rules later
+    in the alternation are only tried on their own at positions where an
+    earlier rule matched. Each rule still reports non-overlapping matches,
+    like ``finditer`` on the rule alone.
+
+    Rules with groups of their own, which backreferences would count from
+    the start of the alternation, or with flags that only apply at the
+    start of a pattern, are scanned separately.
+    """
+
+    def __init__(self, rules: Iterable[PatternRule]) -> None:
+        """Compile rules by region."""
+        self.rules: Dict[Region, List[PatternRule]] = {}
+        for rule in rules:
+            self.rules.setdefault(rule.region, []).append(rule)
+
+        self._patterns: Dict[Region, List[Pattern]] = {}
+        self._combined: Dict[Region, Pattern] = {}
+        self._separate: Dict[Region, List[int]] = {}
+        for region, region_rules in self.rules.items():
+            patterns = [re.compile(r.regex) for r in region_rules]
+            self._patterns[region] = patterns
+            lookaheads = {
+                i: _lookahead(i, r.regex)
+                for i, r in enumerate(region_rules)
+                if patterns[i].groups == 0
+            }
+            lookaheads = {i: a for i, a in lookaheads.items() if _compiles(a)}
+            self._separate[region] = [
+                i for i in range(len(region_rules)) if i not in lookaheads
+            ]
+            if lookaheads:
+                self._combined[region] = re.compile("|".join(lookaheads.values()))
+
+    def __contains__(self, region: Region) -> bool:
+        """Check if any rule applies to region."""
+        return region in self.rules
+
+    def lint(
+        self, region: Region, text: str, line_num: Optional[int]
+    ) -> List[LintError]:
+        """Apply all rules for region to text."""
+        rules = self.rules.get(region)
+        if rules is None:
+            return []
+
+        patterns = self._patterns[region]
+        separate = self._separate[region]
+        matches = []
+        match_ends = [0] * len(rules)
+        combined = self._combined.get(region)
+        for m in combined.finditer(text) if combined is not None else ():
+            pos = m.start()
+            group = str(m.lastgroup)
+            first_rule = int(group[2:])
+            for i in range(first_rule, len(rules)):
+                if pos < match_ends[i] or i in separate:
+                    continue
+                if i == first_rule:
+                    end = m.end(group)
+                else:
+                    rule_match = patterns[i].match(text, pos)
+                    if rule_match is None:
+                        continue
+                    end = rule_match.end()
+                match_ends[i] = end
+                matches.append((pos, i))
+
+        if separate:
+            for i in separate:
+                matches.extend((m.start(), i) for m in patterns[i].finditer(text))
+            matches.sort()
+        return [rules[i].error(line_num, pos) for pos, i in matches]
+
+
+def _lookahead(index: int, regex: str) -> str:
+    return f"(?=(?P<_r{index}>{regex}))"
+
+
+def _compiles(regex: str) -> bool:
+    # older versions only warn about flags not at the start of a pattern
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        try:
+            re.compile(regex)
+        except (re.error, DeprecationWarning):
+            return False
+    return True
+
+
+@dataclass
+class FileState:
+    """Per-file state shared by all checks of a pipeline."""
+
+    filename: Optional[str] = None
+    yaml_seperators: int = 0
+
+    def reset(self, filename: Optional[str]) -> None:
+        """Reset state before linting the next file."""
+        self.filename = filename
+        self.yaml_seperators = 0
+
+    @property
+    def in_header(self) -> bool:
+        """Identify if in the header by the number of yaml document lines."""
+        return self.yaml_seperators == 1
+
+
 class LintCheck(ABC):
     """Lint Check Base Class."""
 
+    regions: FrozenSet[Region] = frozenset(Region)
+    rules: Sequence[PatternRule] = ()
+    # Hooks only depend on the line checked and the shared file state, so
+    # single lines can be checked again after an edit.
+    incremental: bool = False
+    # Checks looking up other notes need the note IDs of the run context,
+    # which are only collected when an enabled check needs them.
+    needs_note_ids: bool = False
+
+    def __init__(self, context: Optional[LintContext] = None) -> None:
+        """Initialize object with the run context."""
+        self.context = context or LintContext()
+        self.state = FileState()
+
+    def reset(self) -> None:
+        """Reset any per-file state before checking the next file."""
+
     def check_filename(self, filename: Optional[str]) -> Lints:
         """Check filename."""
         yield from ()
@@ -34,57 +281,363 @@ class LintCheck(ABC):
         """Emit any final errors."""
         yield from ()
 
+    def fix(self, lint: LintError, line: str) -> Optional[str]:
+        """Fix lint reported by this check on line.
+
+        Returns:
+            the fixed line, or None if the lint can't be fixed on its own line.
+        """
+        return None
+
 
 LintChecks = Iterable[Type[LintCheck]]
 
 
 class HeaderCheck(LintCheck):
-    """Track if line is in the header or not."""
+    """Only check lines in the header."""
 
-    def __init__(self) -> None:
-        """Initialize object."""
-        super().__init__()
-        self.yaml_seperators = 0
+    regions = frozenset([Region.FILENAME, Region.HEADER])
 
     @property
     def in_header(self) -> bool:
-        """Identify if in the header by the number of yaml document lines."""
-        return self.yaml_seperators == 1
+        """Identify if the current line is in the header."""
+        return self.state.in_header
 
-    def check_line(self, line: str, line_num: int) -> Lints:
-        """Track number of yaml seperators."""
-        yield from super().check_line(line, line_num)
-        if line.strip() == "---":
-            self.yaml_seperators += 1
 
+class PatternCheck(LintCheck):
+    """Check made up only of pattern rules, applied by the pipeline."""
 
-def lint_file(file: TextIO, filename: Optional[str], checks: LintChecks) -> Lints:
-    """Lint a file."""
-    # Instantiate instaces of all checks
-    _checks = [c() for c in checks]
+    regions: FrozenSet[Region] = frozenset()
+
+
+def _overrides(check: LintCheck, method: str) -> bool:
+    return getattr(type(check), method) is not getattr(LintCheck, method)
+
+
+class LintPipeline:
+    """Checks compiled once per run and reused for every file.
+
+    Check instances are created once, and only the hooks a check overrides
+    are called. Per-file state lives in one shared :class:`FileState` that
+    is reset between files, so files must be linted one at a time.
+    """
+
+    def __init__(
+        self,
+        checks: LintChecks,
+        context: Optional[LintContext] = None,
+        rules: Iterable[PatternRule] = (),
+    ) -> None:
+        """Instantiate checks and build the dispatch table.
+
+        Args:
+            checks: check classes to run.
+            context: run-wide context given to every check.
+            rules: pattern rules to apply alongside the rules of the checks.
+        """
+        self.state = FileState()
+        self.checks = [c(context) for c in checks]
+        for c in self.checks:
+            c.state = self.state
+
+        self._resets = [c.reset for c in self.checks if _overrides(c, "reset")]
+        self._filename_checks = [
+            c.check_filename
+            for c in self.checks
+            if Region.FILENAME in c.regions and _overrides(c, "check_filename")
+        ]
+        self._line_checks: Dict[Region, List[Callable[[str, int], Lints]]] = {
+            region: [
+                c.check_line
+                for c in self.checks
+                if region in c.regions and _overrides(c, "check_line")
+            ]
+            for region in (Region.HEADER, Region.BODY)
+        }
+        self._file_checks = [
+            c.check_file for c in self.checks if _overrides(c, "check_file")
+        ]
+        self._fixes = [c.fix for c in self.checks if _overrides(c, "fix")]
+        self._engine = RuleEngine(
+            [*(rule for c in self.checks for rule in c.rules), *rules]
+        )
+
+    @property
+    def incremental(self) -> bool:
+        """Whether lines can be linted again on their own after an edit."""
+        return all(
+            c.incremental
+            for c in self.checks
+            if any(
+                _overrides(c, hook) for hook in ("reset", "check_line", "check_file")
+            )
+        )
+
+    def start(self, filename: Optional[str]) -> None:
+        """Reset state before linting the next file."""
+        self.state.reset(filename)
+        for reset in self._resets:
+            reset()
+
+    def lint_filename(self, filename: Optional[str]) -> Lints:
+        """Lint the name of the current file."""
+        if filename:
+            yield from self._engine.lint(Region.FILENAME, filename, None)
+            for check_filename in self._filename_checks:
+                yield from check_filename(filename)
+
+    def lint_lines(self, lines: Iterable[str], start: int = 1) -> Lints:
+        """Lint lines of the current file, continuing from the current state.
+
+        Args:
+            lines: lines to lint, in order.
+            start: line number of the first line.
+        """
+        state = self.state
+        engine = self._engine
+        header_checks = self._line_checks[Region.HEADER]
+        body_checks = self._line_checks[Region.BODY]
+        header_rules = Region.HEADER in engine
+        body_rules = Region.BODY in engine
+        debug = log.isEnabledFor(logging.DEBUG)
+        for n, line in enumerate(lines, start=start):
+            if debug:
+                log.debug(f"{n:03}: {line.strip()}")
+
+            seperator = line.strip() == "---"
+            if seperator:
+                state.yaml_seperators += 1
+
+            if state.in_header:
+                if header_rules and not seperator:
+                    yield from engine.lint(Region.HEADER, line, n)
+                line_checks = header_checks
+            else:
+                if body_rules:
+                    yield from engine.lint(Region.BODY, line, n)
+                line_checks = body_checks
+
+            for check_line in line_checks:
+                yield from check_line(line, n)
+
+    def finish(self) -> Lints:
+        """Emit the final errors of the current file."""
+        for check_file in self._file_checks:
+            yield from check_file()
+
+    def lint(self, file: Iterable[str], filename: Optional[str]) -> Lints:
+        """Lint a file."""
+        self.start(filename)
+        yield from self.lint_filename(filename)
+        yield from self.lint_lines(file)
+        yield from self.finish()
 
-    # Check filename for lints
-    if filename:
-        for c in _checks:
-            yield from c.check_filename(filename)
+    def fix(self, lint: LintError, line: str) -> Optional[str]:
+        """Line fixed by the first check able to fix lint, None if none can."""
+        for fix in self._fixes:
+            fixed = fix(lint, line)
+            if fixed is not None:
+                return fixed
+        return None
 
-    # Check file content line by line
-    for n, line in enumerate(file, start=1):
-        log.debug(f"{n:03}: {line.strip()}")
+    def fix_lines(
+        self, file: Iterable[str], filename: Optional[str]
+    ) -> Tuple[List[str], List[LintError]]:
+        """Lint a file, fixing each line as soon as it is linted.
 
-        for c in _checks:
-            yield from c.check_line(line, n)
+        With incremental checks, a fixed line is linted again so later fixes
+        see the result of earlier ones. Otherwise each line is only linted
+        once, and one fix handles every match of an error on its line.
 
-    # Check final errors
-    for c in _checks:
-        yield from c.check_file()
+        Returns:
+            the fixed lines, and the lint no check could fix.
+        """
+        self.start(filename)
+        unfixed = list(self.lint_filename(filename))
+        incremental = self.incremental
+        lines = []
+        for n, line in enumerate(file, start=1):
+            line, line_unfixed = self._fix_line(line, n, incremental)
+            lines.append(line)
+            unfixed.extend(line_unfixed)
+        unfixed.extend(self.finish())
+        return lines, unfixed
+
+    def _fix_line(
+        self, line: str, line_num: int, incremental: bool
+    ) -> Tuple[str, List[LintError]]:
+        seperators = self.state.yaml_seperators
+        fixed_errors: Set[str] = set()
+        while True:
+            self.state.yaml_seperators = seperators
+            unfixed = []
+            for lint in list(self.lint_lines([line], line_num)):
+                if lint.error in fixed_errors:
+                    if not incremental:
+                        continue
+                    unfixed.append(lint)
+                    continue
+                fixed = self.fix(lint, line)
+                if fixed is None or fixed == line:
+                    unfixed.append(lint)
+                    continue
+                line = fixed
+                fixed_errors.add(lint.error)
+                if incremental:
+                    break
+            else:
+                return line, unfixed
+
+
+class IncrementalLint:
+    """Lint of an editor buffer, kept up to date as the buffer is edited.
+
+    Lint is cached per line along with the number of header seperators seen
+    after it. An edit only lints the changed lines, and the lines after them
+    until the seperator count matches what it was before the edit, so the
+    header and body regions are known to be unchanged from there on.
+
+    Pipelines with checks that aren't incremental lint the whole buffer on
+    every edit.
+    """
+
+    def __init__(
+        self, pipeline: LintPipeline, text: str = "", filename: Optional[str] = None
+    ) -> None:
+        """Lint the initial text of the buffer."""
+        self.pipeline = pipeline
+        self.filename = filename
+        self.lines: List[str] = []
+        # Lines linted by the last change, for logging
+        self.rechecked = 0
+        self._lints: List[List[LintError]] = []
+        self._seperators: List[int] = []
+        self._filename_lints: List[LintError] = []
+        self._final_lints: List[LintError] = []
+        self.replace(text)
+
+    @property
+    def text(self) -> str:
+        """Current text of the buffer."""
+        return "".join(self.lines)
+
+    @property
+    def lints(self) -> List[LintError]:
+        """Lint of the current text, in the order lint_file reports it."""
+        lints = list(self._filename_lints)
+        for n, line_lints in enumerate(self._lints, start=1):
+            for lint in line_lints:
+                if lint.line is not None and lint.line != n:
+                    lint = replace(lint, line=n)
+                lints.append(lint)
+        lints.extend(self._final_lints)
+        return lints
+
+    def replace(self, text: str) -> None:
+        """Replace the whole buffer."""
+        self.lines = text.splitlines(keepends=True)
+        self._lints = [[] for _ in self.lines]
+        self._seperators = [0] * len(self.lines)
+
+        pipeline = self.pipeline
+        pipeline.start(self.filename)
+        self._filename_lints = list(pipeline.lint_filename(self.filename))
+        self._relint(0, len(self.lines), None)
+
+    def update(self, start: int, end: int, text: str) -> None:
+        """Replace whole lines of the buffer.
+
+        Text that doesn't end a line continues on the line after the edit,
+        and text after a last line without a newline continues that line.
+        Those lines are split again along with the edit.
+
+        Args:
+            start: index of the first line replaced, counting from 0.
+            end: index after the last line replaced, start to insert.
+            text: lines replacing them, possibly empty to delete lines.
+
+        Raises:
+            IndexError: if the lines aren't in the buffer.
+        """
+        if not 0 <= start <= end <= len(self.lines):
+            raise IndexError(f"lines {start}-{end} outside buffer")
+        after = self.lines[end] if end < len(self.lines) else ""
+        if start and _joins(self.lines[start - 1], text or after):
+            start -= 1
+            text = self.lines[start] + text
+        if after and _joins(text, after):
+            text += after
+            end += 1
+        if not self.pipeline.incremental:
+            self.lines[start:end] = text.splitlines(keepends=True)
+            self.replace(self.text)
+            return
+
+        # seperators before the first line after the edit, as last linted
+        old_seperators = self._before(end)
+        new = text.splitlines(keepends=True)
+        self.lines[start:end] = new
+        self._lints[start:end] = [[] for _ in new]
+        self._seperators[start:end] = [0] * len(new)
+
+        self.pipeline.state.filename = self.filename
+        self._relint(start, start + len(new), old_seperators)
+
+    def _before(self, index: int) -> int:
+        return self._seperators[index - 1] if index else 0
+
+    def _relint(self, start: int, stop: int, old_seperators: Optional[int]) -> None:
+        """Lint lines from start, at least up to stop."""
+        pipeline = self.pipeline
+        state = pipeline.state
+        state.yaml_seperators = self._before(start)
+        self.rechecked = 0
+        for i in range(start, len(self.lines)):
+            if i >= stop:
+                if state.yaml_seperators == old_seperators:
+                    break
+                old_seperators = self._seperators[i]
+            self._lints[i] = list(pipeline.lint_lines([self.lines[i]], i + 1))
+            self._seperators[i] = state.yaml_seperators
+            self.rechecked += 1
+
+        state.yaml_seperators = self._before(len(self.lines))
+        self._final_lints = list(pipeline.finish())
+
+
+def _joins(before: str, after: str) -> bool:
+    """Whether the last line of before continues in after."""
+    if not before or not after:
+        return False
+    return len((before[-1] + after[0]).splitlines()) == 1
+
+
+def lint_file(
+    file: TextIO,
+    filename: Optional[str],
+    checks: LintChecks,
+    context: Optional[LintContext] = None,
+    rules: Iterable[PatternRule] = (),
+) -> Lints:
+    """Lint a file."""
+    yield from LintPipeline(checks, context, rules).lint(file, filename)
 
 
 __all__ = [
+    "FileState",
     "HeaderCheck",
+    "IncrementalLint",
+    "line_ending",
     "lint_file",
     "LintCheck",
     "LintChecks",
+    "LintContext",
     "LintError",
+    "LintPipeline",
     "Lints",
+    "PatternCheck",
+    "PatternRule",
+    "Region",
+    "RuleEngine",
+    "unquoted_spans",
 ]
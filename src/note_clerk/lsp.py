@@ -0,0 +1,396 @@
+"""Language server publishing lint as editor diagnostics.
+
+Speaks the Language Server Protocol over stdio, handling only the messages
+needed to keep documents in sync, publish their lint, and offer the fixes
+of checks as quick fixes. Documents, check instances and the run-wide lint
+context stay in memory between edits.
+
+Edits are queued and only linted once no message arrived for the debounce
+delay. Each document is an :class:`~note_clerk.linting.IncrementalLint`, so
+only the lines affected by the queued edits are linted again.
+"""
+from dataclasses import replace
+import json
+import logging
+from pathlib import Path
+import queue
+import threading
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+from urllib.parse import unquote, urlparse
+
+from . import utils
+from .linting import (
+    IncrementalLint,
+    LintChecks,
+    LintContext,
+    LintError,
+    LintPipeline,
+    PatternRule,
+)
+
+log = logging.getLogger(__name__)
+
+
+# Seconds without messages before queued edits are linted
+DEBOUNCE = 0.2
+
+SYNC_INCREMENTAL = 2
+SEVERITY_WARNING = 2
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INVALID_REQUEST = -32600
+QUICK_FIX = "quickfix"
+
+
+class ProtocolError(Exception):
+    """Message isn't valid for the language server protocol."""
+
+
+def read_message(stream: BinaryIO) -> Optional[Any]:
+    """Read one message, or None at the end of the stream.
+
+    Raises:
+        ProtocolError: if the message has no content length or isn't JSON.
+    """
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            break
+        name, _, value = line.decode("ascii").partition(":")
+        if name.strip().lower() == "content-length":
+            try:
+                length = int(value)
+            except ValueError as e:
+                raise ProtocolError(f"invalid Content-Length: {value}") from e
+
+    if length is None:
+        raise ProtocolError("message without Content-Length")
+    try:
+        return json.loads(stream.read(length))
+    except ValueError as e:
+        raise ProtocolError(f"message isn't JSON: {e}") from e
+
+
+def write_message(stream: BinaryIO, message: Dict[str, Any]) -> None:
+    """Write one message."""
+    body = json.dumps(message).encode("utf-8")
+    stream.write(f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+    stream.flush()
+
+
+def utf16_length(text: str) -> int:
+    """Length of text in UTF-16 code units, as positions are counted."""
+    return sum(2 if ord(c) > 0xFFFF else 1 for c in text)
+
+
+def utf16_index(line: str, character: int) -> int:
+    """Index into line of a UTF-16 position, clamped to the line's content."""
+    content = line.rstrip("\r\n")
+    units = 0
+    for i, c in enumerate(content):
+        if units >= character:
+            return i
+        units += 2 if ord(c) > 0xFFFF else 1
+    return len(content)
+
+
+def uri_path(uri: str) -> str:
+    """Path of a file URI, used as the filename of its lint."""
+    parsed = urlparse(uri)
+    if parsed.scheme != "file":
+        return uri
+    return unquote(parsed.path)
+
+
+def diagnostic(lint: LintError, lines: List[str]) -> Dict[str, Any]:
+    """Diagnostic for lint, reaching to the end of its line.
+
+    Lint without a line, like filename lint, is shown on the first line.
+    """
+    line = (lint.line or 1) - 1
+    text = lines[line].rstrip("\r\n") if line < len(lines) else ""
+    column = max((lint.column or 1) - 1, 0)
+    start = utf16_length(text[:column])
+    end = max(utf16_length(text), start)
+    return {
+        "range": {
+            "start": {"line": line, "character": start},
+            "end": {"line": line, "character": end},
+        },
+        "severity": SEVERITY_WARNING,
+        "source": "note-clerk",
+        "code": lint.error,
+        "message": lint.error,
+    }
+
+
+def line_fix(
+    pipeline: LintPipeline, error: str, lines: List[str], line: int
+) -> Optional[Dict[str, Any]]:
+    """Text edit fixing lint with code error on a line, None if it can't."""
+    text = lines[line]
+    fixed = pipeline.fix(LintError(error, line + 1, None), text)
+    if fixed is None or fixed == text:
+        return None
+    content = text.rstrip("\r\n")
+    return {
+        "range": {
+            "start": {"line": line, "character": 0},
+            "end": {"line": line, "character": utf16_length(content)},
+        },
+        "newText": fixed.rstrip("\r\n"),
+    }
+
+
+def apply_change(buffer: IncrementalLint, change: Dict[str, Any]) -> None:
+    """Apply a content change of didChange to a document."""
+    if "range" not in change:
+        buffer.replace(change["text"])
+        return
+
+    lines = buffer.lines
+    start, end = change["range"]["start"], change["range"]["end"]
+    first, last = start["line"], end["line"]
+    head = lines[first] if first < len(lines) else ""
+    tail = lines[last] if last < len(lines) else ""
+    text = (
+        head[: utf16_index(head, start["character"])]
+        + change["text"]
+        + tail[utf16_index(tail, end["character"]) :]
+    )
+    buffer.update(first, min(last + 1, len(lines)), text)
+
+
+class LintServer:
+    """Language server keeping open documents linted."""
+
+    def __init__(
+        self,
+        checks: LintChecks,
+        context: LintContext,
+        rules: List[PatternRule],
+        output: BinaryIO,
+        debounce: float = DEBOUNCE,
+    ) -> None:
+        """Build the lint pipeline shared by every document.
+
+        Args:
+            checks: check classes to run.
+            context: run-wide context, updated as new notes are saved.
+            rules: pattern rules from the config.
+            output: stream messages are written to.
+            debounce: seconds without messages before edits are linted.
+        """
+        self.pipeline = LintPipeline(checks, context, rules)
+        self.context = context
+        self.output = output
+        self.debounce = debounce
+        self.documents: Dict[str, IncrementalLint] = {}
+        # Changes waiting to be linted, None to lint the document again
+        self.pending: Dict[str, List[Optional[Dict[str, Any]]]] = {}
+        self.shutdown = False
+        self.exited = False
+        self._requests: Dict[str, Callable[[Any], Any]] = {
+            "initialize": self._initialize,
+            "shutdown": self._shutdown,
+            "textDocument/codeAction": self._code_action,
+        }
+        self._notifications: Dict[str, Callable[[Any], None]] = {
+            "exit": self._exit,
+            "textDocument/didOpen": self._did_open,
+            "textDocument/didChange": self._did_change,
+            "textDocument/didSave": self._did_save,
+            "textDocument/didClose": self._did_close,
+        }
+
+    def serve(self, stream: BinaryIO) -> int:
+        """Handle messages from stream until the client exits.
+
+        Returns:
+            exit code, an error if the client didn't ask to shut down first.
+        """
+        messages: "queue.Queue[Optional[Any]]" = queue.Queue()
+        reader = threading.Thread(
+            target=self._read, args=(stream, messages), daemon=True
+        )
+        reader.start()
+
+        while not self.exited:
+            try:
+                message = messages.get(timeout=self.debounce if self.pending else None)
+            except queue.Empty:
+                self.publish()
+                continue
+            if message is None:
+                log.info("client closed the connection")
+                break
+            self.handle(message)
+        return 0 if self.shutdown else 1
+
+    def _read(self, stream: BinaryIO, messages: "queue.Queue[Optional[Any]]") -> None:
+        while True:
+            try:
+                message = read_message(stream)
+            except ProtocolError as e:
+                log.warning(f"Ignoring message: {e}")
+                continue
+            messages.put(message)
+            if message is None:
+                return
+
+    def handle(self, message: Any) -> None:
+        """Handle one request or notification."""
+        if not isinstance(message, dict):
+            log.warning(f"Ignoring message: {message!r}")
+            return
+        method = message.get("method")
+        params = message.get("params")
+        if "id" not in message:
+            notification = self._notifications.get(str(method))
+            if notification is None:
+                log.debug(f"ignoring notification {method}")
+                return
+            try:
+                notification(params)
+            except (KeyError, TypeError, IndexError) as e:
+                log.warning(f"Invalid {method} notification: {e}")
+            return
+
+        if method is None:
+            # response to a request of the server, none are sent
+            return
+        request = self._requests.get(method)
+        if request is None:
+            self._respond(message["id"], error=(METHOD_NOT_FOUND, method))
+            return
+        if self.shutdown:
+            self._respond(message["id"], error=(INVALID_REQUEST, "shut down"))
+            return
+        try:
+            result = request(params)
+        except (KeyError, TypeError) as e:
+            self._respond(message["id"], error=(INVALID_PARAMS, str(e)))
+            return
+        self._respond(message["id"], result=result)
+
+    def publish(self) -> None:
+        """Lint queued edits and publish the diagnostics of changed documents."""
+        pending, self.pending = self.pending, {}
+        for uri, changes in pending.items():
+            buffer = self.documents.get(uri)
+            if buffer is None:
+                continue
+            for change in changes:
+                if change is None:
+                    buffer.replace(buffer.text)
+                    continue
+                try:
+                    apply_change(buffer, change)
+                except (KeyError, TypeError, IndexError) as e:
+                    log.warning(f"Invalid change to {uri}: {e}")
+            self._publish(uri, buffer.lints, buffer.lines)
+
+    def _publish(self, uri: str, lints: List[LintError], lines: List[str]) -> None:
+        self._notify(
+            "textDocument/publishDiagnostics",
+            {"uri": uri, "diagnostics": [diagnostic(lint, lines) for lint in lints]},
+        )
+
+    def _respond(
+        self, request_id: Any, result: Any = None, error: Optional[Any] = None
+    ) -> None:
+        message: Dict[str, Any] = {"jsonrpc": "2.0", "id": request_id}
+        if error is None:
+            message["result"] = result
+        else:
+            code, error_message = error
+            message["error"] = {"code": code, "message": error_message}
+        write_message(self.output, message)
+
+    def _notify(self, method: str, params: Any) -> None:
+        write_message(
+            self.output, {"jsonrpc": "2.0", "method": method, "params": params}
+        )
+
+    def _initialize(self, params: Any) -> Dict[str, Any]:
+        return {
+            "capabilities": {
+                "textDocumentSync": {
+                    "openClose": True,
+                    "change": SYNC_INCREMENTAL,
+                    "save": True,
+                },
+                "codeActionProvider": {"codeActionKinds": [QUICK_FIX]},
+            },
+            "serverInfo": {"name": "note-clerk"},
+        }
+
+    def _shutdown(self, params: Any) -> None:
+        self.publish()
+        self.shutdown = True
+
+    def _exit(self, params: Any) -> None:
+        self.exited = True
+
+    def _code_action(self, params: Any) -> List[Dict[str, Any]]:
+        uri = params["textDocument"]["uri"]
+        if uri in self.pending:
+            self.publish()
+        buffer = self.documents.get(uri)
+        if buffer is None:
+            return []
+
+        actions = []
+        for diag in params["context"]["diagnostics"]:
+            if diag.get("source") != "note-clerk":
+                continue
+            line = diag["range"]["start"]["line"]
+            if line >= len(buffer.lines):
+                continue
+            fix = line_fix(self.pipeline, diag["code"], buffer.lines, line)
+            if fix is not None:
+                actions.append(
+                    {
+                        "title": f"Fix {diag['code']}",
+                        "kind": QUICK_FIX,
+                        "diagnostics": [diag],
+                        "edit": {"changes": {uri: [fix]}},
+                    }
+                )
+        return actions
+
+    def _did_open(self, params: Any) -> None:
+        document = params["textDocument"]
+        uri = document["uri"]
+        self.documents[uri] = IncrementalLint(
+            self.pipeline, document["text"], uri_path(uri)
+        )
+        self.pending.setdefault(uri, [])
+
+    def _did_change(self, params: Any) -> None:
+        uri = params["textDocument"]["uri"]
+        if uri in self.documents:
+            self.pending.setdefault(uri, []).extend(params["contentChanges"])
+
+    def _did_save(self, params: Any) -> None:
+        note_id = utils.note_id(Path(uri_path(params["textDocument"]["uri"])))
+        note_ids = self.context.note_ids
+        if note_id is None or note_ids is None or note_id in note_ids:
+            return
+
+        log.debug(f"adding note {note_id} to the lint context")
+        self.context = replace(self.context, note_ids=note_ids | {note_id})
+        for check in self.pipeline.checks:
+            check.context = self.context
+        for uri in self.documents:
+            self.pending.setdefault(uri, []).append(None)
+
+    def _did_close(self, params: Any) -> None:
+        uri = params["textDocument"]["uri"]
+        self.pending.pop(uri, None)
+        if self.documents.pop(uri, None) is not None:
+            self._publish(uri, [], [])
@@ -0,0 +1,102 @@
+"""Lint check discovery.
+
+Checks are registered as entry points in the ``note_clerk.checks`` group,
+for example in a plugin's ``pyproject.toml``::
+
+    [tool.poetry.plugins."note_clerk.checks"]
+    my-check = "my_package.checks:MyCheck"
+
+Entry points are only loaded, and their modules imported, once the check
+is enabled.
+"""
+from importlib import metadata
+import logging
+from typing import Dict, Iterable, List, Sequence, Type
+
+from .linting import LintCheck
+
+log = logging.getLogger(__name__)
+
+
+ENTRY_POINT_GROUP = "note_clerk.checks"
+
+BUILTIN_CHECKS = [
+    metadata.EntryPoint(name, value, ENTRY_POINT_GROUP)
+    for name, value in [
+        ("filename-id", "note_clerk.checks:CheckFilenameId"),
+        ("header-tags-array", "note_clerk.checks:CheckHeaderTagsArray"),
+        ("header-tags-quoted", "note_clerk.checks:CheckHeaderTagsQuoted"),
+        (
+            "header-type-leading-slash",
+            "note_clerk.checks:CheckHeaderTypeLeadingSlash",
+        ),
+        ("link-broken", "note_clerk.checks:CheckLinkBroken"),
+    ]
+]
+
+DEFAULT_CHECKS = [
+    "header-tags-array",
+    "header-tags-quoted",
+]
+
+
+class UnknownChecks(Exception):
+    """Enabled checks that aren't registered."""
+
+    def __init__(self, names: Sequence[str]) -> None:
+        """Initialize with the unknown check names."""
+        super().__init__(f"Unknown checks: {', '.join(names)}")
+        self.names = names
+
+
+def _installed_entry_points() -> Iterable[metadata.EntryPoint]:
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        return entry_points.select(group=ENTRY_POINT_GROUP)  # type: ignore
+    return entry_points.get(ENTRY_POINT_GROUP, [])  # pragma: no cover
+
+
+def available_checks() -> Dict[str, metadata.EntryPoint]:
+    """Map every registered check name to its entry point, without loading it."""
+    available = {ep.name: ep for ep in BUILTIN_CHECKS}
+    for ep in _installed_entry_points():
+        if ep.name in available:
+            log.warning(f'Check "{ep.name}" is already registered, ignoring plugin')
+            continue
+        available[ep.name] = ep
+    return available
+
+
+def enabled_checks(
+    enable: Iterable[str] = (), disable: Iterable[str] = ()
+) -> List[str]:
+    """Names of checks enabled on top of the defaults, in order."""
+    disabled = set(disable)
+    names = [*DEFAULT_CHECKS, *enable]
+    return [n for i, n in enumerate(names) if n not in disabled and n not in names[:i]]
+
+
+def load_checks(names: Iterable[str]) -> List[Type[LintCheck]]:
+    """Load the checks with the given names.
+
+    Args:
+        names: registered names of the checks to load.
+
+    Returns:
+        check classes, in the order requested.
+
+    Raises:
+        UnknownChecks: if any name isn't registered.
+    """
+    _names = list(names)
+    available = available_checks()
+
+    unknown = [n for n in _names if n not in available]
+    if unknown:
+        raise UnknownChecks(unknown)
+
+    checks = []
+    for name in _names:
+        log.debug(f'loading check "{name}" from "{available[name].value}"')
+        checks.append(available[name].load())
+    return checks
@@ -1,9 +1,28 @@
 """Utility Functions for NoteClerk."""
+import codecs
+from dataclasses import dataclass
+import errno
 from inspect import cleandoc as multiline_trim
+import io
 import logging
 import math
-from pathlib import Path
-from typing import Iterable, Iterator, List, Sequence, Tuple
+import os
+from pathlib import Path, PurePath
+import re
+import stat
+import zlib
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 from boltons import iterutils
 
@@ -18,15 +37,58 @@ class FilesNotFound(Exception):
         self.missing = missing
 
 
-def all_files(paths: Iterable[str], check_missing: bool = True) -> Iterator[Path]:
+@dataclass(frozen=True)
+class FileFilter:
+    """Select notes among the files found in directories.
+
+    Patterns are matched against the end of each path, like
+    ``PurePath.match``, so ``*.swp`` or ``attachments/*`` both work.
+    Extensions include the leading dot and are compared in lower case.
+    Ignored files are absolute paths of files that are never notes, like
+    the files the app keeps next to them.
+    """
+
+    include: Sequence[str] = ()
+    exclude: Sequence[str] = ()
+    extensions: FrozenSet[str] = frozenset()
+    ignore: FrozenSet[str] = frozenset()
+
+    def excluded(self, path: PurePath) -> bool:
+        """Whether path matches an exclude pattern."""
+        return any(path.match(pattern) for pattern in self.exclude)
+
+    def selects(self, path: PurePath) -> bool:
+        """Whether the file at path is a note, judged from its path alone."""
+        if self.extensions and path.suffix.lower() not in self.extensions:
+            return False
+        if self.include and not any(path.match(p) for p in self.include):
+            return False
+        if self.ignore and os.path.abspath(path) in self.ignore:
+            return False
+        return not self.excluded(path)
+
+
+ALL_FILES = FileFilter()
+
+
+def all_files(
+    paths: Iterable[str],
+    check_missing: bool = True,
+    file_filter: FileFilter = ALL_FILES,
+    recursive: bool = False,
+) -> Iterator[Path]:
     """Iterate all files or files in directories of the given paths.
 
-    This function does not recurse into directories, but does expand a
-    directories immediate children.
+    By default this function does not recurse into directories, but does
+    expand a directories immediate children.
 
     Args:
         paths: names of files and folders to look for notes.
         check_missing: check if given paths exist before iterating.
+        file_filter: selects which children of directories are used, files
+                     given directly are always used.
+        recursive: also look in subdirectories, except hidden or excluded
+                   ones.
 
     Yields:
         Path to all files given and the immediate children of directories.
@@ -40,17 +102,180 @@ def all_files(paths: Iterable[str], check_missing: bool = True) -> Iterator[Path
     if missing:
         raise FilesNotFound(missing)
 
-    yield from iterutils.unique_iter(filter(lambda f: f.is_file(), _all_files(_paths)))
+    yield from iterutils.unique_iter(_all_files(_paths, file_filter, recursive))
 
 
-def _all_files(paths: Iterable[Path]) -> Iterator[Path]:
+def _all_files(
+    paths: Iterable[Path],
+    file_filter: FileFilter = ALL_FILES,
+    recursive: bool = False,
+) -> Iterator[Path]:
     for file in paths:
-        if file.is_dir():  # pragma: no cover
-            yield from file.iterdir()
-        else:  # pragma: no cover
+        if file.is_dir():
+            yield from _directory_files(file, file_filter, recursive)
+        elif file.is_file():
             yield file
 
 
+def _directory_files(
+    directory: Path, file_filter: FileFilter, recursive: bool
+) -> Iterator[Path]:
+    subdirectories = []
+    # names are checked before the file type, which scandir usually knows
+    # without a stat call
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            path = directory / entry.name
+            if file_filter.selects(path) and entry.is_file():
+                yield path
+            elif (
+                recursive
+                and not entry.name.startswith(".")
+                and not file_filter.excluded(path)
+                and entry.is_dir(follow_symlinks=False)
+            ):
+                subdirectories.append(path)
+    for subdirectory in sorted(subdirectories):
+        yield from _directory_files(subdirectory, file_filter, recursive)
+
+
+@dataclass(frozen=True)
+class Shard:
+    """One of several stable partitions of files, numbered from 1.
+
+    Files are assigned by a hash of their path, so every run splits the
+    same files the same way regardless of machine or file order.
+    """
+
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, value: str) -> "Shard":
+        """Read a shard written as I/N."""
+        index, sep, count = value.partition("/")
+        try:
+            shard = cls(int(index), int(count))
+        except ValueError:
+            shard = cls(0, 0)
+        if not sep or not 1 <= shard.index <= shard.count:
+            raise ValueError(f'"{value}" should be I/N with 1 <= I <= N')
+        return shard
+
+    def __contains__(self, path: Path) -> bool:
+        """Whether path belongs to this shard."""
+        digest = zlib.crc32(path.as_posix().encode("utf-8"))
+        return digest % self.count == self.index - 1
+
+    def __str__(self) -> str:
+        """Shard as I/N."""
+        return f"{self.index}/{self.count}"
+
+
+BINARY_EXTENSIONS = frozenset(
+    [
+        ".7z",
+        ".bmp",
+        ".db",
+        ".doc",
+        ".docx",
+        ".gif",
+        ".gz",
+        ".heic",
+        ".ico",
+        ".jpeg",
+        ".jpg",
+        ".m4a",
+        ".mov",
+        ".mp3",
+        ".mp4",
+        ".pdf",
+        ".png",
+        ".sqlite3",
+        ".tar",
+        ".tiff",
+        ".wav",
+        ".webp",
+        ".xls",
+        ".xlsx",
+        ".zip",
+    ]
+)
+SNIFF_SIZE = 8192
+
+FileIdentity = Tuple[int, int, int, int]
+_text_files: Dict[FileIdentity, bool] = {}
+
+
+def _sniff_text(path: Path) -> bool:
+    with open(path, "rb") as f:
+        block = f.read(SNIFF_SIZE)
+    if b"\0" in block:
+        return False
+    # A multi-byte character may be cut off at the end of a full block
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        decoder.decode(block, final=len(block) < SNIFF_SIZE)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def is_text_file(path: Path) -> bool:
+    """Cheaply check if a file looks like a UTF-8 text file.
+
+    Files with a known binary extension are rejected without being opened.
+    Others are rejected if their first block has NUL bytes or isn't valid
+    UTF-8. Results are cached by device, inode, size and modification time.
+
+    Args:
+        path: file to check.
+
+    Returns:
+        if the file should be read as text.
+    """
+    if path.suffix.lower() in BINARY_EXTENSIONS:
+        return False
+
+    stat = path.stat()
+    identity = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    try:
+        return _text_files[identity]
+    except KeyError:
+        is_text = _text_files[identity] = _sniff_text(path)
+        return is_text
+
+
+NOTE_ID = re.compile(r"^[0-9]+")
+
+
+def note_id(path: Path) -> Optional[str]:
+    """Return the ID of a note from its filename.
+
+    Args:
+        path: path to the note.
+
+    Returns:
+        leading digits of the filename, or None if it doesn't start with an ID.
+    """
+    match = NOTE_ID.match(path.name)
+    if match is None:
+        return None
+    return match.group(0)
+
+
+def note_ids(paths: Iterable[Path]) -> FrozenSet[str]:
+    """Collect the IDs of all given notes.
+
+    Args:
+        paths: paths to notes.
+
+    Returns:
+        set of every note ID found.
+    """
+    return frozenset(filter(None, (note_id(p) for p in paths)))
+
+
 def quoted_paths(paths: Iterable[Path]) -> str:
     """Return space separated list of quoted paths.
 
@@ -110,6 +335,223 @@ def split_header(lines: Sequence[str]) -> Tuple[str, str]:
     return "\n".join(docs), "\n".join(lines[_i:])
 
 
+@dataclass(frozen=True)
+class HeaderSplit:
+    """Header of a note and where its body starts in the source.
+
+    ``pending`` holds the start of the body that was already read from the
+    source while looking for the end of the header. ``newline`` is the line
+    ending of the note's first line, the body is copied with its own.
+    """
+
+    header: str
+    body_offset: int
+    pending: bytes = b""
+    newline: str = "\n"
+
+    def encode(self, header: str) -> bytes:
+        """Bytes of a new header for the note, using its line ending."""
+        return header.replace("\n", self.newline).encode("utf-8")
+
+
+def _line_text(line: bytes) -> str:
+    return line.decode("utf-8").removesuffix("\n").removesuffix("\r")
+
+
+def split_header_stream(source: BinaryIO) -> HeaderSplit:
+    """Read the header of a note, stopping where the body starts.
+
+    Splits the header the same way as :func:`split_header`, but only reads
+    the source up to the first line of the body, so the body can be copied
+    from the source without being held in memory.
+
+    Args:
+        source: note opened in binary mode.
+
+    Returns:
+        header text, offset of the body in source, and the body bytes
+        already read past that offset.
+
+    Raises:
+        UnclosedHeader: if the source ends inside a header document.
+    """
+    offset = source.tell() if source.seekable() else 0
+    line = source.readline()
+    newline = "\r\n" if line.endswith(b"\r\n") else "\n"
+    if _line_text(line) != DOC_SEP:
+        return HeaderSplit("", offset, line, newline)
+
+    docs: List[str] = []
+    doc: Optional[List[str]] = None
+    while line:
+        text = _line_text(line)
+        if doc:
+            doc.append(text)
+
+        if text == DOC_SEP:
+            if doc is None:
+                doc = [text]
+            else:
+                docs.append("\n".join(doc))
+                doc = None
+        elif text == DOC_STOP and doc is not None:
+            docs.append("\n".join(doc))
+            doc = None
+            offset += len(line)
+            line = b""
+            break
+        elif doc is None:
+            break
+
+        offset += len(line)
+        line = source.readline()
+
+    if doc is not None:
+        raise UnclosedHeader()
+
+    return HeaderSplit("\n".join(docs), offset, line, newline)
+
+
+COPY_SIZE = 64 * 1024
+
+# Errors meaning a kernel copy isn't supported between these files
+_NO_KERNEL_COPY = {
+    errno.EBADF,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.ENOTSOCK,
+    errno.EOPNOTSUPP,
+    errno.EXDEV,
+}
+
+
+def _copy_file_range(src_fd: int, dest_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(src_fd, dest_fd, count, offset)  # type: ignore
+
+
+def _sendfile(src_fd: int, dest_fd: int, offset: int, count: int) -> int:
+    return os.sendfile(dest_fd, src_fd, offset, count)
+
+
+KernelCopy = Callable[[int, int, int, int], int]
+
+
+def _kernel_copies() -> List[KernelCopy]:
+    copies: List[KernelCopy] = []
+    if hasattr(os, "copy_file_range"):
+        copies.append(_copy_file_range)
+    if hasattr(os, "sendfile"):
+        copies.append(_sendfile)
+    return copies
+
+
+def copy_range(src_fd: int, dest_fd: int, offset: int, end: int) -> None:
+    """Copy bytes offset to end of src to the current position of dest.
+
+    Uses ``copy_file_range`` or ``sendfile`` so the bytes never pass through
+    Python, falling back to reading and writing when neither works for
+    these files.
+
+    Args:
+        src_fd: file descriptor of a regular file to copy from.
+        dest_fd: file descriptor to copy to.
+        offset: position in src to start copying from.
+        end: position in src to stop copying at.
+
+    Raises:
+        OSError: if copying fails for any other reason.
+    """
+    for copy in _kernel_copies():
+        try:
+            while offset < end:
+                copied = copy(src_fd, dest_fd, offset, end - offset)
+                if copied == 0:
+                    return
+                offset += copied
+            return
+        except OSError as e:
+            if e.errno not in _NO_KERNEL_COPY:
+                raise
+            logger.debug(f"{copy.__name__} not supported: {e}")
+
+    while offset < end:
+        chunk = memoryview(os.pread(src_fd, min(COPY_SIZE, end - offset), offset))
+        if not chunk:
+            return
+        offset += len(chunk)
+        while chunk:
+            chunk = chunk[os.write(dest_fd, chunk) :]
+
+
+def _fileno(file: BinaryIO) -> Optional[int]:
+    try:
+        return file.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def copy_body(source: BinaryIO, split: HeaderSplit, dest: BinaryIO) -> None:
+    """Copy the rest of a note from source to dest, ending with a newline.
+
+    When both are real files the body is copied by the kernel straight from
+    the source, otherwise it is copied in chunks. A missing newline at the
+    end is added with the line ending of the note.
+
+    Args:
+        source: note positioned after the header by :func:`split_header_stream`.
+        split: result of splitting the header of source.
+        dest: binary file to write the body to.
+    """
+    newline = split.newline.encode("utf-8")
+    src_fd = _fileno(source)
+    dest_fd = _fileno(dest)
+    if src_fd is not None and dest_fd is not None:
+        src_stat = os.fstat(src_fd)
+        if stat.S_ISREG(src_stat.st_mode):
+            size = src_stat.st_size
+            dest.flush()
+            copy_range(src_fd, dest_fd, split.body_offset, size)
+            if size > split.body_offset and os.pread(src_fd, 1, size - 1) != b"\n":
+                os.write(dest_fd, newline)
+            return
+
+    last = split.pending[-1:]
+    dest.write(split.pending)
+    for chunk in iter(lambda: source.read(COPY_SIZE), b""):
+        dest.write(chunk)
+        last = chunk[-1:]
+    if last and last != b"\n":
+        dest.write(newline)
+
+
+def same_content(source: BinaryIO, split: HeaderSplit, header: str) -> bool:
+    """Check if writing header and the body of source would change nothing.
+
+    Args:
+        source: seekable note that was split.
+        split: result of splitting the header of source.
+        header: new header text for the note.
+
+    Returns:
+        if the note already has this header and ends with a newline.
+    """
+    if not source.seekable():
+        return False
+    header_bytes = split.encode(header)
+    if len(header_bytes) != split.body_offset:
+        return False
+
+    source.seek(0)
+    if source.read(len(header_bytes)) != header_bytes:
+        return False
+    size = source.seek(0, os.SEEK_END)
+    if size > split.body_offset:
+        source.seek(size - 1)
+        if source.read(1) != b"\n":
+            return False
+    return True
+
+
 def month_to_quarter(x: int) -> int:
     return math.ceil(x / 3)
 
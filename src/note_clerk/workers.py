@@ -0,0 +1,349 @@
+"""Apply file actions to many notes, optionally in parallel.
+
+Actions take an open text file and its name and yield results, like
+``fixing.update_text``. With more than one job, files are handed to a pool
+of worker processes, so actions and their results must be picklable:
+actions should be module level functions.
+
+Files that take too long, or need too much memory, are skipped so a single
+pathological note can't stall a run. Skipped files are logged and, when
+given a list, collected so callers can report an incomplete run. Memory is
+limited per worker process, so a memory limit always runs actions in the
+pool.
+"""
+from collections import Counter, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+import logging
+import multiprocessing
+from multiprocessing.synchronize import Event as EventType
+from pathlib import Path
+import signal
+import threading
+from types import FrameType
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Generator,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from boltons.iterutils import chunked_iter
+
+from . import headers, utils
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore
+
+log = logging.getLogger(__name__)
+unicode_log = logging.getLogger(f"{__name__}.unicode_file")
+limit_log = logging.getLogger(f"{__name__}.file_limit")
+
+
+T = TypeVar("T")
+FileAction = Callable[[TextIO, Optional[str]], Iterable[T]]
+
+CHUNK_SIZE = 64
+# Chunks queued or being worked on per worker process
+CHUNKS_PER_JOB = 2
+
+
+@dataclass(frozen=True)
+class FileLimits:
+    """Resources an action may use for a single file before it is skipped.
+
+    Attributes:
+        timeout: seconds an action may spend on one file.
+        memory: bytes of address space each worker process may use.
+    """
+
+    timeout: Optional[float] = None
+    memory: Optional[int] = None
+
+
+NO_LIMITS = FileLimits()
+
+
+class FileTimeout(BaseException):
+    """Action ran longer than the time limit of a file.
+
+    Not an Exception, so actions handling their own errors can't mistake
+    it for one of them.
+    """
+
+
+class FileSkipped(Exception):
+    """File was skipped for going over its limits."""
+
+    def __init__(self, path: Path, reason: str) -> None:
+        """Record the skipped file and why."""
+        super().__init__(path, reason)
+        self.path = path
+        self.reason = reason
+
+    def __str__(self) -> str:
+        """Describe the skipped file."""
+        return f'Skipped "{self.path}", {self.reason}.'
+
+
+# Action of the current worker process, set once by the pool initializer
+_worker_action: Optional[FileAction] = None
+# Set when the results of a pool are no longer wanted
+_worker_stop: Optional[EventType] = None
+_worker_limits: FileLimits = NO_LIMITS
+
+
+def _timed_out(signum: int, frame: Optional[FrameType]) -> Any:
+    raise FileTimeout()
+
+
+@contextmanager
+def _time_limit(seconds: Optional[float]) -> Iterator[None]:
+    """Raise FileTimeout in the block once it has run for seconds.
+
+    Only the main thread receives alarms, elsewhere the time isn't limited.
+    """
+    if (
+        seconds is None
+        or not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+
+    previous = signal.signal(signal.SIGALRM, _timed_out)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def run_file(action: FileAction, path: Path, limits: FileLimits = NO_LIMITS) -> List[T]:
+    """Apply action to the file at path.
+
+    Files that don't look like text are skipped before being read. Results
+    are collected per file, so a file that still turns out not to be
+    unicode part way through produces no results.
+
+    Raises:
+        FileSkipped: if the action went over the limits for the file.
+    """
+    if not utils.is_text_file(path):
+        unicode_log.warning(f'Skipping "{path}", not a text file.')
+        return []
+    try:
+        log.debug(f"attempting to open '{path}'")
+        with _time_limit(limits.timeout), open(path, "r") as f:
+            return list(action(f, str(path)))
+    except UnicodeDecodeError:
+        unicode_log.warning(f'Unable to open "{path}", not unicode.')
+        return []
+    except FileTimeout as e:
+        raise FileSkipped(path, f"took longer than {limits.timeout:g}s") from e
+    except MemoryError as e:
+        raise FileSkipped(path, "ran out of memory") from e
+
+
+def _try_file(
+    action: FileAction, path: Path, limits: FileLimits
+) -> Union[List[T], FileSkipped]:
+    try:
+        return run_file(action, path, limits)
+    except FileSkipped as e:
+        return e
+
+
+def _file_results(
+    results: Union[List[T], FileSkipped], skipped: Optional[List[FileSkipped]]
+) -> List[T]:
+    """Results of a file, reporting it if it was skipped."""
+    if isinstance(results, FileSkipped):
+        limit_log.warning(str(results))
+        if skipped is not None:
+            skipped.append(results)
+        return []
+    return results
+
+
+def _limit_memory(memory: Optional[int]) -> None:
+    if memory is None:
+        return
+    if resource is None:  # pragma: no cover
+        log.warning("Memory limits aren't supported on this platform")
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        memory = min(memory, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (memory, hard))
+
+
+def _init_worker(
+    action: FileAction,
+    stop: EventType,
+    header_cache: Optional[Path],
+    limits: FileLimits,
+) -> None:
+    global _worker_action, _worker_stop, _worker_limits
+    _worker_action = action
+    _worker_stop = stop
+    _worker_limits = limits
+    headers.configure(header_cache)
+    _limit_memory(limits.memory)
+
+
+def _run_chunk(paths: List[Path]) -> List[Union[List, FileSkipped]]:
+    assert _worker_action is not None and _worker_stop is not None  # noqa: S101
+    results: List[Union[List, FileSkipped]] = []
+    for path in paths:
+        # the rest of the chunk is dropped, nobody is waiting for it
+        if _worker_stop.is_set():
+            break
+        results.append(_try_file(_worker_action, path, _worker_limits))
+    return results
+
+
+def _count(
+    action: FileAction, paths: Iterable[Path], limits: FileLimits
+) -> Tuple[Counter, List[FileSkipped]]:
+    counts: Counter = Counter()
+    skipped = []
+    results: Union[List, FileSkipped]
+    for path in paths:
+        results = _try_file(action, path, limits)
+        if isinstance(results, FileSkipped):
+            skipped.append(results)
+        else:
+            counts.update(results)
+    return counts, skipped
+
+
+def _count_chunk(paths: List[Path]) -> Tuple[Counter, List[FileSkipped]]:
+    assert _worker_action is not None  # noqa: S101
+    return _count(_worker_action, paths, _worker_limits)
+
+
+def _pool(
+    action: FileAction, jobs: int, stop: EventType, limits: FileLimits
+) -> Executor:
+    return ProcessPoolExecutor(
+        jobs,
+        initializer=_init_worker,
+        initargs=(action, stop, headers.cache_path(), limits),
+    )
+
+
+def _bounded_map(
+    pool: Executor, fn: Callable[[List[Path]], T], paths: Iterable[Path], jobs: int
+) -> Iterator[T]:
+    """Apply fn to chunks of paths in the pool, yielding results in order.
+
+    Paths are only read, and chunks submitted, as earlier results are
+    consumed, so at most CHUNKS_PER_JOB chunks per job are in flight.
+    """
+    pending: Deque[Future] = deque()
+    try:
+        for chunk in chunked_iter(paths, CHUNK_SIZE):
+            if len(pending) >= jobs * CHUNKS_PER_JOB:
+                yield pending.popleft().result()
+            pending.append(pool.submit(fn, chunk))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def map_files(
+    action: FileAction[T],
+    paths: Iterable[Path],
+    jobs: int = 1,
+    limits: FileLimits = NO_LIMITS,
+    skipped: Optional[List[FileSkipped]] = None,
+) -> Generator[List[T], None, None]:
+    """Apply action to every file, yielding the results of each file in order.
+
+    Args:
+        action: function applied to each open file.
+        paths: files to apply the action to.
+        jobs: number of worker processes, one runs in this process.
+        limits: limits of each file, files going over them have no results.
+        skipped: list the files going over their limits are added to.
+
+    Yields:
+        list of results for each file.
+
+    Closing the iterator early cancels queued chunks and stops workers
+    after the file they are working on.
+    """
+    if jobs <= 1 and limits.memory is None:
+        for path in paths:
+            yield _file_results(_try_file(action, path, limits), skipped)
+        return
+
+    stop = multiprocessing.Event()
+    pool = _pool(action, jobs, stop, limits)
+    try:
+        for results in _bounded_map(pool, _run_chunk, paths, jobs):
+            for file_results in results:
+                yield _file_results(file_results, skipped)
+    finally:
+        stop.set()
+        pool.shutdown(cancel_futures=True)
+
+
+def count_files(
+    action: FileAction[Hashable],
+    paths: Iterable[Path],
+    jobs: int = 1,
+    limits: FileLimits = NO_LIMITS,
+    skipped: Optional[List[FileSkipped]] = None,
+) -> Counter:
+    """Count the results of action across every file.
+
+    Each worker counts a chunk of files itself, so only the counters are
+    sent back and merged.
+
+    Args:
+        action: function yielding the values to count for each open file.
+        paths: files to apply the action to.
+        jobs: number of worker processes, one runs in this process.
+        limits: limits of each file, files going over them aren't counted.
+        skipped: list the files going over their limits are added to.
+
+    Returns:
+        number of times each value was yielded.
+    """
+    if jobs <= 1 and limits.memory is None:
+        chunks: Iterable[Tuple[Counter, List[FileSkipped]]] = [
+            _count(action, paths, limits)
+        ]
+        return _merge_counts(chunks, skipped)
+
+    with _pool(action, jobs, multiprocessing.Event(), limits) as pool:
+        return _merge_counts(_bounded_map(pool, _count_chunk, paths, jobs), skipped)
+
+
+def _merge_counts(
+    chunks: Iterable[Tuple[Counter, List[FileSkipped]]],
+    skipped: Optional[List[FileSkipped]],
+) -> Counter:
+    counts: Counter = Counter()
+    for chunk_counts, chunk_skipped in chunks:
+        counts.update(chunk_counts)
+        for file_skipped in chunk_skipped:
+            _file_results(file_skipped, skipped)
+    return counts
@@ -41,6 +41,7 @@ class FixCase(Case):
     fixed: str = ""
     filename: str = "-"
     newname: str = ""
+    newline: str = "\n"
     skip: bool = False
     xfail: Optional[str] = None
 
@@ -49,6 +50,8 @@ class FixCase(Case):
         if self.fixed == "":
             self.fixed = self.original
         self.fixed = inline_note(self.fixed, trailing_newline=True)
+        self.original = self.original.replace("\n", self.newline)
+        self.fixed = self.fixed.replace("\n", self.newline)
         if self.newname == "":
             self.newname = self.filename
 
@@ -149,6 +152,27 @@ FIXES = [
         """,
         filename="123456789012345.md",
     ),
+    FixCase(
+        name="CRLF notes keep their line endings",
+        original="""
+        ---
+        a: 1
+        ---
+        ---
+        b: 2
+        ---
+        body
+        """,
+        fixed="""
+        ---
+        a: 1
+        b: 2
+        ---
+        body
+        """,
+        filename="00000000000000.md",
+        newline="\r\n",
+    ),
     FixCase(
         name="Multi-indent list unchanged",
         original="""
@@ -159,6 +183,31 @@ FIXES = [
         - 2
         """,
     ),
+    FixCase(
+        name="Header only note unchanged",
+        original="""
+        ---
+        type: note
+        ---
+        """,
+    ),
+    FixCase(
+        name="Header only note collapses",
+        original="""
+        ---
+        type: note
+        ---
+        ---
+        tags: ["#a"]
+        ---
+        """,
+        fixed="""
+        ---
+        type: note
+        tags: ['#a']
+        ---
+        """,
+    ),
     FixCase(
         name="Multi-indent list unchanged",
         original="""
@@ -53,3 +53,21 @@ def test_lints(
     )
 
     assert lints == errors
+
+
+@pytest.mark.parametrize(
+    "line,fixed",
+    [
+        ("tags: a, b\n", 'tags: ["a", "b"]\n'),
+        ("tags: #a #b\n", 'tags: ["#a", "#b"]\n'),
+        ("tags: foo  # my comment\n", 'tags: ["foo"]  # my comment\n'),
+        ('tags: "a # b"\n', 'tags: ["a # b"]\n'),
+        ("tags:  # listed below\n", None),
+        ("tags:\n", None),
+    ],
+)
+def test_fix(line: str, fixed: str) -> None:
+    """Test tags are wrapped in an array, keeping comments out of it."""
+    lint = linting.LintError("header-tags-array", 2, 5)
+
+    assert checks.CheckHeaderTagsArray().fix(lint, line) == fixed
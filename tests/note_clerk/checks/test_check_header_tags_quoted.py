@@ -88,3 +88,20 @@ def test_lints(
     )
 
     assert lints == errors
+
+
+@pytest.mark.parametrize(
+    "line,fixed",
+    [
+        ("tags: [#a, #b]\n", 'tags: ["#a", "#b"]\n'),
+        ('tags: ["foo #bar"]\n', 'tags: ["foo #bar"]\n'),
+        ('tags: [#a, "#b c"]\n', 'tags: ["#a", "#b c"]\n'),
+        ("tags: [#a, 'it''s #b']\n", "tags: [\"#a\", 'it''s #b']\n"),
+        ("title: #a\n", None),
+    ],
+)
+def test_fix(line: str, fixed: str) -> None:
+    """Test tags are quoted, leaving # inside quoted scalars alone."""
+    lint = linting.LintError("header-tags-quoted", 2, 7)
+
+    assert checks.CheckHeaderTagsQuoted().fix(lint, line) == fixed
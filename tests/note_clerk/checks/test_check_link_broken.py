@@ -0,0 +1,93 @@
+"""Test broken link check."""
+
+from io import StringIO
+import logging
+from typing import Optional
+
+import pytest
+
+from note_clerk import checks, linting
+from .utils import LintDetails, LintErrors
+from ..._utils import inline_note, paramaterize_cases, ParamCase
+
+log = logging.getLogger(__name__)
+
+
+NOTE_IDS = frozenset(["20200101000000", "20200102000000"])
+
+
+LINT_CASES = [
+    ParamCase(
+        id="NO_LINKS",
+        variables=LintDetails(
+            content=inline_note("A note without links."),
+            errors=[],
+        ),
+    ),
+    ParamCase(
+        id="EXISTING_LINK",
+        variables=LintDetails(
+            content=inline_note("See [[20200101000000|first]]."),
+            errors=[],
+        ),
+    ),
+    ParamCase(
+        id="EXISTING_BARE_LINK",
+        variables=LintDetails(
+            content=inline_note("See [[20200102000000]]."),
+            errors=[],
+        ),
+    ),
+    ParamCase(
+        id="BROKEN_LINK",
+        variables=LintDetails(
+            content=inline_note("See [[20200103000000|missing]]."),
+            errors=[linting.LintError("link-broken", line=1, column=5)],
+        ),
+    ),
+    ParamCase(
+        id="MIXED_LINKS",
+        variables=LintDetails(
+            content=inline_note(
+                """
+                # Title
+                [[20200101000000|ok]] and [[1234|missing]]
+                """
+            ),
+            errors=[linting.LintError("link-broken", line=2, column=27)],
+        ),
+    ),
+]
+
+
+@pytest.mark.parametrize(**paramaterize_cases(LINT_CASES))
+def test_lints(
+    content: str,
+    errors: LintErrors,
+) -> None:
+    """Test lints are identified correctly."""
+    lints = list(
+        linting.lint_file(
+            file=StringIO(content),
+            filename=None,
+            checks=[checks.CheckLinkBroken],
+            context=linting.LintContext(note_ids=NOTE_IDS),
+        )
+    )
+
+    assert lints == errors
+
+
+@pytest.mark.parametrize("context", [None, linting.LintContext()])
+def test_no_note_ids(context: Optional[linting.LintContext]) -> None:
+    """Test links aren't checked when the note IDs are unknown."""
+    lints = list(
+        linting.lint_file(
+            file=StringIO("[[20200103000000|missing]]\n"),
+            filename=None,
+            checks=[checks.CheckLinkBroken],
+            context=context,
+        )
+    )
+
+    assert lints == []
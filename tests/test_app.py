@@ -1,7 +1,12 @@
+from pathlib import Path
+import re
+
 import pytest
 
-from note_clerk.app import App
-from note_clerk.linting import LintCheck
+from note_clerk import checks, utils, workers
+from note_clerk.app import App, InvalidConfig
+from note_clerk.linting import LintCheck, PatternRule, Region
+from ._utils import FileFactory, inline_note
 
 
 @pytest.fixture
@@ -16,3 +21,207 @@ def test_lint_checks(app: App) -> None:
 
     for check in checks:
         assert issubclass(check, LintCheck)
+
+
+def test_config_missing(app: App) -> None:
+    """Test config is empty without a config file."""
+    assert app.config == {}
+
+
+def test_lint_checks_from_config(
+    tmpdir, file_factory: FileFactory  # noqa: ANN001
+) -> None:
+    """Test checks are enabled and disabled from the config file."""
+    file_factory(
+        "config.yaml",
+        "checks:\n  enable: [filename-id]\n  disable: [link-broken]\n",
+    )
+
+    lint_checks = App(config_dir=str(tmpdir)).lint_checks
+
+    assert lint_checks == [
+        checks.CheckHeaderTagsArray,
+        checks.CheckHeaderTagsQuoted,
+        checks.CheckFilenameId,
+    ]
+
+
+def test_lint_rules_from_config(
+    tmpdir, file_factory: FileFactory  # noqa: ANN001
+) -> None:
+    """Test pattern rules are defined in the config file."""
+    file_factory(
+        "config.yaml",
+        inline_note(
+            """
+            rules:
+            - code: body-todo
+              pattern: TODO
+            - code: header-status
+              region: header
+              prefix: "status: "
+              column: 8
+            """
+        ),
+    )
+
+    lint_rules = App(config_dir=str(tmpdir)).lint_rules
+
+    assert lint_rules == [
+        PatternRule("body-todo", Region.BODY, pattern="TODO"),
+        PatternRule("header-status", Region.HEADER, prefix="status: ", column=8),
+    ]
+
+
+@pytest.mark.parametrize(
+    "rule,message",
+    [
+        ("{pattern: TODO}", "missing a code"),
+        ("{code: x, pattern: TODO, colum: 1}", "unknown keys: ['colum']"),
+        ("{code: x, region: footer, pattern: TODO}", "'footer' is not a valid"),
+        ("{code: x, pattern: '(TODO'}", "missing ), unterminated subpattern"),
+        ("{code: x}", "exactly one of pattern or prefix"),
+    ],
+)
+def test_lint_rules_invalid(
+    tmpdir, file_factory: FileFactory, rule: str, message: str  # noqa: ANN001
+) -> None:
+    """Test invalid rules in the config file are rejected."""
+    file_factory("config.yaml", f"rules:\n- {rule}\n")
+
+    with pytest.raises(InvalidConfig, match=re.escape(message)):
+        App(config_dir=str(tmpdir)).lint_rules
+
+
+def test_lint_context(tmpdir, file_factory: FileFactory) -> None:  # noqa: ANN001
+    """Test lint_context collects the IDs of notes in the notes directory tree."""
+    file_factory("20200101000000.md")
+    file_factory("20200102000000 Titled.md")
+    file_factory("untitled.md")
+    (Path(str(tmpdir)) / "2020").mkdir()
+    file_factory("2020/20200103000000.md")
+
+    context = App(config_dir=str(tmpdir)).lint_context
+
+    assert context.note_ids == frozenset(
+        ["20200101000000", "20200102000000", "20200103000000"]
+    )
+
+
+def test_lint_context_missing_notes_dir(tmpdir) -> None:  # noqa: ANN001
+    """Test lint_context doesn't know any IDs without a notes directory."""
+    context = App(config_dir=str(Path(str(tmpdir)) / "missing")).lint_context
+
+    assert context.note_ids is None
+
+
+def test_file_filter_default(app: App) -> None:
+    """Test every file but the app's own is a note without a files config."""
+    assert app.file_filter == utils.FileFilter(ignore=app.file_filter.ignore)
+    assert not app.file_filter.selects(app.config_dir / "config.yaml")
+    assert app.file_filter.selects(app.config_dir / "note.md")
+
+
+def test_file_filter_from_config(
+    tmpdir, file_factory: FileFactory  # noqa: ANN001
+) -> None:
+    """Test file filters are read from the config file."""
+    file_factory(
+        "config.yaml",
+        inline_note(
+            """
+            files:
+              extensions: [md, .TXT]
+              include: ["2*"]
+              exclude: ["*.swp", ".git"]
+            """
+        ),
+    )
+
+    file_filter = App(config_dir=str(tmpdir)).file_filter
+
+    assert file_filter == utils.FileFilter(
+        include=("2*",),
+        exclude=("*.swp", ".git"),
+        extensions=frozenset([".md", ".txt"]),
+        ignore=file_filter.ignore,
+    )
+
+
+@pytest.mark.parametrize(
+    "files,message",
+    [
+        ("{exclud: [a]}", "unknown keys: ['exclud']"),
+        ("{exclude: a}", '"exclude" should be a list of strings'),
+        ("{extensions: [1]}", '"extensions" should be a list of strings'),
+    ],
+)
+def test_file_filter_invalid(
+    tmpdir, file_factory: FileFactory, files: str, message: str  # noqa: ANN001
+) -> None:
+    """Test invalid file filters in the config file are rejected."""
+    file_factory("config.yaml", f"files: {files}\n")
+
+    with pytest.raises(InvalidConfig, match=re.escape(message)):
+        App(config_dir=str(tmpdir)).file_filter
+
+
+def test_app_files_ignored(tmpdir, file_factory: FileFactory) -> None:  # noqa: ANN001
+    """Test the files the app keeps in the config directory aren't notes."""
+    file_factory("config.yaml", "checks: {}\n")
+    names = [
+        "fix-journal.jsonl",
+        "fix-journal.jsonl.lock",
+        "index.sqlite3",
+        "index.sqlite3-wal",
+        "header-cache.sqlite3",
+        "header-cache.sqlite3-journal",
+    ]
+    for name in names:
+        file_factory(name)
+    note = file_factory("note.md")
+    (Path(str(tmpdir)) / "sub").mkdir()
+    nested = file_factory("sub/config.yaml")
+
+    file_filter = App(config_dir=str(tmpdir)).file_filter
+    files = utils.all_files([str(tmpdir)], file_filter=file_filter, recursive=True)
+
+    assert sorted(files) == [note, nested]
+
+
+def test_header_cache_path(tmpdir, file_factory: FileFactory) -> None:  # noqa: ANN001
+    """Test the header cache file is only used when enabled."""
+    assert App(config_dir=str(tmpdir)).header_cache_path is None
+
+    file_factory("config.yaml", "cache:\n  headers: true\n")
+
+    path = App(config_dir=str(tmpdir)).header_cache_path
+    assert path == Path(str(tmpdir)) / "header-cache.sqlite3"
+
+
+def test_file_limits(tmpdir, file_factory: FileFactory) -> None:  # noqa: ANN001
+    """Test file limits are read from the config file, memory in megabytes."""
+    assert App(config_dir=str(tmpdir)).file_limits == workers.NO_LIMITS
+
+    file_factory("config.yaml", "limits:\n  timeout: 2.5\n  memory: 512\n")
+
+    limits = App(config_dir=str(tmpdir)).file_limits
+    assert limits == workers.FileLimits(timeout=2.5, memory=512 * 2**20)
+
+
+@pytest.mark.parametrize(
+    "limits,message",
+    [
+        ("{time: 1}", "Limits has unknown keys: ['time']"),
+        ("{timeout: soon}", 'Limits "timeout" should be a number'),
+        ("{memory: 0}", 'Limits "memory" should be positive'),
+    ],
+)
+def test_file_limits_invalid(
+    tmpdir, file_factory: FileFactory, limits: str, message: str  # noqa: ANN001
+) -> None:
+    """Test invalid file limits in the config file are rejected."""
+    file_factory("config.yaml", f"limits: {limits}\n")
+
+    with pytest.raises(InvalidConfig, match=re.escape(message)):
+        App(config_dir=str(tmpdir)).file_limits
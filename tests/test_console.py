@@ -1,8 +1,14 @@
 """note-clerk application tests."""
+from pathlib import Path
+from typing import Any, List
+
 from click.testing import CliRunner
+import pytest
+from pytest_mock import MockFixture
 
 import note_clerk
-from note_clerk import console
+from note_clerk import console, workers
+from ._utils import FileFactory
 
 
 def test_main(cli_runner: CliRunner) -> None:
@@ -25,3 +31,45 @@ def test_info(cli_runner: CliRunner) -> None:
     assert result.exit_code == 0
 
     assert result.output == 'Configuration Directory: "."\n'
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        ["lint"],
+        ["fix"],
+        ["fix", "--batch"],
+        ["fix", "--rules"],
+        ["analyze", "list-tags"],
+        ["analyze", "list-tags", "--count"],
+        ["analyze", "list-types"],
+        ["analyze", "list-types", "--count"],
+        ["analyze", "header-conflicts"],
+        ["analyze", "all", "--tags-output", "-"],
+    ],
+)
+def test_skipped_files_exit_code(
+    cli_runner: CliRunner,
+    file_factory: FileFactory,
+    mocker: MockFixture,
+    caplog: pytest.LogCaptureFixture,
+    command: List[str],
+) -> None:
+    """Commands exit with their own code when a file went over its limits."""
+    note = file_factory("note.md", '---\ntags: ["#a"]\n---\ntext #b\n')
+    slow = file_factory("slow.md", "text\n")
+    run_file = workers.run_file
+
+    def skip_slow(action: Any, path: Path, *args: Any) -> List[Any]:
+        if path == slow:
+            raise workers.FileSkipped(path, "took longer than 1s")
+        return run_file(action, path, *args)
+
+    mocker.patch.object(workers, "run_file", side_effect=skip_slow)
+    result = cli_runner.invoke(
+        console.cli,
+        ["--config-dir", str(note.parent), *command, str(note), str(slow)],
+    )
+
+    assert result.exit_code == console.SKIPPED_EXIT
+    assert f'Skipped "{slow}", took longer than 1s.' in caplog.text
@@ -0,0 +1,100 @@
+"""Test analyzing notes with a single pass."""
+from pathlib import Path
+from unittest.mock import PropertyMock
+
+from click.testing import CliRunner
+import pytest
+from pytest_mock import MockFixture
+
+from note_clerk import checks, console
+from ._utils import inline_header, show_output
+
+
+@pytest.fixture
+def checks_mock(mocker: MockFixture) -> PropertyMock:
+    """Only check tags are arrays."""
+    checks_mock = PropertyMock()
+    checks_mock.return_value = [checks.CheckHeaderTagsArray]
+    mocker.patch("note_clerk.console.App.lint_checks", checks_mock)
+    return checks_mock
+
+
+def create_notes() -> None:
+    """Create notes in the current directory."""
+    Path("a.md").write_text(inline_header("type: journal\ntags: #one"))
+    Path("b.md").write_text("A #two note\n")
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_analyze_all(
+    cli_runner: CliRunner, checks_mock: PropertyMock, jobs: str
+) -> None:
+    """Test every output gets the same results as the separate commands."""
+    with cli_runner.isolated_filesystem():
+        create_notes()
+
+        result = cli_runner.invoke(
+            console.cli,
+            [
+                "analyze",
+                "all",
+                "--lint-output=lint.txt",
+                "--tags-output=tags.txt",
+                "--types-output=types.txt",
+                f"--jobs={jobs}",
+                "a.md",
+                "b.md",
+            ],
+        )
+        outputs = [Path(f"{o}.txt").read_text() for o in ["lint", "tags", "types"]]
+        separate = [
+            cli_runner.invoke(console.cli, [*command, "a.md", "b.md"]).output
+            for command in [
+                ["lint"],
+                ["analyze", "list-tags"],
+                ["analyze", "list-types"],
+            ]
+        ]
+
+    show_output(result)
+    assert result.exit_code == 10
+    assert outputs == separate
+    assert outputs[0] == "a.md:3:5 | header-tags-array\n"
+
+
+def test_analyze_all_only_selected(cli_runner: CliRunner) -> None:
+    """Test only analyses with an output are run."""
+    with cli_runner.isolated_filesystem():
+        create_notes()
+
+        result = cli_runner.invoke(
+            console.cli, ["analyze", "all", "--types-output=-", "."]
+        )
+
+    show_output(result)
+    assert result.exit_code == 0
+    assert result.output == "journal\t'a.md'\n"
+
+
+def test_analyze_all_stdin(cli_runner: CliRunner, checks_mock: PropertyMock) -> None:
+    """Test notes from stdin are analyzed."""
+    result = cli_runner.invoke(
+        console.cli,
+        ["analyze", "all", "--lint-output=-", "--tags-output=-", "-"],
+        input=inline_header("tags: #one"),
+    )
+
+    show_output(result)
+    assert result.exit_code == 10
+    assert result.output == (
+        "stdin:2:5 | header-tags-array\n#one\t'stdin:2:7'\tHEADER_TAGS\n"
+    )
+
+
+def test_analyze_all_needs_output(cli_runner: CliRunner) -> None:
+    """Test at least one analysis is selected."""
+    result = cli_runner.invoke(console.cli, ["analyze", "all", "-"])
+
+    show_output(result)
+    assert result.exit_code == 2
+    assert "Give at least one of the output options." in result.output
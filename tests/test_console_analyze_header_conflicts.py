@@ -0,0 +1,96 @@
+"""Test reporting header conflicts."""
+import io
+from pathlib import Path
+
+from click.testing import CliRunner
+import pytest
+
+from note_clerk import console, fixing
+from ._utils import show_output
+
+
+def create_notes() -> None:
+    """Create notes with conflicting headers in the current directory."""
+    Path("a.md").write_text(
+        "---\ntags: [x]\ntitle: A\n---\n---\ntags: [y]\ntitle: B\n---\nbody\n"
+    )
+    Path("b.md").write_text("---\ncount: 1\ncount: 2\n---\n---\ncount: 3\n---\n")
+    Path("c.md").write_text("---\ntags: [z]\n---\n")
+    Path("d.md").write_text("---\ntitle: [\n---\n")
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_header_conflicts(cli_runner: CliRunner, jobs: str) -> None:
+    with cli_runner.isolated_filesystem():
+        create_notes()
+
+        result = cli_runner.invoke(
+            console.cli, ["analyze", "header-conflicts", "--jobs", jobs, "."]
+        )
+    show_output(result)
+
+    assert result.exit_code == 10
+    assert result.output.splitlines() == [
+        "Lists combined (mergeable): 1",
+        "    a.md:6 | tags",
+        "Unable to join integers (unmergeable): 1",
+        "    b.md:6 | count",
+        "Unable to join constants (unmergeable): 1",
+        "    a.md:7 | title",
+        "Duplicate Key found in header document (unmergeable): 1",
+        "    b.md:3 | count",
+        "Malformed header (unmergeable): 1",
+        "    d.md:3",
+    ]
+
+
+def test_header_conflicts_mergeable(cli_runner: CliRunner) -> None:
+    result = cli_runner.invoke(
+        console.cli,
+        ["analyze", "header-conflicts", "-"],
+        input="---\ncreated: 2020-01-02\n---\n---\ncreated: 2020-01-01\n---\n",
+    )
+    show_output(result)
+
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        "Earliest date kept (mergeable): 1",
+        "    stdin:5 | created",
+    ]
+
+
+def test_header_conflicts_none(cli_runner: CliRunner) -> None:
+    result = cli_runner.invoke(
+        console.cli, ["analyze", "header-conflicts", "-"], input="---\na: 1\n---\n"
+    )
+
+    assert result.exit_code == 0
+    assert result.output == ""
+
+
+def test_header_conflicts_parse_dates_once() -> None:
+    fixing.parse_created.cache_clear()
+    header = '---\ncreated: "2020-01-02"\n---\n---\ncreated: "2020-01-01"\n---\n'
+    text = io.TextIOWrapper(io.BytesIO(header.encode("utf-8")))
+
+    conflicts = list(fixing.header_conflicts(text, "a.md"))
+
+    assert [c.kind for c in conflicts] == [fixing.ConflictKind.DATES]
+    info = fixing.parse_created.cache_info()
+    assert info.hits + info.misses == 2
+
+
+def test_header_conflicts_agree_with_fix(cli_runner: CliRunner) -> None:
+    """YAML 1.1 booleans like yes are strings, as they are for fix."""
+    with cli_runner.isolated_filesystem():
+        Path("a.md").write_text("---\ndraft: yes\n---\n---\ndraft: true\n---\n")
+
+        conflicts = cli_runner.invoke(console.cli, ["analyze", "header-conflicts", "."])
+        fixed = cli_runner.invoke(console.cli, ["fix", "a.md"])
+
+    assert conflicts.exit_code == 10
+    assert conflicts.output.splitlines() == [
+        "Unable to join integers (unmergeable): 1",
+        "    a.md:5 | draft",
+    ]
+    assert fixed.exit_code == 10
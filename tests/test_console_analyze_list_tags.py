@@ -1,13 +1,14 @@
 """note-clerk application tests."""
 from dataclasses import dataclass
 import logging
+import random
 from typing import List, TypedDict
 
 
 from click.testing import CliRunner
 import pytest
 
-from note_clerk import console
+from note_clerk import analysis, console
 from ._utils import inline_header, inline_note, paramaterize_cases, ParamCase
 
 
@@ -196,3 +197,89 @@ def test_analyze_list_tags(cli_runner: CliRunner, files: Files, output: str) ->
 
     assert result.exit_code == 0
     assert result.output == expected_output
+
+
+COUNT_FILES = [
+    FileInfo(filename="a.txt", content=inline_header('tags: ["#one", "#two"]')),
+    FileInfo(filename="b.txt", content="#one and #one again, also #three"),
+]
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+@pytest.mark.parametrize(
+    "option,output",
+    [
+        ("--count", "#one\t3\n#three\t1\n#two\t1\n"),
+        ("--summary", "BODY\t3\nHEADER_TAGS\t2\n"),
+    ],
+)
+def test_analyze_list_tags_counts(
+    cli_runner: CliRunner, option: str, output: str, jobs: str
+) -> None:
+    """Test tags are counted instead of listed."""
+    with cli_runner.isolated_filesystem():
+        for file in COUNT_FILES:
+            file.create()
+
+        result = cli_runner.invoke(
+            console.cli, ["analyze", "list-tags", option, "--jobs", jobs, "."]
+        )
+
+    print(result.output, end="")
+
+    assert result.exit_code == 0
+    assert result.output == output
+
+
+def test_analyze_list_tags_parallel(cli_runner: CliRunner) -> None:
+    """Test tags listed by workers come out in file order."""
+    with cli_runner.isolated_filesystem():
+        for file in COUNT_FILES:
+            file.create()
+
+        serial = cli_runner.invoke(console.cli, ["analyze", "list-tags", "."])
+        parallel = cli_runner.invoke(
+            console.cli, ["analyze", "list-tags", "-j", "2", "."]
+        )
+
+    assert parallel.exit_code == 0
+    assert parallel.output == serial.output
+
+
+def test_analyze_list_tags_count_stdin(cli_runner: CliRunner) -> None:
+    """Test tags from stdin are counted."""
+    result = cli_runner.invoke(
+        console.cli, ["analyze", "list-tags", "--count", "-"], input="#a #b #a\n"
+    )
+
+    assert result.exit_code == 0
+    assert result.output == "#a\t2\n#b\t1\n"
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "#a #b",
+        "x#a '#b' \"#c\" `#d`",
+        "##a ###b #",
+        "#a#b #.c #a.b #a/b",
+        "\u00a0#nbsp \t#tab",
+        "#" * 1000 + "a",
+        "# " * 1000,
+    ],
+)
+def test_find_tags_matches_regex(line: str) -> None:
+    """Test find_tags finds the same tags as TAG_FINDER."""
+    expected = [(m.start(), m.group(0)) for m in analysis.TAG_FINDER.finditer(line)]
+
+    assert list(analysis.find_tags(line)) == expected
+
+
+def test_find_tags_random_lines() -> None:
+    """Test find_tags against TAG_FINDER on random lines."""
+    rng = random.Random(50)
+    alphabet = "##ab1 \t\"'`.,!]|)}/\\-_"
+    for _ in range(2000):
+        line = "".join(rng.choice(alphabet) for _ in range(rng.randrange(30)))
+        expected = [(m.start(), m.group(0)) for m in analysis.TAG_FINDER.finditer(line)]
+        assert list(analysis.find_tags(line)) == expected, line
@@ -1,14 +1,21 @@
 """note-clerk application tests."""
 from dataclasses import dataclass
 import logging
+from pathlib import Path
 from typing import List, TypedDict
 
 
 from click.testing import CliRunner
 import pytest
 
-from note_clerk import console
-from ._utils import inline_header, inline_note, paramaterize_cases, ParamCase
+from note_clerk import console, headers
+from ._utils import (
+    inline_header,
+    inline_note,
+    paramaterize_cases,
+    ParamCase,
+    show_output,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -75,6 +82,27 @@ CASES = [
             output="",
         ),
     ),
+    ParamCase(
+        id="SECOND_HEADER_DOCUMENT",
+        variables=AnalyzeDetails(
+            files=[FileInfo("---\na: 1\n---\n---\ntype: foo\n---\n")],
+            output="",
+        ),
+    ),
+    ParamCase(
+        id="DUPLICATE_KEY",
+        variables=AnalyzeDetails(
+            files=[FileInfo(inline_header("type: foo\ntype: bar"))],
+            output="bar\t'test.txt'",
+        ),
+    ),
+    ParamCase(
+        id="MALFORMED_HEADER",
+        variables=AnalyzeDetails(
+            files=[FileInfo(inline_header("type: [foo"))],
+            output="",
+        ),
+    ),
 ]
 
 
@@ -97,6 +125,25 @@ def test_analyze_list_types(cli_runner: CliRunner, files: Files, output: str) ->
     assert result.output == expected_output
 
 
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_analyze_list_types_count(cli_runner: CliRunner, jobs: str) -> None:
+    """Test notes are counted by type."""
+    with cli_runner.isolated_filesystem():
+        FileInfo(inline_header("type: foo"), filename="a.txt").create()
+        FileInfo(inline_header("type: bar"), filename="b.txt").create()
+        FileInfo(inline_header("type: foo"), filename="c.txt").create()
+        FileInfo("no type", filename="d.txt").create()
+
+        result = cli_runner.invoke(
+            console.cli, ["analyze", "list-types", "--count", "-j", jobs, "."]
+        )
+
+    print(result.output, end="")
+
+    assert result.exit_code == 0
+    assert result.output == "foo\t2\nbar\t1\n"
+
+
 class FVDetails(TypedDict):
     """Parameterixed details for file value location."""
 
@@ -166,3 +213,34 @@ def test_file_value_file_location(fv: console.FileValue, file_location: str) ->
     result = fv.file_location()
 
     assert result == file_location
+
+
+def test_analyze_list_types_header_cache(cli_runner: CliRunner) -> None:
+    """Test parsed headers are persisted when the cache is enabled."""
+    with cli_runner.isolated_filesystem():
+        Path("config.yaml").write_text("cache:\n  headers: true\n")
+        FileInfo(inline_header("type: foo"), filename="a.txt").create()
+
+        for _ in range(2):
+            result = cli_runner.invoke(
+                console.cli, ["analyze", "list-types", "--count", "-j", "2", "a.txt"]
+            )
+            show_output(result)
+            assert result.output == "foo\t1\n"
+
+        cache = headers.HeaderCache(Path("header-cache.sqlite3"))
+        assert cache._load(headers.header_digest("---\ntype: foo\n---"))
+        cache.close()
+    headers.configure(None)
+
+
+def test_header_cache_unused_without_headers(cli_runner: CliRunner) -> None:
+    """Test commands that don't parse headers leave the cache alone."""
+    with cli_runner.isolated_filesystem():
+        Path("config.yaml").write_text("cache:\n  headers: true\n")
+        FileInfo(inline_header("type: foo"), filename="a.txt").create()
+
+        cli_runner.invoke(console.cli, ["analyze", "list-tags", "a.txt"])
+
+        assert not Path("header-cache.sqlite3").exists()
+        assert headers.cache_path() is None
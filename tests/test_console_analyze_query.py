@@ -0,0 +1,104 @@
+"""Test the header index commands."""
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from note_clerk import console
+from ._utils import inline_header, show_output
+
+
+def create_notes() -> None:
+    """Create notes in the current directory."""
+    Path("1.md").write_text(inline_header('type: journal\ntags: ["#work"]'))
+    Path("2.md").write_text(inline_header('type: journal\ntags: ["#home"]'))
+    Path("3.md").write_text(inline_header("type: resource"))
+
+
+def test_index_and_query(cli_runner: CliRunner) -> None:
+    with cli_runner.isolated_filesystem():
+        create_notes()
+
+        indexed = cli_runner.invoke(console.cli, ["analyze", "index"])
+        reindexed = cli_runner.invoke(console.cli, ["analyze", "index"])
+        result = cli_runner.invoke(
+            console.cli, ["analyze", "query", "--type", "journal", "--tag", "#work"]
+        )
+        expected = f"{Path('1.md').resolve()}\n"
+
+    show_output(result)
+    assert indexed.output == "3 updated, 0 unchanged, 0 removed\n"
+    assert reindexed.output == "0 updated, 3 unchanged, 0 removed\n"
+    assert result.exit_code == 0
+    assert result.output == expected
+
+
+def test_index_notes_dir_subdirectories(cli_runner: CliRunner) -> None:
+    with cli_runner.isolated_filesystem():
+        create_notes()
+        Path("projects").mkdir()
+        Path("projects/4.md").write_text(inline_header("type: project"))
+
+        indexed = cli_runner.invoke(console.cli, ["analyze", "index"])
+        result = cli_runner.invoke(
+            console.cli, ["analyze", "query", "--type", "project"]
+        )
+        expected = f"{Path('projects/4.md').resolve()}\n"
+
+    show_output(result)
+    assert indexed.output == "4 updated, 0 unchanged, 0 removed\n"
+    assert result.output == expected
+
+
+def test_query_count_by(cli_runner: CliRunner) -> None:
+    with cli_runner.isolated_filesystem():
+        create_notes()
+
+        cli_runner.invoke(console.cli, ["analyze", "index", "."])
+        result = cli_runner.invoke(
+            console.cli, ["analyze", "query", "--count-by", "type"]
+        )
+
+    show_output(result)
+    assert result.exit_code == 0
+    assert result.output == "journal\t2\nresource\t1\n"
+
+
+def test_query_where(cli_runner: CliRunner) -> None:
+    with cli_runner.isolated_filesystem():
+        create_notes()
+
+        cli_runner.invoke(console.cli, ["analyze", "index"])
+        result = cli_runner.invoke(
+            console.cli, ["analyze", "query", "--where", "type=resource"]
+        )
+        expected = f"{Path('3.md').resolve()}\n"
+
+    show_output(result)
+    assert result.exit_code == 0
+    assert result.output == expected
+
+
+def test_query_where_invalid(cli_runner: CliRunner) -> None:
+    result = cli_runner.invoke(console.cli, ["analyze", "query", "--where", "type"])
+
+    show_output(result)
+    assert result.exit_code == 2
+    assert '"type" should be KEY=VALUE' in result.output
+
+
+def test_query_without_index(cli_runner: CliRunner) -> None:
+    with cli_runner.isolated_filesystem():
+        result = cli_runner.invoke(console.cli, ["analyze", "query"])
+
+    show_output(result)
+    assert result.exit_code == 1
+    assert "No index found" in result.output
+
+
+def test_index_missing_paths(cli_runner: CliRunner) -> None:
+    with cli_runner.isolated_filesystem():
+        result = cli_runner.invoke(console.cli, ["analyze", "index", "missing"])
+
+    show_output(result)
+    assert result.exit_code == 2
+    assert 'these do not: "missing"' in result.output
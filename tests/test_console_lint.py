@@ -1,7 +1,7 @@
 """Test general note linting."""
 import logging
 from pathlib import Path
-from typing import TypedDict
+from typing import List, TypedDict
 from unittest.mock import PropertyMock
 
 
@@ -9,7 +9,7 @@ from click.testing import CliRunner
 import pytest
 from pytest_mock import MockFixture
 
-from note_clerk import console, linting
+from note_clerk import checks, console, linting
 from ._utils import inline_header, inline_note, paramaterize_cases, ParamCase
 
 
@@ -125,6 +125,55 @@ def test_lint_file_dirty(
     assert result.output == f"{filename}:1:1 | a-fake-error\n"
 
 
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_lint_files_jobs(cli_runner: CliRunner, mocker: MockFixture, jobs: str) -> None:
+    """Test every file is linted with several jobs."""
+    checks_mock = PropertyMock(return_value=[checks.CheckHeaderTagsArray])
+    mocker.patch("note_clerk.console.App.lint_checks", checks_mock)
+
+    with cli_runner.isolated_filesystem():
+        for i in range(200):
+            Path(f"{i:03}.md").write_text(
+                inline_header("tags: #a" if i % 7 else "a: 1")
+            )
+
+        result = cli_runner.invoke(console.cli, ["lint", "--jobs", jobs, "."])
+
+    assert result.exit_code == 10
+    assert sorted(result.output.splitlines()) == [
+        f"{i:03}.md:2:5 | header-tags-array" for i in range(200) if i % 7
+    ]
+
+
+@pytest.mark.parametrize(
+    "options,expected",
+    [
+        (["--fail-fast"], 1),
+        (["--max-errors", "3"], 3),
+        (["--max-errors", "1000"], 171),
+        (["--fail-fast", "--jobs", "2"], 1),
+        (["--max-errors", "3", "--jobs", "2"], 3),
+    ],
+)
+def test_lint_limited(
+    cli_runner: CliRunner, mocker: MockFixture, options: List[str], expected: int
+) -> None:
+    """Test linting stops once enough lint is found."""
+    checks_mock = PropertyMock(return_value=[checks.CheckHeaderTagsArray])
+    mocker.patch("note_clerk.console.App.lint_checks", checks_mock)
+
+    with cli_runner.isolated_filesystem():
+        for i in range(200):
+            Path(f"{i:03}.md").write_text(
+                inline_header("tags: #a" if i % 7 else "a: 1")
+            )
+
+        result = cli_runner.invoke(console.cli, ["lint", *options, "."])
+
+    assert result.exit_code == 10
+    assert len(result.output.splitlines()) == expected
+
+
 def test_lint_sub_file_dirty(
     cli_runner: CliRunner, checks_mock_dirty: PropertyMock
 ) -> None:
@@ -208,6 +257,129 @@ def test_lint_binary_file(cli_runner: CliRunner, checks_mock: PropertyMock) -> N
     assert result.exit_code == 0
 
 
+def test_lint_broken_link(cli_runner: CliRunner, checks_mock: PropertyMock) -> None:
+    """Test links are checked against the notes in the notes directory."""
+    checks_mock.return_value = [checks.CheckLinkBroken]
+
+    with cli_runner.isolated_filesystem():
+        with open("20200101000000.md", "w") as f:
+            f.write("[[20200101000000|self]] [[20200102000000|missing]]\n")
+
+        result = cli_runner.invoke(console.cli, ["lint", "20200101000000.md"])
+
+    print(result.output, end="")
+
+    assert result.exit_code == 10
+    assert result.output == "20200101000000.md:1:25 | link-broken\n"
+
+
+def test_lint_skips_note_ids(cli_runner: CliRunner, mocker: MockFixture) -> None:
+    """Test note IDs aren't collected unless an enabled check needs them."""
+    context_mock = mocker.patch(
+        "note_clerk.console.App.lint_context", new_callable=PropertyMock
+    )
+
+    with cli_runner.isolated_filesystem():
+        result = cli_runner.invoke(
+            console.cli, ["lint", "-"], input="[[20200101000000|x]]\n"
+        )
+
+    assert result.exit_code == 0
+    context_mock.assert_not_called()
+
+
+def test_lint_unknown_check(cli_runner: CliRunner) -> None:
+    """Test configuring an unknown check is an error."""
+    with cli_runner.isolated_filesystem():
+        with open("config.yaml", "w") as f:
+            f.write("checks:\n  enable: [not-a-check]\n")
+
+        result = cli_runner.invoke(console.cli, ["lint", "-"], input=FAKE_CONTENT)
+
+    print(result.output, end="")
+
+    assert result.exit_code == 1
+    assert "Unknown checks: not-a-check" in result.output
+
+
+def test_lint_config_rules(cli_runner: CliRunner, checks_mock: PropertyMock) -> None:
+    """Test pattern rules from the config file are applied."""
+    with cli_runner.isolated_filesystem():
+        with open("config.yaml", "w") as f:
+            f.write("rules:\n- {code: body-todo, pattern: TODO}\n")
+
+        result = cli_runner.invoke(
+            console.cli, ["lint", "-"], input="Write a TODO here\n"
+        )
+
+    print(result.output, end="")
+
+    assert result.exit_code == 10
+    assert result.output == "stdin:1:8 | body-todo\n"
+
+
+def test_lint_config_rules_inline_flags(
+    cli_runner: CliRunner, checks_mock: PropertyMock
+) -> None:
+    """Test rules with inline flags or backreferences are applied."""
+    with cli_runner.isolated_filesystem():
+        with open("config.yaml", "w") as f:
+            f.write(
+                "rules:\n"
+                "- {code: body-todo, pattern: '(?i)todo'}\n"
+                "- {code: body-double, pattern: '(\\w)\\1'}\n"
+            )
+
+        result = cli_runner.invoke(
+            console.cli, ["lint", "-"], input="Write a todo soon\n"
+        )
+
+    print(result.output, end="")
+
+    assert result.exit_code == 10
+    assert result.output == "stdin:1:8 | body-todo\nstdin:1:14 | body-double\n"
+
+
+def test_lint_invalid_config_rules(cli_runner: CliRunner) -> None:
+    """Test invalid pattern rules are an error."""
+    with cli_runner.isolated_filesystem():
+        with open("config.yaml", "w") as f:
+            f.write("rules:\n- {code: body-todo}\n")
+
+        result = cli_runner.invoke(console.cli, ["lint", "-"], input=FAKE_CONTENT)
+
+    print(result.output, end="")
+
+    assert result.exit_code == 1
+    assert 'Rule "body-todo" is invalid' in result.output
+
+
+def test_lint_config_files(
+    cli_runner: CliRunner, checks_mock_dirty: PropertyMock
+) -> None:
+    """Test files in directories are selected by the config file."""
+    with cli_runner.isolated_filesystem():
+        Path("config.yaml").write_text("files: {extensions: [md], exclude: ['.*']}\n")
+        for name in ["note.md", ".note.md", "image.png", "notes.txt"]:
+            Path(name).write_text(FAKE_CONTENT)
+
+        result = cli_runner.invoke(console.cli, ["lint", "."])
+
+    assert result.exit_code == 10
+    assert result.output == "note.md:1:1 | a-fake-error\n"
+
+
+def test_lint_invalid_config_files(cli_runner: CliRunner) -> None:
+    """Test invalid file filters are an error."""
+    with cli_runner.isolated_filesystem():
+        Path("config.yaml").write_text("files: {exclude: '*.swp'}\n")
+
+        result = cli_runner.invoke(console.cli, ["lint", "."])
+
+    assert result.exit_code == 1
+    assert 'Files "exclude" should be a list of strings' in result.output
+
+
 class FixDetails(TypedDict):
     """Parameterized details for lint --fix."""
 
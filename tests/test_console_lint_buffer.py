@@ -0,0 +1,56 @@
+"""Test linting editor buffers."""
+import json
+from unittest.mock import PropertyMock
+
+from click.testing import CliRunner
+import pytest
+from pytest_mock import MockFixture
+
+from note_clerk import checks, console
+from ._utils import inline_header, show_output
+
+
+@pytest.fixture(autouse=True)
+def checks_mock(mocker: MockFixture) -> PropertyMock:
+    """Only check tags are arrays."""
+    checks_mock = PropertyMock()
+    checks_mock.return_value = [checks.CheckHeaderTagsArray]
+    mocker.patch("note_clerk.console.App.lint_checks", checks_mock)
+    return checks_mock
+
+
+def test_lint_buffer(cli_runner: CliRunner) -> None:
+    edits = [
+        {"text": inline_header("a: 1")},
+        {"start": 1, "end": 2, "text": 'tags: "#a"\n'},
+        {"start": 0, "text": "\n"},
+        {"start": 2, "end": 3, "text": "tags: []\n"},
+    ]
+    stdin = "\n".join(json.dumps(edit) for edit in edits) + "\n"
+
+    result = cli_runner.invoke(console.cli, ["lint-buffer", "note.md"], input=stdin)
+    show_output(result)
+
+    assert result.exit_code == 0
+    assert [json.loads(line) for line in result.output.splitlines()] == [
+        [],
+        [{"filename": "note.md", "line": 2, "column": 5, "error": "header-tags-array"}],
+        [{"filename": "note.md", "line": 3, "column": 5, "error": "header-tags-array"}],
+        [],
+    ]
+
+
+@pytest.mark.parametrize(
+    "edit",
+    ["not json", "{}", '{"start": "1", "text": ""}', '{"start": 4, "text": ""}'],
+)
+def test_lint_buffer_bad_edit(cli_runner: CliRunner, edit: str) -> None:
+    result = cli_runner.invoke(
+        console.cli, ["lint-buffer"], input=f'{{"text": "a\\n"}}\n{edit}\n'
+    )
+    show_output(result)
+
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert lines[0] == "[]"
+    assert "error" in json.loads(lines[1])
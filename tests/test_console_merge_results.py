@@ -0,0 +1,100 @@
+"""Test sharded runs and merging their results."""
+import json
+from pathlib import Path
+from unittest.mock import PropertyMock
+
+from click.testing import CliRunner
+import pytest
+from pytest_mock import MockFixture
+
+from note_clerk import checks, console
+from ._utils import inline_header, show_output
+
+
+@pytest.fixture(autouse=True)
+def checks_mock(mocker: MockFixture) -> PropertyMock:
+    """Only check tags are arrays."""
+    checks_mock = PropertyMock()
+    checks_mock.return_value = [checks.CheckHeaderTagsArray]
+    mocker.patch("note_clerk.console.App.lint_checks", checks_mock)
+    return checks_mock
+
+
+def create_notes() -> None:
+    """Create notes in the current directory, most with lint."""
+    for i in range(20):
+        Path(f"{i:02}.md").write_text(inline_header("tags: #a" if i % 5 else "a: 1"))
+
+
+EXPECTED = [f"{i:02}.md:2:5 | header-tags-array" for i in range(20) if i % 5]
+
+
+def test_shards_merge(cli_runner: CliRunner) -> None:
+    with cli_runner.isolated_filesystem():
+        create_notes()
+
+        outputs = []
+        for i in range(1, 4):
+            result = cli_runner.invoke(
+                console.cli, ["lint", "--json", "--shard", f"{i}/3", "."]
+            )
+            show_output(result)
+            Path(f"shard-{i}.jsonl").write_text(result.output)
+            outputs.append(result.output.splitlines())
+
+        merged = cli_runner.invoke(
+            console.cli,
+            ["merge-results", "shard-1.jsonl", "shard-2.jsonl", "shard-3.jsonl"],
+        )
+
+    assert all(outputs)
+    assert sum(len(o) for o in outputs) == len(EXPECTED)
+    assert merged.exit_code == 10
+    assert merged.output.splitlines() == EXPECTED
+
+
+def test_shard_json(cli_runner: CliRunner) -> None:
+    with cli_runner.isolated_filesystem():
+        create_notes()
+
+        result = cli_runner.invoke(console.cli, ["lint", "--json", "--shard=1/1", "."])
+
+    assert result.exit_code == 10
+    lints = sorted(json.loads(line)["filename"] for line in result.output.splitlines())
+    assert lints == [line.split(":")[0] for line in EXPECTED]
+
+
+def test_merge_results_json(cli_runner: CliRunner) -> None:
+    lint = {"filename": "a.md", "line": None, "column": None, "error": "e"}
+    result = cli_runner.invoke(
+        console.cli,
+        ["merge-results", "--json", "-"],
+        input=f"{json.dumps(lint)}\n\n{json.dumps(lint)}\n",
+    )
+
+    assert result.exit_code == 10
+    assert result.output == json.dumps(lint) + "\n"
+
+
+def test_merge_results_clean(cli_runner: CliRunner) -> None:
+    result = cli_runner.invoke(console.cli, ["merge-results", "-"], input="")
+
+    assert result.exit_code == 0
+    assert result.output == ""
+
+
+def test_merge_results_invalid(cli_runner: CliRunner) -> None:
+    result = cli_runner.invoke(
+        console.cli, ["merge-results", "-"], input="a.md:1:1 | error\n"
+    )
+
+    assert result.exit_code == 1
+    assert ":1 is not JSON lint output" in result.output
+
+
+@pytest.mark.parametrize("shard", ["0/3", "4/3", "x"])
+def test_shard_invalid(cli_runner: CliRunner, shard: str) -> None:
+    result = cli_runner.invoke(console.cli, ["lint", "--shard", shard, "-"], input="")
+
+    assert result.exit_code == 2
+    assert "I/N" in result.output
@@ -1,11 +1,17 @@
 import datetime as dt
+import io
 import logging
+from pathlib import Path
+import pickle
+import time
 from typing import Any, List, Optional
 
 from click.testing import CliRunner
 import pytest
+from pytest_mock import MockFixture
 
 from note_clerk import console, fixing
+from note_clerk.journal import FixJournal
 from ._utils import FileFactory, show_output
 from .fix_cases import file_cases, FixCase, FIXES, stdin_cases, UNFIXABLE, UnfixableCase
 
@@ -40,7 +46,7 @@ def test_fixes_files(
     assert result.exit_code == 0
 
     fixed_note = file_factory(case.newname, path_only=True)
-    with fixed_note.open() as f:
+    with fixed_note.open(newline="") as f:
         fixed = f.read()
 
     assert fixed == case.fixed
@@ -78,6 +84,28 @@ def test_unfixible_files(
     [
         (dt.datetime(2020, 1, 1), dt.datetime(2020, 1, 1)),
         ("2020-01-01", dt.datetime(2020, 1, 1)),
+        ("2020-11-15T05:42:49", dt.datetime(2020, 11, 15, 5, 42, 49)),
+        (
+            "2020-11-15T05:42:49.301Z",
+            dt.datetime(2020, 11, 15, 5, 42, 49, 301000, tzinfo=dt.timezone.utc),
+        ),
+        (
+            "2021-01-22T20:22:59-0700",
+            dt.datetime(
+                2021, 1, 22, 20, 22, 59, tzinfo=dt.timezone(-dt.timedelta(hours=7))
+            ),
+        ),
+        (
+            "2021-01-22 20:22:59+05:30",
+            dt.datetime(
+                2021, 1, 22, 20, 22, 59, tzinfo=dt.timezone(dt.timedelta(hours=5.5))
+            ),
+        ),
+        ("Jan 2 2020", dt.datetime(2020, 1, 2)),
+        (
+            "2020-11-15T05:42:49.3Z",
+            dt.datetime(2020, 11, 15, 5, 42, 49, 300000, tzinfo=dt.timezone.utc),
+        ),
     ],
     ids=lambda v: f"{type(v).__name__}-{v}",
 )
@@ -85,6 +113,19 @@ def test_as_date(test_value: fixing.DateLike, expected: dt.datetime) -> None:
     assert fixing.as_date(test_value) == expected
 
 
+def test_parse_created_fast_path(mocker: MockFixture) -> None:
+    fixing.parse_created.cache_clear()
+    parse_date = mocker.patch("note_clerk.fixing.parse_date")
+
+    for _ in range(3):
+        fixing.merge_values(
+            "created", "2020-11-15T05:42:49.301Z", "2021-01-22T20:22:59-0700"
+        )
+
+    parse_date.assert_not_called()
+    assert fixing.parse_created.cache_info().hits == 4
+
+
 @pytest.mark.parametrize(
     "x,y,expected",
     [
@@ -148,3 +189,284 @@ def test_fix_filename_dosnt_overwrite(
     assert fixing.fix_filename(str(note)) == str(correct)
     # for i, overlap in enumerate(overlaps):
     assert correct.name == expected
+
+
+def test_unchanged_file_not_rewritten(
+    cli_runner: CliRunner, file_factory: FileFactory
+) -> None:
+    note = file_factory("00000000000000.md", "---\ntype: note\n---\n# Title\n")
+    inode = note.stat().st_ino
+
+    result = cli_runner.invoke(console.cli, ["fix", str(note)])
+
+    assert result.exit_code == 0
+    assert note.stat().st_ino == inode
+
+
+def test_unchanged_file_renamed(
+    cli_runner: CliRunner, file_factory: FileFactory
+) -> None:
+    note = file_factory("1234.md", "---\ntype: note\n---\n# Title\n")
+    inode = note.stat().st_ino
+
+    result = cli_runner.invoke(console.cli, ["fix", str(note)])
+    renamed = file_factory("12340000000000.md", path_only=True)
+
+    assert result.exit_code == 0
+    assert not note.exists()
+    assert renamed.stat().st_ino == inode
+    assert renamed.read_text() == "---\ntype: note\n---\n# Title\n"
+
+
+@pytest.mark.parametrize("case", file_cases(FIXES))
+def test_fixes_files_batch(
+    cli_runner: CliRunner,
+    file_factory: FileFactory,
+    tmp_path: Path,
+    case: FixCase,
+) -> None:
+    note = file_factory(case.filename, case.original)
+    config_dir = tmp_path / "config"
+    result = cli_runner.invoke(
+        console.cli,
+        ["--config-dir", str(config_dir), "fix", "--batch", str(note)],
+    )
+    show_output(result)
+    assert result.exit_code == 0
+
+    fixed_note = file_factory(case.newname, path_only=True)
+    assert fixed_note.read_bytes().decode("utf-8") == case.fixed
+    if case.filename != case.newname:
+        assert not note.exists()
+    assert not (config_dir / "fix-journal.jsonl").exists()
+    assert not list(fixed_note.parent.glob(".*.fix"))
+
+
+def test_fix_batch_unfixable(
+    cli_runner: CliRunner, file_factory: FileFactory, tmp_path: Path
+) -> None:
+    fixable = file_factory("1234.md", "---\na: 1\n---\n---\nb: 2\n---\n")
+    unfixable = file_factory("5678.md", "---\na: 1\n---\n---\na: 2\n---\n")
+    result = cli_runner.invoke(
+        console.cli,
+        ["--config-dir", str(tmp_path), "fix", "--batch", str(fixable), str(unfixable)],
+    )
+
+    assert result.exit_code == 10
+    assert file_factory("12340000000000.md", path_only=True).exists()
+    assert unfixable.exists()
+
+
+def test_fix_batch_same_target(
+    cli_runner: CliRunner, file_factory: FileFactory, tmp_path: Path
+) -> None:
+    short = file_factory("1234.md", "---\na: 1\n---\n")
+    longer = file_factory("12340.md", "---\na: 2\n---\n")
+    result = cli_runner.invoke(
+        console.cli,
+        ["--config-dir", str(tmp_path), "fix", "--batch", str(short), str(longer)],
+    )
+
+    assert result.exit_code == 0
+    assert not short.exists() and not longer.exists()
+    fixed = [file_factory(f"1234000000000{i}.md", path_only=True) for i in (0, 1)]
+    assert sorted(f.read_text() for f in fixed) == [
+        "---\na: 1\n---\n",
+        "---\na: 2\n---\n",
+    ]
+
+
+def test_fix_batch_locked(
+    cli_runner: CliRunner, file_factory: FileFactory, tmp_path: Path
+) -> None:
+    note = file_factory("1234.md", "---\na: 1\n---\n")
+    with FixJournal(tmp_path / "fix-journal.jsonl") as running:
+        result = cli_runner.invoke(
+            console.cli,
+            ["--config-dir", str(tmp_path), "fix", "--batch", str(note)],
+        )
+        unbatched = cli_runner.invoke(
+            console.cli, ["--config-dir", str(tmp_path), "fix", str(note)]
+        )
+        assert running.path.exists()
+
+    assert result.exit_code == 1
+    assert "Another fix run is using" in result.output
+    assert unbatched.exit_code == 0
+    assert file_factory("12340000000000.md", path_only=True).exists()
+
+
+def test_fix_corrupt_journal(
+    cli_runner: CliRunner, file_factory: FileFactory, tmp_path: Path
+) -> None:
+    note = file_factory("1234.md", "---\na: 1\n---\n")
+    journal = tmp_path / "fix-journal.jsonl"
+    journal.write_text('{"source": "a", "target": "b", "moved": true}\n')
+
+    result = cli_runner.invoke(
+        console.cli, ["--config-dir", str(tmp_path), "fix", str(note)]
+    )
+
+    assert result.exit_code == 1
+    assert "Corrupt fix journal" in result.output
+    assert journal.exists()
+    assert note.exists()
+
+
+def _stall(*args: Any) -> None:
+    time.sleep(5)
+
+
+@pytest.mark.parametrize("stalled", ["fix_header", "copy_body"])
+@pytest.mark.parametrize("batch", [[], ["--batch"]])
+def test_fix_timeout(
+    cli_runner: CliRunner,
+    file_factory: FileFactory,
+    tmp_path: Path,
+    mocker: MockFixture,
+    caplog: pytest.LogCaptureFixture,
+    stalled: str,
+    batch: List[str],
+) -> None:
+    """Notes taking too long to fix are skipped, leaving no staging files."""
+    text = "---\na: 1\n---\n---\nb: 2\n---\nbody\n"
+    note = file_factory("12340000000000.md", text)
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    (config_dir / "config.yaml").write_text("limits:\n  timeout: 0.2\n")
+    module = fixing if stalled == "fix_header" else fixing.utils
+    mocker.patch.object(module, stalled, side_effect=_stall)
+
+    result = cli_runner.invoke(
+        console.cli, ["--config-dir", str(config_dir), "fix", *batch, str(note)]
+    )
+
+    assert result.exit_code == console.SKIPPED_EXIT
+    assert "took longer than 0.2s" in caplog.text
+    assert "Unable to fix" not in caplog.text
+    assert note.read_text() == text
+    assert sorted(p.name for p in tmp_path.iterdir()) == [note.name, "config"]
+
+
+def test_fix_note_memory_error(mocker: MockFixture) -> None:
+    """Running out of memory isn't mistaken for an unfixable note."""
+    mocker.patch.object(fixing, "fix_header", side_effect=MemoryError)
+
+    with pytest.raises(MemoryError):
+        fixing.fix_note(io.BytesIO(b"---\na: 1\n---\n"), "1234.md")
+
+
+def test_update_text_pickles() -> None:
+    """Fix actions can be sent to worker processes started with spawn."""
+    assert pickle.loads(pickle.dumps(fixing.update_text)) is fixing.update_text
+
+
+def test_fix_batch_stdin(cli_runner: CliRunner, tmp_path: Path) -> None:
+    result = cli_runner.invoke(
+        console.cli, ["--config-dir", str(tmp_path), "fix", "--batch", "-"], input=""
+    )
+
+    assert result.exit_code == 2
+
+
+def test_fix_recovers_journal(
+    cli_runner: CliRunner, file_factory: FileFactory, tmp_path: Path
+) -> None:
+    note = file_factory("1234.md", "---\na: 1\n---\n")
+    staged = file_factory(".12340000000000.md.x.fix", "---\na: 2\n---\n")
+    target = staged.parent / "12340000000000.md"
+    (tmp_path / "fix-journal.jsonl").write_text(
+        f'{{"source": "{staged}", "target": "{target}",'
+        f' "staged": true, "remove": "{note}"}}\n{{"commit": true}}\n'
+    )
+
+    result = cli_runner.invoke(
+        console.cli, ["--config-dir", str(tmp_path), "fix", str(target)]
+    )
+
+    assert result.exit_code == 0
+    assert not note.exists()
+    assert target.read_text() == "---\na: 2\n---\n"
+    assert not (tmp_path / "fix-journal.jsonl").exists()
+
+
+@pytest.mark.parametrize(
+    "key,x,y,expected",
+    [
+        ("tags", ["a"], ["b"], fixing.ConflictKind.LISTS),
+        ("title", "a", "a", fixing.ConflictKind.EQUAL),
+        ("created", "2020-01-01", "2020-01-02", fixing.ConflictKind.DATES),
+        ("created", "2020-01-01", "2020-01-02T00:00Z", fixing.ConflictKind.TIMEZONES),
+        ("created", "2020-01-01", "not a date", fixing.ConflictKind.INVALID_DATES),
+        ("count", 1, "b", fixing.ConflictKind.INTEGERS),
+        ("title", "a", "b", fixing.ConflictKind.CONSTANTS),
+    ],
+)
+def test_conflict_kind(key: str, x: Any, y: Any, expected: fixing.ConflictKind) -> None:
+    assert fixing.conflict_kind(key, x, y) is expected
+    if expected.mergeable:
+        fixing.merge_values(key, x, y)
+    else:
+        with pytest.raises(fixing.UnableFix, match=expected.value):
+            fixing.merge_values(key, x, y)
+
+
+@pytest.mark.parametrize(
+    "original,fixed",
+    [
+        ('---\ntags: "#a"\n---\n', '---\ntags: ["#a"]\n---\n'),
+        ("---\ntags: #a, #b\n---\n#c\n", '---\ntags: ["#a", "#b"]\n---\n#c\n'),
+        ('---\ntags: [#a, "#b", #c]\n---\n', '---\ntags: ["#a", "#b", "#c"]\n---\n'),
+        ("---\ntags:[#a]\n---\n", '---\ntags: ["#a"]\n---\n'),
+        ("---\ntype: //note\n---\n", "---\ntype: note\n---\n"),
+    ],
+)
+def test_fix_rules_stdin(
+    cli_runner: CliRunner, tmp_path: Path, original: str, fixed: str
+) -> None:
+    (tmp_path / "config.yaml").write_text(
+        "checks:\n  enable: [header-type-leading-slash]\n"
+    )
+    result = cli_runner.invoke(
+        console.cli,
+        ["--config-dir", str(tmp_path), "fix", "--rules", "-"],
+        input=original,
+    )
+    show_output(result)
+
+    assert result.exit_code == 0
+    assert result.output == fixed
+
+
+def test_fix_rules_files(
+    cli_runner: CliRunner,
+    file_factory: FileFactory,
+    tmp_path: Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    fixable = file_factory("1234.md", "---\ntags: #a\n---\n---\nb: 2\n---\n")
+    clean = file_factory("5678.md", '---\ntags: ["#a"]\n---\n')
+    unfixable = file_factory("9012.md", "---\ntags:\n  - '#a'\ntitle: #1\n---\n")
+    mtime = clean.stat().st_mtime_ns
+
+    result = cli_runner.invoke(
+        console.cli,
+        ["--config-dir", str(tmp_path), "fix", "--rules", str(fixable.parent)],
+    )
+    show_output(result)
+
+    assert result.exit_code == 10
+    assert "9012.md:2:5': header-tags-array" in caplog.text
+    assert "9012.md:4:7': header-tags-quoted" in caplog.text
+    assert fixable.read_text() == '---\ntags: ["#a"]\n---\n---\nb: 2\n---\n'
+    assert clean.stat().st_mtime_ns == mtime
+    assert unfixable.read_text() == "---\ntags:\n  - '#a'\ntitle: #1\n---\n"
+
+
+def test_fix_rules_batch(cli_runner: CliRunner, tmp_path: Path) -> None:
+    result = cli_runner.invoke(
+        console.cli,
+        ["--config-dir", str(tmp_path), "fix", "--rules", "--batch", str(tmp_path)],
+    )
+
+    assert result.exit_code == 2
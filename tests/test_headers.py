@@ -0,0 +1,184 @@
+"""Test the shared cache of parsed headers."""
+import datetime as dt
+from pathlib import Path
+import sqlite3
+
+import pytest
+from pytest_mock import MockFixture
+from ruamel.yaml import YAML
+from yaml.nodes import MappingNode
+
+from note_clerk import headers
+
+
+HEADER = "---\ntype: note\ntags: [a]\n---\n---\ncreated: 2020-01-01\n---\n"
+
+
+def test_parse(mocker: MockFixture) -> None:
+    load_header = mocker.spy(headers, "load_header")
+    cache = headers.HeaderCache()
+
+    docs = cache.parse(HEADER)
+
+    assert docs == [
+        {"type": "note", "tags": ["a"]},
+        None,
+        {"created": dt.date(2020, 1, 1)},
+        None,
+    ]
+    assert cache.parse(HEADER) is docs
+    assert load_header.call_count == 1
+
+
+def test_parse_evicts_least_recent(mocker: MockFixture) -> None:
+    load_header = mocker.spy(headers, "load_header")
+    cache = headers.HeaderCache(maxsize=2)
+
+    cache.parse("a: 1")
+    cache.parse("b: 1")
+    cache.parse("a: 1")
+    cache.parse("c: 1")
+    cache.parse("a: 1")
+    cache.parse("b: 1")
+
+    assert [c.args[0] for c in load_header.call_args_list] == [
+        "a: 1",
+        "b: 1",
+        "c: 1",
+        "b: 1",
+    ]
+
+
+@pytest.mark.parametrize("header", ["a: [", "a: 1\na: 2\n"])
+def test_parse_errors_not_cached(mocker: MockFixture, header: str) -> None:
+    load_header = mocker.spy(headers, "load_header")
+    cache = headers.HeaderCache()
+
+    for _ in range(2):
+        with pytest.raises(headers.YAMLError):
+            cache.parse(header)
+
+    assert load_header.call_count == 2
+
+
+def test_parse_persisted(mocker: MockFixture, tmp_path: Path) -> None:
+    path = tmp_path / "cache" / "headers.sqlite3"
+    first = headers.HeaderCache(path)
+    docs = first.parse(HEADER)
+    first.close()
+
+    load_header = mocker.spy(headers, "load_header")
+    second = headers.HeaderCache(path)
+
+    assert second.parse(HEADER) == docs
+    assert load_header.call_count == 0
+    second.close()
+
+
+VALUES = (
+    "---\n"
+    "created: 2020-01-01 10:00:00+02:00\n"
+    "day: 2020-01-02\n"
+    "1: [1.5, true, null, !!binary aGk=]\n"
+    "map: {nested: {2020-01-03: x}}\n"
+    "set: !!set {a, b}\n"
+    "pairs: !!pairs [a: 1, a: 2]\n"
+    "---\n"
+)
+
+
+def test_parse_persisted_values(mocker: MockFixture, tmp_path: Path) -> None:
+    path = tmp_path / "headers.sqlite3"
+    first = headers.HeaderCache(path)
+    docs = first.parse(VALUES)
+    first.close()
+
+    load_header = mocker.spy(headers, "load_header")
+    second = headers.HeaderCache(path)
+
+    assert second.parse(VALUES) == docs
+    assert load_header.call_count == 0
+    second.close()
+
+
+def test_parse_unreadable_cache(mocker: MockFixture, tmp_path: Path) -> None:
+    path = tmp_path / "headers.sqlite3"
+    headers.HeaderCache(path).close()
+    with sqlite3.connect(str(path)) as db:
+        db.execute(
+            "INSERT INTO headers (digest, docs) VALUES (?, ?)",
+            (headers.header_digest(HEADER), b"\x80\x04K\x01."),
+        )
+    db.close()
+    load_header = mocker.spy(headers, "load_header")
+    cache = headers.HeaderCache(path)
+
+    assert cache.parse(HEADER)[0] == {"type": "note", "tags": ["a"]}
+    cache._docs.clear()
+    cache.parse(HEADER)
+
+    assert load_header.call_count == 1
+    cache.close()
+
+
+YAML_1_2 = "\n".join(
+    [
+        "yes: yes",
+        "on: on",
+        "bool: true",
+        "octal: 0o17",
+        "leading: 017",
+        "time: 1:20",
+        "float: 1.5e3",
+        "hex: 0x1F",
+        "date: 2020-01-01",
+    ]
+)
+
+
+def test_load_header_yaml_1_2() -> None:
+    docs = headers.load_header(YAML_1_2)
+    nodes = headers.compose_header(YAML_1_2)
+
+    assert docs == [dict(YAML().load(YAML_1_2))]
+    assert docs[0]["yes"] == "yes"
+    assert docs[0]["leading"] == 17
+    assert [headers.node_value(node) for node in nodes] == docs
+
+
+def test_configure(tmp_path: Path) -> None:
+    path = tmp_path / "headers.sqlite3"
+
+    headers.configure(path)
+    try:
+        assert headers.cache_path() == path
+        headers.parse_header(HEADER)
+        assert path.exists()
+    finally:
+        headers.configure(None)
+
+    assert headers.cache_path() is None
+
+
+def test_duplicate_key() -> None:
+    with pytest.raises(headers.DuplicateKeyError, match='duplicate key "a"'):
+        headers.load_header("---\na: 1\nb: 2\na: 3\n---\n")
+
+
+def test_uses_libyaml() -> None:
+    yaml = pytest.importorskip("yaml")
+    if not yaml.__with_libyaml__:
+        pytest.skip("libyaml not available")
+
+    assert issubclass(headers.HeaderLoader, yaml.CSafeLoader)
+
+
+def test_compose_header() -> None:
+    nodes = headers.compose_header("---\na: 1\na: [2]\n---\n---\nb: x\n---\n")
+
+    values = [
+        [(k.value, headers.node_value(v), k.start_mark.line) for k, v in n.value]
+        for n in nodes
+        if isinstance(n, MappingNode)
+    ]
+    assert values == [[("a", 1, 1), ("a", [2], 2)], [("b", "x", 5)]]
@@ -0,0 +1,145 @@
+"""Test the note header index."""
+import datetime as dt
+import os
+from pathlib import Path
+from typing import Any, Iterator, List, Optional
+
+import pytest
+
+from note_clerk import index
+from ._utils import FileFactory, inline_header, inline_note
+
+
+@pytest.fixture
+def note_index(tmpdir) -> Iterator[index.NoteIndex]:  # noqa: ANN001
+    """Empty note index."""
+    with index.NoteIndex(Path(str(tmpdir)) / "index" / "index.sqlite3") as ni:
+        yield ni
+
+
+@pytest.fixture
+def notes(file_factory: FileFactory) -> List[Path]:
+    """Notes with a variety of headers."""
+    return [
+        file_factory(
+            "1.md",
+            inline_header(
+                """
+                type: journal
+                created: 2021-04-02T10:00:00
+                tags: ["#work", "#idea"]
+                """
+            ),
+        ),
+        file_factory(
+            "2.md",
+            inline_header(
+                """
+                type: journal
+                created: 2021-07-02
+                tags: ["#work"]
+                """
+            ),
+        ),
+        file_factory(
+            "3.md",
+            inline_note(
+                """
+                ---
+                type: resource
+                ---
+                ---
+                type: ignored
+                status: draft
+                ---
+                """
+            ),
+        ),
+        file_factory("4.md", "no header\n"),
+        file_factory("5.md", "---\nunclosed: header\n"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        (None, None),
+        ("text", "text"),
+        (dt.date(2021, 1, 2), "2021-01-02"),
+        (dt.datetime(2021, 1, 2, 3, 4), "2021-01-02T03:04:00"),
+        (True, "true"),
+        (3, "3"),
+        ({"a": 1}, '{"a": 1}'),
+    ],
+)
+def test_field_value(value: Any, expected: Optional[str]) -> None:
+    assert index.field_value(value) == expected
+
+
+def test_read_header_combines_documents(notes: List[Path]) -> None:
+    assert index.read_header(notes[2]) == {"type": "resource", "status": "draft"}
+
+
+@pytest.mark.parametrize("note", [3, 4])
+def test_read_header_missing(notes: List[Path], note: int) -> None:
+    assert index.read_header(notes[note]) == {}
+
+
+def test_update_is_incremental(note_index: index.NoteIndex, notes: List[Path]) -> None:
+    first = note_index.update(notes)
+    second = note_index.update(notes)
+
+    assert (first.updated, first.unchanged, first.removed) == (5, 0, 0)
+    assert (second.updated, second.unchanged, second.removed) == (0, 5, 0)
+
+
+def test_update_changed_and_removed(
+    note_index: index.NoteIndex, notes: List[Path]
+) -> None:
+    note_index.update(notes)
+    notes[0].write_text(inline_header("type: meeting"))
+    os.utime(notes[0], ns=(0, 0))
+    notes[1].unlink()
+
+    stats = note_index.update([notes[0], *notes[2:]])
+
+    assert (stats.updated, stats.unchanged, stats.removed) == (1, 3, 1)
+    assert note_index.count_by("type", index.NoteFilter()) == [
+        ("meeting", 1),
+        ("resource", 1),
+    ]
+
+
+@pytest.mark.parametrize(
+    "note_filter,expected",
+    [
+        (index.NoteFilter(), [1, 2, 3, 4, 5]),
+        (index.NoteFilter([("type", "journal")]), [1, 2]),
+        (index.NoteFilter([("type", "journal"), ("tags", "#idea")]), [1]),
+        (index.NoteFilter([("status", "draft")]), [3]),
+        (index.NoteFilter(created_after="2021-04-01"), [1, 2]),
+        (
+            index.NoteFilter(created_after="2021-04-01", created_before="2021-07-01"),
+            [1],
+        ),
+    ],
+)
+def test_query(
+    note_index: index.NoteIndex,
+    notes: List[Path],
+    note_filter: index.NoteFilter,
+    expected: List[int],
+) -> None:
+    note_index.update(notes)
+
+    paths = note_index.query(note_filter)
+
+    assert paths == [str(notes[i - 1].resolve()) for i in expected]
+
+
+def test_count_by(note_index: index.NoteIndex, notes: List[Path]) -> None:
+    note_index.update(notes)
+
+    counts = note_index.count_by("tags", index.NoteFilter([("type", "journal")]))
+
+    assert counts == [("#work", 2), ("#idea", 1)]
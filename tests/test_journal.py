@@ -0,0 +1,213 @@
+"""Test batched fixes."""
+from pathlib import Path
+from typing import Any
+
+import pytest
+from pytest_mock import MockFixture
+
+from note_clerk import journal as journal_module
+from note_clerk.journal import (
+    CorruptJournal,
+    FixJournal,
+    JournalLocked,
+    StagedFix,
+    staging_file,
+)
+
+
+def _stage(target: Path, text: str) -> str:
+    with staging_file(str(target)) as f:
+        f.write(text.encode("utf-8"))
+    return f.name
+
+
+@pytest.fixture
+def notes(tmp_path: Path) -> Path:
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    (notes / "20200101000000.md").write_text("original\n")
+    (notes / "2020.md").write_text("renamed\n")
+    (notes / "1999.md").write_text("unchanged\n")
+    return notes
+
+
+def _staged_fixes(notes: Path) -> list:
+    return [
+        StagedFix(
+            _stage(notes / "20200101000000.md", "fixed\n"),
+            str(notes / "20200101000000.md"),
+        ),
+        StagedFix(
+            _stage(notes / "20200000000000.md", "renamed fixed\n"),
+            str(notes / "20200000000000.md"),
+            remove=str(notes / "2020.md"),
+        ),
+        StagedFix(
+            str(notes / "1999.md"),
+            str(notes / "19990000000000.md"),
+            staged=False,
+        ),
+    ]
+
+
+def _contents(notes: Path) -> dict:
+    return {p.name: p.read_text() for p in sorted(notes.iterdir())}
+
+
+FIXED = {
+    "19990000000000.md": "unchanged\n",
+    "20200000000000.md": "renamed fixed\n",
+    "20200101000000.md": "fixed\n",
+}
+ORIGINAL = {
+    "1999.md": "unchanged\n",
+    "2020.md": "renamed\n",
+    "20200101000000.md": "original\n",
+}
+
+
+def test_batch_applied(tmp_path: Path, notes: Path) -> None:
+    journal = FixJournal(tmp_path / "journal.jsonl")
+
+    with journal:
+        for fix in _staged_fixes(notes):
+            journal.record(fix)
+
+    assert _contents(notes) == FIXED
+    assert not journal.path.exists()
+
+
+def test_sync_files_per_file_system(notes: Path, mocker: MockFixture) -> None:
+    syncfs = mocker.patch.object(journal_module, "_syncfs", return_value=0)
+    fsync = mocker.patch.object(journal_module.os, "fsync")
+
+    journal_module._sync_files([str(p) for p in notes.iterdir()])
+
+    assert syncfs.call_count == 1
+    fsync.assert_not_called()
+
+
+@pytest.mark.parametrize("syncfs", [None, lambda fd: -1])
+def test_sync_files_fallback(notes: Path, mocker: MockFixture, syncfs: Any) -> None:
+    mocker.patch.object(journal_module, "_syncfs", syncfs)
+    fsync = mocker.patch.object(journal_module.os, "fsync")
+
+    journal_module._sync_files([str(p) for p in notes.iterdir()])
+
+    # each file, then their directory
+    assert fsync.call_count == 4
+
+
+def test_batch_error_rolled_back(tmp_path: Path, notes: Path) -> None:
+    journal = FixJournal(tmp_path / "journal.jsonl")
+
+    with pytest.raises(RuntimeError), journal:
+        for fix in _staged_fixes(notes):
+            journal.record(fix)
+        raise RuntimeError()
+
+    assert _contents(notes) == ORIGINAL
+    assert not journal.path.exists()
+
+
+def test_batch_in_progress(tmp_path: Path, notes: Path) -> None:
+    journal = FixJournal(tmp_path / "journal.jsonl")
+
+    with journal:
+        for fix in _staged_fixes(notes):
+            journal.record(fix)
+        with pytest.raises(JournalLocked), FixJournal(journal.path):
+            pass
+        with pytest.raises(JournalLocked):
+            FixJournal(journal.path).recover()
+
+    assert _contents(notes) == FIXED
+
+
+def test_recover_committed(tmp_path: Path, notes: Path) -> None:
+    journal = FixJournal(tmp_path / "journal.jsonl").__enter__()
+    fixes = _staged_fixes(notes)
+    for fix in fixes:
+        journal.record(fix)
+    journal.commit()
+    # interrupted after applying the first fix
+    Path(fixes[0].source).replace(fixes[0].target)
+    journal.release()
+
+    recovered = FixJournal(journal.path)
+
+    assert recovered.recover() is True
+    assert _contents(notes) == FIXED
+    assert not journal.path.exists()
+
+
+def test_recover_uncommitted(tmp_path: Path, notes: Path) -> None:
+    journal = FixJournal(tmp_path / "journal.jsonl").__enter__()
+    for fix in _staged_fixes(notes):
+        journal.record(fix)
+    journal.release()
+    with journal.path.open("a") as f:
+        f.write('{"source": ')
+
+    recovered = FixJournal(journal.path)
+
+    assert recovered.recover() is False
+    assert _contents(notes) == ORIGINAL
+    assert not journal.path.exists()
+
+
+def test_recover_nothing(tmp_path: Path) -> None:
+    assert FixJournal(tmp_path / "journal.jsonl").recover() is None
+
+
+@pytest.mark.parametrize(
+    "entry", ['{"source": "a", "target": "b", "moved": true}', "[1]", '{"source": 1}']
+)
+def test_recover_corrupt(tmp_path: Path, notes: Path, entry: str) -> None:
+    journal = FixJournal(tmp_path / "journal.jsonl")
+    journal.path.write_text(entry + "\n" + '{"commit": true}\n')
+
+    with pytest.raises(CorruptJournal):
+        journal.recover()
+
+    assert _contents(notes) == ORIGINAL
+    assert journal.path.exists()
+
+
+def test_rollback_unrecorded_staging(tmp_path: Path, notes: Path) -> None:
+    journal = FixJournal(tmp_path / "journal.jsonl").__enter__()
+    journal.stage_in([str(notes)])
+    with staging_file(str(notes / "2020.md"), journal.batch) as f:
+        f.write(b"staged before recording\n")
+    other = _stage(notes / "1999.md", "other batch\n")
+    # interrupted before the staged fix was recorded
+    journal.release()
+
+    assert FixJournal(journal.path).recover() is False
+    assert _contents(notes) == {**ORIGINAL, Path(other).name: "other batch\n"}
+
+
+def test_apply_keeps_taken_target(tmp_path: Path, notes: Path) -> None:
+    staged = _stage(notes / "20200000000000.md", "renamed fixed\n")
+    fix = StagedFix(
+        staged, str(notes / "20200101000000.md"), remove=str(notes / "2020.md")
+    )
+    journal = FixJournal(tmp_path / "journal.jsonl")
+
+    with journal:
+        journal.record(fix)
+
+    assert journal.conflicts == [fix]
+    assert _contents(notes) == {**ORIGINAL, Path(staged).name: "renamed fixed\n"}
+
+
+@pytest.mark.parametrize(
+    "fix,note",
+    [
+        (StagedFix(".a.md.x.fix", "a.md"), "a.md"),
+        (StagedFix(".b.md.x.fix", "b.md", remove="a.md"), "a.md"),
+        (StagedFix("a.md", "b.md", staged=False), "a.md"),
+    ],
+)
+def test_staged_fix_note(fix: StagedFix, note: str) -> None:
+    assert fix.note == note
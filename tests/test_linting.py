@@ -2,7 +2,7 @@
 
 from io import StringIO
 import logging
-from typing import Optional, TypedDict
+from typing import Dict, List, Optional, Tuple, TypedDict
 
 import pytest
 
@@ -101,3 +101,294 @@ def test_lints(
         assert lints == [linting.LintError(line=line, column=column, error=error)]
     else:
         assert lints == []
+
+
+class CountingCheck(linting.HeaderCheck):
+    """Count instances and lines seen for testing."""
+
+    instances = 0
+
+    def __init__(self, context: Optional[linting.LintContext] = None) -> None:
+        """Count instances."""
+        super().__init__(context)
+        CountingCheck.instances += 1
+        self.lines = 0
+
+    def reset(self) -> None:
+        """Reset per-file line count."""
+        self.lines = 0
+
+    def check_line(self, line: str, line_num: int) -> linting.Lints:
+        """Count header lines."""
+        yield from super().check_line(line, line_num)
+        self.lines += 1
+
+    def check_file(self) -> linting.Lints:
+        """Report number of header lines."""
+        yield linting.LintError(f"header-lines-{self.lines}", None, None)
+
+
+def test_pipeline_reused_between_files() -> None:
+    """Test checks are created once and reset for every file."""
+    CountingCheck.instances = 0
+    pipeline = linting.LintPipeline([CountingCheck, checks.CheckHeaderTagsArray])
+
+    first = list(pipeline.lint(StringIO(inline_header('tags: "#value"')), None))
+    second = list(pipeline.lint(StringIO("tags: body\n"), None))
+
+    assert CountingCheck.instances == 1
+    assert first == [
+        linting.LintError("header-tags-array", 2, 5),
+        linting.LintError("header-lines-2", None, None),
+    ]
+    assert second == [linting.LintError("header-lines-0", None, None)]
+
+
+def test_pipeline_skips_default_hooks() -> None:
+    """Test only overridden hooks of checks in the right region are called."""
+    pipeline = linting.LintPipeline([CountingCheck, checks.CheckLinkBroken])
+
+    assert pipeline._line_checks[linting.Region.HEADER] == [
+        pipeline.checks[0].check_line,
+        pipeline.checks[1].check_line,
+    ]
+    assert pipeline._line_checks[linting.Region.BODY] == [pipeline.checks[1].check_line]
+    assert pipeline._filename_checks == []
+    assert pipeline._file_checks == [pipeline.checks[0].check_file]
+
+
+RULES = [
+    linting.PatternRule("starts-a", linting.Region.BODY, prefix="a"),
+    linting.PatternRule("letter-a", linting.Region.BODY, pattern="a+"),
+    linting.PatternRule("fixed", linting.Region.BODY, pattern="b", column=1),
+    linting.PatternRule("header", linting.Region.HEADER, pattern="a"),
+]
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("xyz", []),
+        (
+            "aa b",
+            [
+                linting.LintError("starts-a", 1, 0),
+                linting.LintError("letter-a", 1, 0),
+                linting.LintError("fixed", 1, 1),
+            ],
+        ),
+        (
+            "ba a",
+            [
+                linting.LintError("fixed", 1, 1),
+                linting.LintError("letter-a", 1, 1),
+                linting.LintError("letter-a", 1, 3),
+            ],
+        ),
+    ],
+)
+def test_rule_engine(text: str, expected: List[linting.LintError]) -> None:
+    """Test each rule reports its own non-overlapping matches from one scan."""
+    engine = linting.RuleEngine(RULES)
+
+    assert engine.lint(linting.Region.BODY, text, 1) == expected
+
+
+def test_rule_engine_filename() -> None:
+    """Test filename rules have no location."""
+    engine = linting.RuleEngine(
+        [linting.PatternRule("name", linting.Region.FILENAME, prefix="x")]
+    )
+
+    assert engine.lint(linting.Region.FILENAME, "x.md", None) == [
+        linting.LintError("name", None, None)
+    ]
+    assert engine.lint(linting.Region.BODY, "x", 1) == []
+    assert linting.Region.BODY not in engine
+
+
+def test_rule_engine_separate_rules() -> None:
+    """Test rules that can't join the alternation are scanned on their own."""
+    engine = linting.RuleEngine(
+        [
+            linting.PatternRule("todo", linting.Region.BODY, pattern="(?i)todo"),
+            linting.PatternRule("double", linting.Region.BODY, pattern=r"(\w)\1"),
+            linting.PatternRule("letter-a", linting.Region.BODY, pattern="a"),
+        ]
+    )
+
+    assert engine.lint(linting.Region.BODY, "Todo aab", 1) == [
+        linting.LintError("todo", 1, 0),
+        linting.LintError("double", 1, 5),
+        linting.LintError("letter-a", 1, 5),
+        linting.LintError("letter-a", 1, 6),
+    ]
+    assert linting.Region.BODY in engine
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"pattern": "a", "prefix": "a"}])
+def test_pattern_rule_needs_one_matcher(kwargs: Dict[str, str]) -> None:
+    """Test rules need either a pattern or a prefix."""
+    with pytest.raises(ValueError):
+        linting.PatternRule("code", linting.Region.BODY, **kwargs)  # type: ignore
+
+
+def test_pipeline_header_rules_skip_seperators() -> None:
+    """Test header rules aren't applied to the header's seperator lines."""
+    rule = linting.PatternRule("dash", linting.Region.HEADER, prefix="-")
+
+    class DashCheck(linting.PatternCheck):
+        rules = [rule]
+
+    lints = list(
+        linting.lint_file(StringIO(inline_header("- item")), None, [DashCheck])
+    )
+
+    assert lints == [linting.LintError("dash", 2, 0)]
+
+
+BUFFER_CHECKS = [
+    checks.CheckHeaderTagsArray,
+    checks.CheckHeaderTagsQuoted,
+    checks.CheckLinkBroken,
+]
+BUFFER = inline_header('tags: "#a"\ntype: note') + "body [[1]]\n" * 20
+
+
+def full_lint(text: str, lint_checks: linting.LintChecks) -> List[linting.LintError]:
+    """Lint text from scratch."""
+    context = linting.LintContext(note_ids=frozenset(["2"]))
+    return list(linting.lint_file(StringIO(text), "note.md", lint_checks, context))
+
+
+def buffer_lint(
+    text: str, lint_checks: linting.LintChecks = BUFFER_CHECKS
+) -> linting.IncrementalLint:
+    """Lint text as an editor buffer."""
+    context = linting.LintContext(note_ids=frozenset(["2"]))
+    pipeline = linting.LintPipeline(lint_checks, context)
+    return linting.IncrementalLint(pipeline, text, "note.md")
+
+
+@pytest.mark.parametrize(
+    "start,end,text,rechecked",
+    [
+        (10, 11, "body [[2]]\n", 1),
+        (10, 10, "body\n#tag [[1]]\n", 2),
+        (10, 13, "", 0),
+        (2, 3, "type: 'other'\n", 1),
+        (1, 2, "tags: [#a]\n", 1),
+        (0, 1, "\n", 24),
+        (3, 4, "", 20),
+        (24, 24, "last [[3]]", 1),
+    ],
+)
+def test_incremental_lint(start: int, end: int, text: str, rechecked: int) -> None:
+    """Test edits only lint the affected lines and match a full lint."""
+    buffer = buffer_lint(BUFFER)
+
+    buffer.update(start, end, text)
+
+    assert buffer.lints == full_lint(buffer.text, BUFFER_CHECKS)
+    assert buffer.rechecked == rechecked
+
+
+def test_incremental_lint_sequence() -> None:
+    """Test a series of edits keeps lint in sync with the text."""
+    buffer = buffer_lint("")
+    edits = [
+        (0, 0, "---\n---\n"),
+        (1, 1, 'tags: "#a"\n'),
+        (3, 3, "[[1]]\n" * 3),
+        (0, 1, ""),
+        (0, 0, "---\n"),
+        (4, 6, "[[2]]\n"),
+    ]
+    for start, end, text in edits:
+        buffer.update(start, end, text)
+        assert buffer.lints == full_lint(buffer.text, BUFFER_CHECKS)
+
+
+@pytest.mark.parametrize(
+    "text,start,end,new",
+    [
+        ("---\na: 1\n---\nx\ny [[1]]\n", 3, 4, "x"),
+        ("---\na: 1\n---\nx\ny [[1]]", 5, 5, " [[3]]\nz"),
+        ("---\na: 1\n---\nx", 4, 4, "---\n"),
+        ("a\r", 1, 1, "\nb [[1]]\n"),
+        ("a\nb\n", 0, 1, "x\r"),
+        ("a\nb", 1, 2, ""),
+    ],
+)
+def test_incremental_lint_partial_lines(
+    text: str, start: int, end: int, new: str
+) -> None:
+    """Test edits not ending in a newline are joined with the next line."""
+    buffer = buffer_lint(text)
+
+    buffer.update(start, end, new)
+
+    assert buffer.lines == buffer.text.splitlines(keepends=True)
+    assert buffer.lints == full_lint(buffer.text, BUFFER_CHECKS)
+
+
+def test_incremental_lint_outside_buffer() -> None:
+    """Test edits must be within the buffer."""
+    buffer = buffer_lint("a\n")
+
+    with pytest.raises(IndexError):
+        buffer.update(1, 3, "")
+
+
+def test_incremental_lint_stateful_checks() -> None:
+    """Test pipelines with stateful checks lint the whole buffer."""
+    lint_checks = [CountingCheck, checks.CheckHeaderTagsArray]
+    buffer = buffer_lint(BUFFER, lint_checks)
+    assert not buffer.pipeline.incremental
+
+    buffer.update(1, 2, "tags: [a]\nother: 1\n")
+
+    assert buffer.lints == full_lint(buffer.text, lint_checks)
+    assert buffer.rechecked == 25
+
+
+@pytest.mark.parametrize(
+    "text,spans",
+    [
+        ("tags: [a, b]", [(0, 12)]),
+        ('tags: ["a #b", c]', [(0, 7), (13, 17)]),
+        ("tags: ['it''s', \"a\\\"b\"]", [(0, 7), (14, 16), (22, 23)]),
+        ("title: it's #a", [(0, 14)]),
+        ('tags: "unclosed', [(0, 6)]),
+    ],
+)
+def test_unquoted_spans(text: str, spans: List[Tuple[int, int]]) -> None:
+    """Test quoted scalars are left out of the spans."""
+    assert linting.unquoted_spans(text) == spans
+
+
+def test_pipeline_fix_lines() -> None:
+    """Test lines are fixed as they are linted, leaving lint without fixes."""
+    pipeline = linting.LintPipeline(
+        [checks.CheckHeaderTagsArray, checks.CheckHeaderTagsQuoted]
+    )
+    text = inline_header("tags: #a #b\ntitle: #1\ntags: [#c, #d]") + "tags: #e\n"
+
+    lines, unfixed = pipeline.fix_lines(StringIO(text), None)
+
+    assert "".join(lines) == inline_header(
+        'tags: ["#a", "#b"]\ntitle: #1\ntags: ["#c", "#d"]'
+    ) + ("tags: #e\n")
+    assert unfixed == [linting.LintError("header-tags-quoted", 3, 7)]
+    assert pipeline.fix(linting.LintError("other", 1, 1), "tags: #a\n") is None
+
+
+def test_pipeline_fix_lines_stateful_checks() -> None:
+    """Test lines are only linted once with checks that keep state."""
+    pipeline = linting.LintPipeline([checks.CheckHeaderTagsQuoted, CountingCheck])
+    text = inline_header("tags: [#a, #b]")
+
+    lines, unfixed = pipeline.fix_lines(StringIO(text), None)
+
+    assert "".join(lines) == inline_header('tags: ["#a", "#b"]')
+    assert unfixed == [linting.LintError("header-lines-2", None, None)]
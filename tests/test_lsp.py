@@ -0,0 +1,247 @@
+"""Test the language server."""
+from io import BytesIO
+import json
+from typing import Any, Dict, List
+from unittest.mock import PropertyMock
+
+from click.testing import CliRunner
+import pytest
+from pytest_mock import MockFixture
+
+from note_clerk import checks, console, linting, lsp
+from ._utils import inline_header, show_output
+
+
+URI = "file:///notes/20200101000000.md"
+CHECKS = [checks.CheckHeaderTagsArray, checks.CheckLinkBroken]
+
+
+def frame(message: Dict[str, Any]) -> bytes:
+    """Message framed as the protocol sends it."""
+    body = json.dumps(message).encode()
+    return f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+
+
+def read_all(output: BytesIO) -> List[Dict[str, Any]]:
+    """Every message written to output."""
+    output.seek(0)
+    messages: List[Dict[str, Any]] = []
+    while True:
+        message = lsp.read_message(output)
+        if message is None:
+            return messages
+        messages.append(message)
+
+
+def make_server(output: BytesIO) -> lsp.LintServer:
+    """Server with a context knowing notes 1 and 2."""
+    context = linting.LintContext(note_ids=frozenset(["1", "2"]))
+    return lsp.LintServer(CHECKS, context, [], output, debounce=0)
+
+
+def did_open(text: str) -> Dict[str, Any]:
+    """Notification opening text as URI."""
+    return {
+        "jsonrpc": "2.0",
+        "method": "textDocument/didOpen",
+        "params": {"textDocument": {"uri": URI, "version": 1, "text": text}},
+    }
+
+
+def did_change(*changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Notification changing URI."""
+    return {
+        "jsonrpc": "2.0",
+        "method": "textDocument/didChange",
+        "params": {"textDocument": {"uri": URI}, "contentChanges": list(changes)},
+    }
+
+
+def edit(line: int, start: int, end: int, text: str) -> Dict[str, Any]:
+    """Change of characters start to end of line."""
+    return {
+        "range": {
+            "start": {"line": line, "character": start},
+            "end": {"line": line, "character": end},
+        },
+        "text": text,
+    }
+
+
+def codes(message: Dict[str, Any]) -> List[Any]:
+    """Code and start of each published diagnostic."""
+    return [
+        (d["code"], d["range"]["start"]["line"], d["range"]["start"]["character"])
+        for d in message["params"]["diagnostics"]
+    ]
+
+
+def test_read_message_errors() -> None:
+    """Test messages need a length and a JSON body."""
+    with pytest.raises(lsp.ProtocolError):
+        lsp.read_message(BytesIO(b"Content-Type: x\r\n\r\n{}"))
+    with pytest.raises(lsp.ProtocolError):
+        lsp.read_message(BytesIO(b"Content-Length: 2\r\n\r\n{x"))
+
+
+@pytest.mark.parametrize(
+    "line,character,index",
+    [("abc\n", 1, 1), ("abc\n", 9, 3), ("\U0001f600b\n", 2, 1), ("", 0, 0)],
+)
+def test_utf16_index(line: str, character: int, index: int) -> None:
+    """Test positions count UTF-16 code units and stay on the line."""
+    assert lsp.utf16_index(line, character) == index
+
+
+def test_diagnostics_published_after_edits() -> None:
+    """Test edits are only linted when published."""
+    output = BytesIO()
+    server = make_server(output)
+
+    server.handle(did_open(inline_header("tags: [a]") + "[[1]]\n"))
+    server.handle(did_change(edit(1, 6, 9, "a"), edit(3, 2, 3, "3")))
+    assert read_all(output) == []
+
+    server.publish()
+
+    (message,) = read_all(output)
+    assert message["method"] == "textDocument/publishDiagnostics"
+    assert message["params"]["uri"] == URI
+    assert codes(message) == [("header-tags-array", 1, 4), ("link-broken", 3, 0)]
+    assert message["params"]["diagnostics"][0]["range"]["end"] == {
+        "line": 1,
+        "character": 7,
+    }
+
+
+def test_full_change_and_close() -> None:
+    """Test documents can be replaced, and closing clears diagnostics."""
+    output = BytesIO()
+    server = make_server(output)
+
+    server.handle(did_open(""))
+    server.handle(did_change({"text": "[[9]]\n"}))
+    server.publish()
+    server.handle(
+        {"method": "textDocument/didClose", "params": {"textDocument": {"uri": URI}}}
+    )
+
+    first, closed = read_all(output)
+    assert codes(first) == [("link-broken", 0, 0)]
+    assert closed["params"]["diagnostics"] == []
+    assert server.documents == {}
+
+
+def test_saved_notes_added_to_context() -> None:
+    """Test links to newly saved notes aren't broken."""
+    output = BytesIO()
+    server = make_server(output)
+    server.handle(did_open("[[20200101000000]]\n"))
+    server.publish()
+
+    server.handle(
+        {"method": "textDocument/didSave", "params": {"textDocument": {"uri": URI}}}
+    )
+    server.publish()
+
+    broken, fixed = read_all(output)
+    assert codes(broken) == [("link-broken", 0, 0)]
+    assert codes(fixed) == []
+
+
+def test_requests() -> None:
+    """Test the session lifecycle and unknown requests."""
+    output = BytesIO()
+    server = make_server(output)
+    session: List[Dict[str, Any]] = [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+        {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+        did_open("[[3]]\n"),
+        {"jsonrpc": "2.0", "id": 2, "method": "textDocument/hover", "params": {}},
+        {"jsonrpc": "2.0", "id": 3, "method": "shutdown"},
+        {"jsonrpc": "2.0", "method": "exit"},
+    ]
+
+    exit_code = server.serve(BytesIO(b"".join(frame(m) for m in session)))
+
+    messages = read_all(output)
+    diagnostics = [m for m in messages if "method" in m]
+    initialized, unknown, shutdown = [m for m in messages if "id" in m]
+    assert exit_code == 0
+    assert initialized["result"]["capabilities"]["textDocumentSync"]["change"] == 2
+    assert codes(diagnostics[-1]) == [("link-broken", 0, 0)]
+    assert unknown["error"]["code"] == lsp.METHOD_NOT_FOUND
+    assert shutdown == {"jsonrpc": "2.0", "id": 3, "result": None}
+
+
+def test_exit_without_shutdown() -> None:
+    """Test the client closing the connection is an error."""
+    server = make_server(BytesIO())
+
+    assert server.serve(BytesIO(b"")) == 1
+
+
+def test_code_actions() -> None:
+    """Test quick fixes are offered for lint checks can fix."""
+    output = BytesIO()
+    server = make_server(output)
+    server.handle(did_open(inline_header("tags: #a") + "[[3]]\n"))
+    server.publish()
+    (published,) = read_all(output)
+    diagnostics = published["params"]["diagnostics"]
+
+    server.handle(
+        {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "textDocument/codeAction",
+            "params": {
+                "textDocument": {"uri": URI},
+                "range": diagnostics[0]["range"],
+                "context": {"diagnostics": diagnostics},
+            },
+        }
+    )
+
+    _, response = read_all(output)
+    (action,) = response["result"]
+    assert action["kind"] == "quickfix"
+    assert action["diagnostics"] == [diagnostics[0]]
+    assert action["edit"]["changes"][URI] == [
+        {
+            "range": {
+                "start": {"line": 1, "character": 0},
+                "end": {"line": 1, "character": 8},
+            },
+            "newText": 'tags: ["#a"]',
+        }
+    ]
+
+
+def test_lsp_command(cli_runner: CliRunner, mocker: MockFixture) -> None:
+    checks_mock = PropertyMock(return_value=[checks.CheckHeaderTagsArray])
+    mocker.patch("note_clerk.console.App.lint_checks", checks_mock)
+    session: List[Dict[str, Any]] = [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+        {
+            "jsonrpc": "2.0",
+            "method": "textDocument/didOpen",
+            "params": {
+                "textDocument": {
+                    "uri": "file:///note.md",
+                    "version": 1,
+                    "text": inline_header("tags: a"),
+                }
+            },
+        },
+        {"jsonrpc": "2.0", "id": 2, "method": "shutdown"},
+        {"jsonrpc": "2.0", "method": "exit"},
+    ]
+    stdin = b"".join(frame(message) for message in session)
+
+    result = cli_runner.invoke(console.cli, ["lsp", "--debounce", "0"], input=stdin)
+    show_output(result)
+
+    assert result.exit_code == 0
+    assert '"code": "header-tags-array"' in result.output
+    assert result.output.endswith('{"jsonrpc": "2.0", "id": 2, "result": null}')
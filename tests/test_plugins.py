@@ -0,0 +1,85 @@
+"""Test lint check discovery."""
+from importlib import metadata
+from typing import List
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockFixture
+
+from note_clerk import checks, plugins
+
+
+@pytest.fixture
+def entry_points_mock(mocker: MockFixture) -> MagicMock:
+    """Patch installed entry points."""
+    return mocker.patch("note_clerk.plugins._installed_entry_points", return_value=[])
+
+
+def plugin(name: str, value: str) -> metadata.EntryPoint:
+    return metadata.EntryPoint(name, value, plugins.ENTRY_POINT_GROUP)
+
+
+def test_builtin_checks_load() -> None:
+    loaded = plugins.load_checks(ep.name for ep in plugins.BUILTIN_CHECKS)
+
+    assert loaded == [
+        checks.CheckFilenameId,
+        checks.CheckHeaderTagsArray,
+        checks.CheckHeaderTagsQuoted,
+        checks.CheckHeaderTypeLeadingSlash,
+        checks.CheckLinkBroken,
+    ]
+
+
+def test_plugin_checks_available(entry_points_mock: MagicMock) -> None:
+    entry_points_mock.return_value = [plugin("fake", "fake_module:FakeCheck")]
+
+    available = plugins.available_checks()
+
+    assert available["fake"].value == "fake_module:FakeCheck"
+    assert "link-broken" in available
+
+
+def test_plugin_cannot_replace_builtin(entry_points_mock: MagicMock) -> None:
+    entry_points_mock.return_value = [plugin("link-broken", "fake_module:Check")]
+
+    available = plugins.available_checks()
+
+    assert available["link-broken"].value == "note_clerk.checks:CheckLinkBroken"
+
+
+def test_disabled_plugins_not_imported(entry_points_mock: MagicMock) -> None:
+    entry_points_mock.return_value = [plugin("fake", "not_a_module:FakeCheck")]
+
+    loaded = plugins.load_checks(["link-broken"])
+
+    assert loaded == [checks.CheckLinkBroken]
+
+
+def test_unknown_checks(entry_points_mock: MagicMock) -> None:
+    with pytest.raises(plugins.UnknownChecks) as exc_info:
+        plugins.load_checks(["link-broken", "fake", "other"])
+
+    assert exc_info.value.names == ["fake", "other"]
+
+
+@pytest.mark.parametrize(
+    "enable,disable,expected",
+    [
+        ([], [], plugins.DEFAULT_CHECKS),
+        (
+            ["filename-id"],
+            [],
+            [*plugins.DEFAULT_CHECKS, "filename-id"],
+        ),
+        (
+            ["header-tags-array"],
+            ["link-broken"],
+            ["header-tags-array", "header-tags-quoted"],
+        ),
+    ],
+)
+def test_enabled_checks(
+    enable: List[str], disable: List[str], expected: List[str]
+) -> None:
+    assert plugins.enabled_checks(enable, disable) == expected
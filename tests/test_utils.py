@@ -1,11 +1,15 @@
 """Test the utils."""
+import errno
+import io
 from pathlib import Path
 import textwrap
+from typing import List
 
 import pytest
+from pytest_mock import MockFixture
 
 from note_clerk import utils
-from ._utils import inline_note
+from ._utils import FileFactory, inline_note
 
 
 class TestAllFiles:
@@ -49,6 +53,58 @@ class TestAllFiles:
 
         assert set(full_list) == set([f, f2])
 
+    def test_directory_filtered(
+        self, tmpdir, file_factory  # noqa: ANN001, ANN101
+    ) -> None:
+        """Test directory children are filtered by name before use."""
+        tmp = Path(str(tmpdir))
+        note = file_factory("20200101000000.md")
+        file_factory("20200101000000.md.swp")
+        file_factory("image.png")
+        file_factory("README.md")
+        upper = file_factory("20200102000000.MD")
+        (tmp / "folder.md").mkdir()
+        file_filter = utils.FileFilter(
+            include=("2*",), exclude=("*.swp",), extensions=frozenset([".md"])
+        )
+
+        full_list = list(utils.all_files([str(tmp)], file_filter=file_filter))
+
+        assert sorted(full_list) == [note, upper]
+
+    def test_directory_recursive(
+        self, tmpdir, file_factory  # noqa: ANN001, ANN101
+    ) -> None:
+        """Test subdirectories are searched unless hidden or excluded."""
+        tmp = Path(str(tmpdir))
+        for folder in ("sub", "sub/deeper", ".git", "archive"):
+            (tmp / folder).mkdir()
+        note = file_factory("20200101000000.md")
+        nested = file_factory("sub/20200102000000.md")
+        deeper = file_factory("sub/deeper/20200103000000.md")
+        file_factory(".git/20200104000000.md")
+        file_factory("archive/20200105000000.md")
+        file_filter = utils.FileFilter(exclude=("archive",))
+
+        flat = list(utils.all_files([str(tmp)], file_filter=file_filter))
+        full_list = list(
+            utils.all_files([str(tmp)], file_filter=file_filter, recursive=True)
+        )
+
+        assert flat == [note]
+        assert sorted(full_list) == [note, nested, deeper]
+
+    def test_given_file_not_filtered(
+        self, tmpdir, file_factory  # noqa: ANN001, ANN101
+    ) -> None:
+        """Test files given directly are used whatever the filter."""
+        swap = file_factory("note.md.swp")
+        file_filter = utils.FileFilter(exclude=("*.swp",))
+
+        full_list = list(utils.all_files([str(swap)], file_filter=file_filter))
+
+        assert full_list == [swap]
+
 
 HEADERS = [
     (
@@ -209,3 +265,182 @@ def test_trim(newline: bool) -> None:
         ensure_newline=newline,
     )
     assert text.endswith("\n") is newline
+
+
+@pytest.mark.parametrize(
+    "filename,content,expected",
+    [
+        ("note.md", "# Note\n".encode(), True),
+        ("unicode.md", "café ☃\n".encode(), True),
+        ("image.PNG", "looks like text\n".encode(), False),
+        ("nul.md", b"text\x00with nul\n", False),
+        ("latin1.md", "café\n".encode("latin-1"), False),
+        (
+            "cut_off.md",
+            b"a" * (utils.SNIFF_SIZE - 1) + "☃".encode(),
+            True,
+        ),
+        ("empty.md", b"", True),
+    ],
+)
+def test_is_text_file(
+    file_factory: FileFactory, filename: str, content: bytes, expected: bool
+) -> None:
+    path = file_factory(filename, path_only=True)
+    path.write_bytes(content)
+
+    assert utils.is_text_file(path) is expected
+
+
+def test_is_text_file_cached(file_factory: FileFactory, mocker: MockFixture) -> None:
+    path = file_factory("note.md")
+    sniff = mocker.spy(utils, "_sniff_text")
+
+    assert utils.is_text_file(path)
+    assert utils.is_text_file(path)
+    assert sniff.call_count == 1
+
+    path.write_bytes(b"\x00changed")
+
+    assert utils.is_text_file(path) is False
+    assert sniff.call_count == 2
+
+
+@pytest.mark.parametrize("text,header_lines", HEADERS)
+def test_split_header_stream(text: str, header_lines: int) -> None:
+    lines = text.split("\n")
+    correct_header = "\n".join(lines[:header_lines])
+    source = io.BytesIO(text.encode())
+
+    split = utils.split_header_stream(source)
+    body = split.pending + source.read()
+
+    assert split.header == correct_header
+    assert text.encode()[split.body_offset :] == body
+    assert body.decode() == "\n".join(lines[header_lines:])
+
+
+def test_split_header_stream_unclosed() -> None:
+    with pytest.raises(utils.UnclosedHeader):
+        utils.split_header_stream(io.BytesIO(b"---\na: 1\n"))
+
+
+def test_split_header_stream_crlf() -> None:
+    split = utils.split_header_stream(io.BytesIO(b"---\r\na: 1\r\n---\r\nbody\r\n"))
+
+    assert split == utils.HeaderSplit("---\na: 1\n---", 16, b"body\r\n", "\r\n")
+    assert split.encode("---\nb: 2\n---\n") == b"---\r\nb: 2\r\n---\r\n"
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        (b"---\n---\nbody", b"body\n"),
+        (b"---\n---\nbody\n\n", b"body\n\n"),
+        (b"---\n---\n", b""),
+        (b"---\r\n---\r\nbody", b"body\r\n"),
+        (b"body" + b"x" * utils.COPY_SIZE, b"body" + b"x" * utils.COPY_SIZE + b"\n"),
+    ],
+)
+def test_copy_body(text: bytes, expected: bytes) -> None:
+    source = io.BytesIO(text)
+    dest = io.BytesIO()
+
+    utils.copy_body(source, utils.split_header_stream(source), dest)
+
+    assert dest.getvalue() == expected
+
+
+def _unsupported(src_fd: int, dest_fd: int, offset: int, count: int) -> int:
+    raise OSError(errno.EXDEV, "Cross-device link")
+
+
+@pytest.mark.parametrize(
+    "copies",
+    [
+        utils._kernel_copies(),
+        [utils._sendfile],
+        [_unsupported],
+        [],
+    ],
+    ids=["default", "sendfile", "unsupported", "fallback"],
+)
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        (b"---\n---\nbody", b"body\n"),
+        (b"---\n---\nbody\n\n", b"body\n\n"),
+        (b"---\n---\n", b""),
+        (b"---\r\n---\r\nbody", b"body\r\n"),
+        (b"x" * (utils.COPY_SIZE * 2 + 1), b"x" * (utils.COPY_SIZE * 2 + 1) + b"\n"),
+    ],
+)
+def test_copy_body_files(
+    file_factory: FileFactory,
+    mocker: MockFixture,
+    copies: List[utils.KernelCopy],
+    text: bytes,
+    expected: bytes,
+) -> None:
+    mocker.patch("note_clerk.utils._kernel_copies", return_value=copies)
+    source_path = file_factory("source.md", path_only=True)
+    source_path.write_bytes(text)
+    dest_path = file_factory("dest.md", path_only=True)
+
+    with source_path.open("rb") as source, dest_path.open("wb") as dest:
+        dest.write(b"header\n")
+        utils.copy_body(source, utils.split_header_stream(source), dest)
+
+    assert dest_path.read_bytes() == b"header\n" + expected
+
+
+def test_copy_range_other_errors(file_factory: FileFactory) -> None:
+    source = file_factory("source.md")
+
+    with source.open("rb") as f, pytest.raises(OSError):
+        utils.copy_range(f.fileno(), -1, 0, 10)
+
+
+@pytest.mark.parametrize(
+    "text,header,expected",
+    [
+        (b"---\na: 1\n---\nbody\n", "---\na: 1\n---\n", True),
+        (b"---\na: 1\n---\n", "---\na: 1\n---\n", True),
+        (b"body\n", "", True),
+        (b"", "", True),
+        (b"---\na: 1\n---\nbody", "---\na: 1\n---\n", False),
+        (b"---\na: 1\n---\nbody\n", "---\na: 2\n---\n", False),
+        (b"---\na: 1\n---\nbody\n", "---\na: 1\nb: 2\n---\n", False),
+        (b"---\r\na: 1\r\n---\r\nbody\n", "---\na: 1\n---\n", True),
+        (b"---\r\na: 1\n---\r\nbody\n", "---\na: 1\n---\n", False),
+    ],
+)
+def test_same_content(text: bytes, header: str, expected: bool) -> None:
+    source = io.BytesIO(text)
+
+    assert utils.same_content(source, utils.split_header_stream(source), header) is (
+        expected
+    )
+
+
+@pytest.mark.parametrize("value", ["1/1", "2/3", "10/10"])
+def test_shard_parse(value: str) -> None:
+    assert str(utils.Shard.parse(value)) == value
+
+
+@pytest.mark.parametrize("value", ["", "1", "0/2", "3/2", "a/b", "1/0", "-1/2"])
+def test_shard_parse_invalid(value: str) -> None:
+    with pytest.raises(ValueError, match="I/N"):
+        utils.Shard.parse(value)
+
+
+def test_shard_partitions() -> None:
+    paths = [Path(f"notes/{i}.md") for i in range(1000)]
+    shards = [utils.Shard(i, 4) for i in range(1, 5)]
+
+    members = [[p for p in paths if p in shard] for shard in shards]
+
+    assert sorted(p for m in members for p in m) == sorted(paths)
+    assert all(150 < len(m) < 350 for m in members)
+    # assignment only depends on the path, so it is the same on every machine
+    assert [next(s for s in shards if p in s).index for p in paths[:4]] == [3, 4, 2, 1]
@@ -0,0 +1,145 @@
+"""Test applying actions to files."""
+from pathlib import Path
+import time
+from typing import Iterable, List, Optional, TextIO
+
+import pytest
+
+from note_clerk import workers
+from ._utils import FileFactory
+
+
+def line_lengths(text: TextIO, filename: Optional[str]) -> Iterable[int]:
+    for line in text:
+        yield len(line)
+
+
+def stalled_line_lengths(text: TextIO, filename: Optional[str]) -> Iterable[int]:
+    if filename and filename.endswith("stall.txt"):
+        time.sleep(10)
+    yield from line_lengths(text, filename)
+
+
+def greedy_line_lengths(text: TextIO, filename: Optional[str]) -> Iterable[int]:
+    if filename and filename.endswith("stall.txt"):
+        yield len(bytearray(2**40))
+    yield from line_lengths(text, filename)
+
+
+def logged_line_lengths(text: TextIO, filename: Optional[str]) -> Iterable[int]:
+    """Line lengths, slow after the first ten files, logging each file done."""
+    assert filename is not None  # noqa: S101
+    path = Path(filename)
+    if int(path.stem) >= 10:
+        time.sleep(0.2)
+    with (path.parent / "done.log").open("a") as log:
+        log.write(f"{path.name}\n")
+    yield from line_lengths(text, filename)
+
+
+@pytest.fixture
+def files(file_factory: FileFactory) -> List[Path]:
+    """Text files and a binary file."""
+    paths = [file_factory(f"{i}.txt", "a\n" * i + "bb\n") for i in range(100)]
+    binary = file_factory("binary.txt", path_only=True)
+    binary.write_bytes(b"ok\n\x93Y2\xc1\xf8")
+    return [*paths[:50], binary, *paths[50:]]
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_map_files(files: List[Path], jobs: int) -> None:
+    results = list(workers.map_files(line_lengths, files, jobs))
+
+    assert len(results) == 101
+    assert results[50] == []
+    assert results[0] == [3]
+    assert results[100] == [2] * 99 + [3]
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_count_files(files: List[Path], jobs: int) -> None:
+    counts = workers.count_files(line_lengths, files, jobs)
+
+    assert counts == {2: sum(range(100)), 3: 100}
+
+
+def test_map_files_bounded(files: List[Path]) -> None:
+    """Paths are only read as far as the queued chunks need."""
+    consumed: List[Path] = []
+
+    def paths() -> Iterable[Path]:
+        for path in files * 10:
+            consumed.append(path)
+            yield path
+
+    results = workers.map_files(line_lengths, paths(), jobs=2)
+    next(results)
+
+    in_flight = 2 * workers.CHUNKS_PER_JOB + 1
+    assert len(consumed) <= in_flight * workers.CHUNK_SIZE
+    assert len(list(results)) == len(files) * 10 - 1
+
+
+def test_map_files_closed_early(
+    file_factory: FileFactory, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Workers stop after their current file when results aren't wanted."""
+    monkeypatch.setattr(workers, "CHUNK_SIZE", 10)
+    files = [file_factory(f"{i}.txt", "bb\n") for i in range(50)]
+    results = workers.map_files(logged_line_lengths, files, jobs=2)
+    assert next(results) == [3]
+
+    results.close()
+
+    # each worker had a chunk of slow files queued, only one file of each ran
+    done = (files[0].parent / "done.log").read_text().splitlines()
+    assert len(done) < 2 * workers.CHUNK_SIZE
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_map_files_timeout(
+    file_factory: FileFactory, jobs: int, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Files taking too long are skipped and the rest still handled."""
+    files = [file_factory(name, "a\n") for name in ["1.txt", "stall.txt", "2.txt"]]
+    limits = workers.FileLimits(timeout=0.1)
+    skipped: List[workers.FileSkipped] = []
+
+    start = time.monotonic()
+    results = list(
+        workers.map_files(stalled_line_lengths, files, jobs, limits, skipped)
+    )
+
+    assert time.monotonic() - start < 5
+    assert results == [[2], [], [2]]
+    assert 'stall.txt", took longer than 0.1s.' in caplog.text
+    assert [s.path for s in skipped] == [files[1]]
+
+
+def test_map_files_memory(
+    file_factory: FileFactory, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Files needing too much memory are skipped, in a worker process."""
+    files = [file_factory(name, "a\n") for name in ["1.txt", "stall.txt", "2.txt"]]
+    limits = workers.FileLimits(memory=2**33)
+
+    results = list(workers.map_files(greedy_line_lengths, files, 1, limits))
+
+    assert results == [[2], [], [2]]
+    assert 'stall.txt", ran out of memory.' in caplog.text
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_count_files_timeout(
+    file_factory: FileFactory, jobs: int, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Files taking too long aren't counted."""
+    files = [file_factory(name, "a\n") for name in ["1.txt", "stall.txt", "2.txt"]]
+    limits = workers.FileLimits(timeout=0.1)
+    skipped: List[workers.FileSkipped] = []
+
+    counts = workers.count_files(stalled_line_lengths, files, jobs, limits, skipped)
+
+    assert counts == {2: 2}
+    assert "stall.txt" in caplog.text
+    assert [s.path for s in skipped] == [files[1]]